@@ -1,22 +1,35 @@
+import time
+
+STARTED = time.perf_counter()  # Time to first paint is measured from here
+
 import os
 import sys
-import time
+
+# Any arguments select the command line interface, e.g. "UCT.py analyze E:\\ --json".
+# Dispatch before tkinter is imported, so the command line also works without Tk.
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1:] != ["--startup-time"]:
+    from uct_engine import main as cli_main
+    sys.exit(cli_main())
+
 import logging
-import ctypes
-import shutil
-import subprocess
 import threading
-import webbrowser
 from queue import Queue, Empty
-from pathlib import Path
 from datetime import datetime
-import zipfile
 
-import psutil
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from tkinter.scrolledtext import ScrolledText
 
+from uct_engine import (
+    UCTEngine, JobScheduler, DriveInventory, LazyModule, MANIFEST_SUFFIX, JOURNAL_SUFFIX, load_journal, LOG_FILE,
+    setup_logging, check_admin_privileges, log_operation
+)
+
+ctypes = LazyModule("ctypes")
+shutil = LazyModule("shutil")
+subprocess = LazyModule("subprocess")
+webbrowser = LazyModule("webbrowser")
+
 
 class USBCheckerApp:
     """USB Checker Tool - Analyze, repair, benchmark, and backup USB drives."""
@@ -24,10 +37,12 @@ class USBCheckerApp:
     # Constants
     WINDOW_WIDTH = 600
     WINDOW_HEIGHT = 500
-    LOG_FILE = "usb_checker.log"
-    LOG_MAX_SIZE = 10 * 1024 * 1024  # 10 MB
-    BENCHMARK_SIZE = 100 * 1024 * 1024  # 100 MB
-    CHUNK_SIZE = 1024 * 1024  # 1 MB
+    LOG_FILE = LOG_FILE
+    MAX_DISPLAY_LINES = 2000  # Older output is dropped from the window (it stays in the log file)
+    MAX_BATCH_MESSAGES = 1000  # Messages applied to the window per tick
+    PROGRESS_INTERVAL_MS = 250  # How often job progress events are applied to the widgets
+    IO_LIMIT_CHOICES = (0, 50, 20, 10, 5)  # MB/s offered in the Limits menu, 0 = unlimited
+    STARTUP_BUDGET_MS = 1000  # Time to first paint above this is logged as a regression
     
     def __init__(self, root):
         self.root = root
@@ -39,28 +54,46 @@ class USBCheckerApp:
         
         # State variables
         self.selected_drive = tk.StringVar()
+        self.io_limit = tk.DoubleVar(value=0)
+        self.background_priority = tk.BooleanVar(value=UCTEngine.BACKGROUND_PRIORITY)
         self.process_queue = Queue()
-        self.is_running = False
+        self.log_queue = Queue()  # Display output mirrored to the log file off the Tk thread
         self.drive_mapping = {}  # Maps display text to drive letter
+        self.drive_events = Queue()  # (added, removed) volume lists from the inventory watcher
+        self.inventory = DriveInventory(on_change=lambda added, removed: self.drive_events.put((added, removed)))
+        self.engine = UCTEngine(on_message=self.process_queue.put)
+        self.scheduler = JobScheduler(on_message=self.process_queue.put)
+        self.jobs_window = None
+        self.first_paint = None  # Seconds from start to the first drawn window
+        self.exit_after_paint = False
         
         # Setup
         self.setup_logging()
+        threading.Thread(target=self.mirror_display_to_log, daemon=True).start()
         self.setup_styles()
         self.create_widgets()
         self.check_queue()
-        self.refresh_drives()
+        self.update_progress()
+        self.inventory.start()  # Enumerates off the Tk thread and keeps watching for hotplug
+        self.root.bind("<Map>", self.on_first_map, add="+")
+    
+    def on_first_map(self, event):
+        """Measure the first paint once the main window is mapped and drawn."""
+        if event.widget is not self.root or self.first_paint is not None:
+            return
+        self.root.update_idletasks()  # Draws the widgets waiting for idle time
+        self.first_paint = time.perf_counter() - STARTED
+        milliseconds = self.first_paint * 1000
+        logging.info(f"Time to first paint: {milliseconds:.0f} ms")
+        log_operation("", "startup", self.first_paint, 0, {"first_paint_ms": round(milliseconds)})
+        if milliseconds > self.STARTUP_BUDGET_MS:
+            logging.warning(f"Startup took {milliseconds:.0f} ms, budget is {self.STARTUP_BUDGET_MS} ms")
+        if self.exit_after_paint:
+            self.root.after(0, self.root.destroy)
     
     def setup_logging(self):
-        """Set up logging to a file with a maximum size of 10 MB."""
-        # Check if the log file exceeds the maximum size
-        if os.path.exists(self.LOG_FILE) and os.path.getsize(self.LOG_FILE) > self.LOG_MAX_SIZE:
-            os.remove(self.LOG_FILE)
-        
-        logging.basicConfig(
-            filename=self.LOG_FILE,
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(message)s"
-        )
+        """Set up the background, rotating log files."""
+        setup_logging(self.LOG_FILE)
         logging.info("USB Checker started.")
     
     def setup_styles(self):
@@ -121,14 +154,50 @@ class USBCheckerApp:
         log_btn.pack(side=tk.LEFT, padx=5)
         self.create_tooltip(log_btn, "Open the application log file")
         
+        # Jobs button
+        jobs_btn = ttk.Button(
+            drive_frame,
+            text="Jobs",
+            command=self.show_jobs_window,
+            style="TButton"
+        )
+        jobs_btn.pack(side=tk.LEFT, padx=5)
+        self.create_tooltip(jobs_btn, "Show the state, throughput and ETA of every drive job")
+        
         # Action buttons
         button_frame = tk.Frame(self.root, bg="#2e2e2e")
         button_frame.pack(pady=5)
         
-        # Analyze button
-        analyze_btn = ttk.Button(button_frame, text="Analyze", command=self.run_analyze_in_thread, style="TButton")
-        analyze_btn.pack(side=tk.LEFT, padx=5)
-        self.create_tooltip(analyze_btn, "Analyze the selected USB drive for storage and speed")
+        # Analyze dropdown menu
+        analyze_menu_btn = ttk.Menubutton(button_frame, text="Analyze ▼", style="TButton")
+        analyze_menu_btn.pack(side=tk.LEFT, padx=5)
+        
+        analyze_menu = tk.Menu(analyze_menu_btn, tearoff=0, bg="#444", fg="white", activebackground="#666", activeforeground="white")
+        analyze_menu_btn.config(menu=analyze_menu)
+        
+        analyze_menu.add_command(
+            label="Quick Analysis",
+            command=lambda: self.run_analyze_in_thread(UCTEngine.QUICK_PROFILES)
+        )
+        analyze_menu.add_command(
+            label="Full Analysis",
+            command=lambda: self.run_analyze_in_thread(UCTEngine.FULL_PROFILES)
+        )
+        analyze_menu.add_separator()
+        analyze_menu.add_command(
+            label="Content Report",
+            command=self.run_content_in_thread
+        )
+        analyze_menu.add_command(
+            label="Find Duplicates",
+            command=self.run_duplicates_in_thread
+        )
+        analyze_menu.add_command(
+            label="Benchmark History",
+            command=self.run_history_in_thread
+        )
+        
+        self.create_tooltip(analyze_menu_btn, "Analyze the selected USB drive for storage and speed\nQuick: Sequential read/write\nFull: Sequential plus random 4K and mixed I/O\nContent: What fills the drive (directories, files, types)\nDuplicates: Identical files and the space they waste\nHistory: Speed trend of this drive across runs")
         
         # Repair dropdown menu
         repair_menu_btn = ttk.Menubutton(button_frame, text="Repair ▼", style="TButton")
@@ -145,13 +214,71 @@ class USBCheckerApp:
             label="Deep Repair",
             command=lambda: self.run_repair_in_thread(quick=False)
         )
+        repair_menu.add_separator()
+        repair_menu.add_command(
+            label="Surface Scan (read-only)",
+            command=self.run_surface_scan_in_thread
+        )
+        
+        self.create_tooltip(repair_menu_btn, "Repair the selected USB drive\nQuick: Fast file system fix (1-5 min)\nDeep: Full scan with bad sectors (hours)\nSurface Scan: Map slow and unreadable sectors without writing")
+        
+        # Backup dropdown menu
+        backup_menu_btn = ttk.Menubutton(button_frame, text="Backup ▼", style="TButton")
+        backup_menu_btn.pack(side=tk.LEFT, padx=5)
         
-        self.create_tooltip(repair_menu_btn, "Repair the selected USB drive\nQuick: Fast file system fix (1-5 min)\nDeep: Full scan with bad sectors (hours)")
+        backup_menu = tk.Menu(backup_menu_btn, tearoff=0, bg="#444", fg="white", activebackground="#666", activeforeground="white")
+        backup_menu_btn.config(menu=backup_menu)
         
-        # Backup button
-        backup_btn = ttk.Button(button_frame, text="Backup", command=self.run_backup_in_thread, style="TButton")
-        backup_btn.pack(side=tk.LEFT, padx=5)
-        self.create_tooltip(backup_btn, "Create a ZIP backup of the USB drive")
+        backup_menu.add_command(
+            label="Full Backup",
+            command=self.run_backup_in_thread
+        )
+        backup_menu.add_command(
+            label="Incremental Backup",
+            command=lambda: self.run_backup_in_thread(incremental=True)
+        )
+        backup_menu.add_command(
+            label="Resume Interrupted Backup",
+            command=self.run_resume_backup_in_thread
+        )
+        backup_menu.add_command(
+            label="Sector Image",
+            command=self.run_image_in_thread
+        )
+        backup_menu.add_separator()
+        backup_menu.add_command(
+            label="Restore Backup",
+            command=self.run_restore_in_thread
+        )
+        
+        self.create_tooltip(backup_menu_btn, "Create a ZIP backup of the USB drive\nIncremental: Only files changed since a previous backup\nResume: Continue a backup that was interrupted\nSector Image: Raw copy of the whole device, including boot sectors\nRestore: Rebuild files from a backup manifest")
+        
+        # Limits dropdown menu
+        limits_menu_btn = ttk.Menubutton(button_frame, text="Limits ▼", style="TButton")
+        limits_menu_btn.pack(side=tk.LEFT, padx=5)
+        
+        limits_menu = tk.Menu(limits_menu_btn, tearoff=0, bg="#444", fg="white", activebackground="#666", activeforeground="white", selectcolor="white")
+        limits_menu_btn.config(menu=limits_menu)
+        
+        for mbps in self.IO_LIMIT_CHOICES:
+            limits_menu.add_radiobutton(
+                label=f"{mbps} MB/s" if mbps else "Unlimited",
+                variable=self.io_limit,
+                value=mbps,
+                command=self.apply_io_limit
+            )
+        limits_menu.add_command(
+            label="Custom Limit...",
+            command=self.ask_io_limit
+        )
+        limits_menu.add_separator()
+        limits_menu.add_checkbutton(
+            label="Background Priority",
+            variable=self.background_priority,
+            command=self.apply_background_priority
+        )
+        
+        self.create_tooltip(limits_menu_btn, "Keep this computer responsive while jobs run\nBandwidth: Cap backup and benchmark I/O (applies to running jobs)\nBackground Priority: Lower CPU and disk priority of new jobs")
         
         # Output window
         self.result_display = ScrolledText(
@@ -175,6 +302,16 @@ class USBCheckerApp:
         )
         self.progress.pack(pady=5)
         
+        # Live phase, throughput and ETA of the running jobs
+        self.status_label = tk.Label(
+            self.root,
+            text="",
+            fg="#aaaaaa",
+            bg="#2e2e2e",
+            font=("Arial", 8)
+        )
+        self.status_label.pack()
+        
         # GitHub link
         github_frame = tk.Frame(self.root, bg="#2e2e2e")
         github_frame.pack(pady=5)
@@ -199,47 +336,125 @@ class USBCheckerApp:
         window.geometry(f"{width}x{height}+{x}+{y}")
     
     def create_tooltip(self, widget, text):
-        """Create a tooltip for a widget that stays on top."""
-        tooltip = tk.Toplevel(self.root)
-        tooltip.withdraw()
-        tooltip.wm_overrideredirect(True)
-        tooltip.wm_attributes("-topmost", True)
-        
-        label = tk.Label(
-            tooltip,
-            text=text,
-            bg="#ffeb3b",
-            fg="black",
-            relief="solid",
-            borderwidth=1,
-            font=("Arial", 8),
-            padx=5,
-            pady=2
-        )
-        label.pack()
+        """Show a tooltip that stays on top while the pointer is over the widget.
+        
+        The tooltip window is only built on the first hover, so startup creates no extra toplevels.
+        """
+        tooltip = None
         
         def enter(event):
+            nonlocal tooltip
+            if tooltip is None:
+                tooltip = tk.Toplevel(self.root)
+                tooltip.withdraw()
+                tooltip.wm_overrideredirect(True)
+                tooltip.wm_attributes("-topmost", True)
+                tk.Label(
+                    tooltip,
+                    text=text,
+                    bg="#ffeb3b",
+                    fg="black",
+                    relief="solid",
+                    borderwidth=1,
+                    font=("Arial", 8),
+                    padx=5,
+                    pady=2
+                ).pack()
             x = widget.winfo_rootx() + 10
             y = widget.winfo_rooty() + widget.winfo_height() + 5
             tooltip.wm_geometry(f"+{x}+{y}")
             tooltip.deiconify()
         
         def leave(event):
-            tooltip.withdraw()
+            if tooltip is not None:
+                tooltip.withdraw()
         
         widget.bind("<Enter>", enter)
         widget.bind("<Leave>", leave)
     
     def check_queue(self):
-        """Check the process queue for updates."""
+        """Apply all queued output to the display in one batch per tick."""
+        messages = []
+        try:
+            while len(messages) < self.MAX_BATCH_MESSAGES:
+                messages.append(self.process_queue.get_nowait())
+        except Empty:
+            pass
+        if messages:
+            self.update_result_display("".join(messages))
+        
         try:
             while True:
-                message = self.process_queue.get_nowait()
-                self.update_result_display(message)
+                self.apply_drive_changes(*self.drive_events.get_nowait())
         except Empty:
             pass
+        
         self.root.after(100, self.check_queue)
     
+    def update_progress(self):
+        """Apply the latest job progress events to the progress bar and status line."""
+        # The progress bar follows the average of all unfinished jobs
+        active = self.scheduler.active_jobs()
+        if active:
+            self.progress["value"] = sum(job.progress for job in active) / len(active)
+            running = [job for job in active if job.state == "running"]
+            status = ""
+            if running:
+                etas = [job.eta for job in running]
+                phases = sorted({job.phase for job in running if job.phase})
+                status = f"{', '.join(phases)}  ·  {sum(job.throughput for job in running):.1f} MB/s"
+                if None not in etas:
+                    status += f"  ·  ETA {time.strftime('%H:%M:%S', time.gmtime(max(etas)))}"
+            self.status_label.config(text=status)
+        elif self.scheduler.jobs:
+            self.progress["value"] = 100 if self.scheduler.jobs[-1].state == "done" else 0
+            self.status_label.config(text="")
+        
+        self.root.after(self.PROGRESS_INTERVAL_MS, self.update_progress)
+    
+    def show_jobs_window(self):
+        """Open (or raise) the job list with each drive's state, throughput and ETA."""
+        if self.jobs_window and self.jobs_window.winfo_exists():
+            self.jobs_window.lift()
+            return
+        
+        self.jobs_window = tk.Toplevel(self.root)
+        self.jobs_window.title("UCT Jobs")
+        self.jobs_window.geometry("560x260")
+        self.jobs_window.configure(bg="#2e2e2e")
+        
+        columns = ("drive", "operation", "state", "progress", "throughput", "eta")
+        tree = ttk.Treeview(self.jobs_window, columns=columns, show="headings", height=10)
+        for column, heading, width in zip(
+            columns,
+            ("Drive", "Operation", "State", "Progress", "Throughput", "ETA"),
+            (110, 100, 70, 70, 90, 70)
+        ):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor="w")
+        tree.pack(fill="both", expand=True, padx=5, pady=5)
+        
+        def refresh():
+            if not tree.winfo_exists():
+                return
+            for job in self.scheduler.jobs:
+                eta = job.eta
+                values = (
+                    job.drive,
+                    job.operation,
+                    job.state,
+                    f"{job.progress:.0f}%",
+                    f"{job.throughput:.1f} MB/s" if job.started else "",
+                    time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "",
+                )
+                if tree.exists(str(job.id)):
+                    tree.item(str(job.id), values=values)
+                else:
+                    tree.insert("", tk.END, iid=str(job.id), values=values)
+            self.jobs_window.after(500, refresh)
+        
+        refresh()
+    
     def open_log_file(self):
         """Open the log file in the default text editor."""
         if not os.path.exists(self.LOG_FILE):
@@ -258,79 +473,33 @@ class USBCheckerApp:
             logging.error(f"Error opening log file: {e}")
     
     def refresh_drives(self):
-        """Refresh the list of available USB drives with additional information."""
-        try:
-            drives = []
-            self.drive_mapping.clear()
-            
-            for partition in psutil.disk_partitions():
-                if self.is_usb_drive(partition.device):
-                    drive_letter = partition.device
-                    drive_label = self.get_drive_label(drive_letter)
-                    drive_info = f"{drive_letter} - {drive_label} ({partition.fstype})"
-                    
-                    drives.append(drive_info)
-                    self.drive_mapping[drive_info] = drive_letter
-            
-            # Update dropdown
-            self.drive_dropdown["values"] = drives
-            if drives:
-                self.drive_dropdown.set(drives[0])
-            else:
-                self.drive_dropdown.set("")
-                self.process_queue.put("No USB drives found.\n")
-            
-            logging.info(f"Found {len(drives)} USB drive(s)")
-        except Exception as e:
-            self.process_queue.put(f"Error refreshing drives: {e}\n")
-            logging.error(f"Error refreshing drives: {e}")
-    
-    def is_usb_drive(self, drive_letter):
-        """Check if the drive is a USB drive (Windows only)."""
-        if sys.platform != "win32":
-            # For non-Windows platforms, check if 'removable' is in mount options
-            try:
-                for partition in psutil.disk_partitions(all=True):
-                    if partition.device == drive_letter and "removable" in partition.opts.lower():
-                        return True
-                return False
-            except Exception as e:
-                logging.error(f"Error checking if drive is USB: {e}")
-                return False
-        
-        try:
-            # Windows: Check if the drive is removable
-            drive_type = ctypes.windll.kernel32.GetDriveTypeW(drive_letter)
-            return drive_type == 2  # DRIVE_REMOVABLE
-        except Exception as e:
-            logging.error(f"Error checking if drive is USB: {e}")
-            return False
+        """Re-enumerate the USB drives in the background; changes arrive via drive_events."""
+        self.inventory.refresh_async()
     
-    def get_drive_label(self, drive_letter):
-        """Get the label of the drive (if available)."""
-        if sys.platform != "win32":
-            return "No Label"
-        
-        try:
-            volume_name_buffer = ctypes.create_unicode_buffer(1024)
-            file_system_buffer = ctypes.create_unicode_buffer(1024)
-            
-            ctypes.windll.kernel32.GetVolumeInformationW(
-                ctypes.c_wchar_p(drive_letter),
-                volume_name_buffer,
-                ctypes.sizeof(volume_name_buffer),
-                None,
-                None,
-                None,
-                file_system_buffer,
-                ctypes.sizeof(file_system_buffer)
-            )
-            
-            label = volume_name_buffer.value.strip()
-            return label if label else "No Label"
-        except Exception as e:
-            logging.error(f"Error getting drive label: {e}")
-            return "No Label"
+    def apply_drive_changes(self, added, removed):
+        """Update only the dropdown entries of drives that were connected or removed."""
+        drives = list(self.drive_dropdown["values"])
+        selected = self.selected_drive.get()
+        
+        for volume in removed:
+            for drive_info, mountpoint in list(self.drive_mapping.items()):
+                if mountpoint == volume.mountpoint:
+                    del self.drive_mapping[drive_info]
+                    drives.remove(drive_info)
+                    self.process_queue.put(f"Drive removed: {drive_info}\n")
+        
+        for volume in added:
+            drive_info = f"{volume.mountpoint} - {volume.label} ({volume.fstype})"
+            drives.append(drive_info)
+            self.drive_mapping[drive_info] = volume.mountpoint
+            self.process_queue.put(f"Drive connected: {drive_info}\n")
+        
+        # Update dropdown
+        self.drive_dropdown["values"] = drives
+        if selected not in drives:
+            self.drive_dropdown.set(drives[0] if drives else "")
+        if not drives:
+            self.process_queue.put("No USB drives found.\n")
     
     def validate_drive(self):
         """Validate the selected drive and return the drive letter."""
@@ -352,20 +521,58 @@ class USBCheckerApp:
         
         return drive_letter
     
-    def run_analyze_in_thread(self):
-        """Run the USB analysis in a separate thread."""
-        if self.is_running:
-            self.process_queue.put("Another operation is already running.\n")
-            return
+    def run_operation(self, drive, operation, *args, on_success=None, error_title=None, error_text=None):
+        """Queue an engine operation for a drive; jobs on other drives run in parallel."""
+        if self.scheduler.is_busy(drive):
+            self.process_queue.put(f"{drive} is busy, the job will start when the current one finishes.\n")
+        
+        def succeeded(job):
+            if on_success and job.result is not None:
+                self.root.after(0, on_success, job.result)
         
+        def failed(job):
+            # The engine has already reported and logged the error
+            if error_title:
+                self.root.after(0, lambda: messagebox.showerror(error_title, f"{error_text}:\n{job.error}"))
+        
+        self.scheduler.submit(drive, operation, *args, on_success=succeeded, on_error=failed)
+    
+    def apply_io_limit(self):
+        """Apply the selected bandwidth limit to running and future jobs."""
+        mbps = self.io_limit.get()
+        self.engine.set_io_limit(mbps)
+        self.process_queue.put(f"Bandwidth limit: {f'{mbps:g} MB/s' if mbps else 'unlimited'}\n")
+    
+    def ask_io_limit(self):
+        """Ask for a custom bandwidth limit in MB/s."""
+        mbps = simpledialog.askfloat(
+            "Bandwidth Limit",
+            "Maximum backup and benchmark I/O in MB/s (0 for unlimited):",
+            parent=self.root,
+            minvalue=0,
+            initialvalue=self.io_limit.get()
+        )
+        if mbps is None:
+            return
+        self.io_limit.set(mbps)
+        self.apply_io_limit()
+    
+    def apply_background_priority(self):
+        """Run jobs started from now on with lowered CPU and I/O priority."""
+        UCTEngine.BACKGROUND_PRIORITY = self.background_priority.get()
+        state = "on" if UCTEngine.BACKGROUND_PRIORITY else "off"
+        self.process_queue.put(f"Background priority {state} for new jobs\n")
+        logging.info(f"Background priority {state}")
+    
+    def run_analyze_in_thread(self, profiles=UCTEngine.QUICK_PROFILES):
+        """Run the USB analysis in a separate thread."""
         drive = self.validate_drive()
         if not drive:
             return
         
         # Check if drive has enough space for benchmark
         try:
-            usage = shutil.disk_usage(drive)
-            if usage.free < self.BENCHMARK_SIZE * 1.5:  # 150 MB free space required
+            if not self.engine.has_benchmark_space(drive):  # 150 MB free space required
                 response = messagebox.askyesno(
                     "Insufficient Space for Speed Test",
                     "Not enough free space for speed benchmark.\n\n"
@@ -374,164 +581,34 @@ class USBCheckerApp:
                 if not response:
                     return
                 # Run only storage analysis
-                self.analyze_usb(drive)
+                self.run_operation(drive, "analyze", drive)
                 return
         except Exception as e:
             messagebox.showerror("Error", f"Failed to check drive space: {e}")
             return
         
-        self.is_running = True
-        self.progress["value"] = 0
-        thread = threading.Thread(target=self.analyze_usb_full, args=(drive,), daemon=True)
-        thread.start()
+        self.run_operation(drive, "analyze_full", drive, profiles)
     
-    def analyze_usb(self, drive):
-        """Analyze storage information of the selected USB drive."""
-        try:
-            usage = shutil.disk_usage(drive)
-            partitions = psutil.disk_partitions()
-            drive_info = next((p for p in partitions if p.device == drive), None)
-            
-            message = f"{'='*50}\n"
-            message += f"STORAGE ANALYSIS\n"
-            message += f"{'='*50}\n"
-            message += f"Drive: {drive}\n"
-            if drive_info:
-                message += f"File System: {drive_info.fstype}\n"
-            
-            message += (
-                f"Total: {usage.total / (1024**3):.2f} GB\n"
-                f"Used: {usage.used / (1024**3):.2f} GB\n"
-                f"Free: {usage.free / (1024**3):.2f} GB\n"
-                f"Usage: {(usage.used / usage.total * 100):.1f}%\n"
-                f"{'='*50}\n"
-            )
-            
-            self.process_queue.put(message)
-            
-            # Detailed logging
-            logging.info(f"Storage Analysis - Drive: {drive}")
-            if drive_info:
-                logging.info(f"File System: {drive_info.fstype}")
-            logging.info(f"Total: {usage.total / (1024**3):.2f} GB")
-            logging.info(f"Used: {usage.used / (1024**3):.2f} GB")
-            logging.info(f"Free: {usage.free / (1024**3):.2f} GB")
-            logging.info(f"Usage: {(usage.used / usage.total * 100):.1f}%")
-        except Exception as e:
-            self.process_queue.put(f"Error analyzing drive: {e}\n")
-            logging.error(f"Error analyzing drive {drive}: {e}")
+    def run_content_in_thread(self):
+        """Report what fills the selected drive."""
+        drive = self.validate_drive()
+        if drive:
+            self.run_operation(drive, "analyze_content", drive)
     
-    def analyze_usb_full(self, drive):
-        """Perform complete analysis including storage and speed benchmark."""
-        test_file = None
-        try:
-            # First: Storage Analysis
-            usage = shutil.disk_usage(drive)
-            partitions = psutil.disk_partitions()
-            drive_info = next((p for p in partitions if p.device == drive), None)
-            
-            message = f"{'='*50}\n"
-            message += f"USB DRIVE ANALYSIS\n"
-            message += f"{'='*50}\n"
-            message += f"Drive: {drive}\n"
-            if drive_info:
-                message += f"File System: {drive_info.fstype}\n"
-            
-            message += (
-                f"Total: {usage.total / (1024**3):.2f} GB\n"
-                f"Used: {usage.used / (1024**3):.2f} GB\n"
-                f"Free: {usage.free / (1024**3):.2f} GB\n"
-                f"Usage: {(usage.used / usage.total * 100):.1f}%\n"
-                f"{'='*50}\n"
-            )
-            
-            self.process_queue.put(message)
-            
-            # Log storage analysis
-            logging.info(f"Full Analysis Started - Drive: {drive}")
-            if drive_info:
-                logging.info(f"File System: {drive_info.fstype}")
-            logging.info(f"Total: {usage.total / (1024**3):.2f} GB")
-            logging.info(f"Used: {usage.used / (1024**3):.2f} GB")
-            logging.info(f"Free: {usage.free / (1024**3):.2f} GB")
-            logging.info(f"Usage: {(usage.used / usage.total * 100):.1f}%")
-            
-            self.progress["value"] = 20
-            
-            # Second: Speed Benchmark
-            self.process_queue.put("Running speed benchmark...\n")
-            self.process_queue.put("Testing write speed...\n")
-            logging.info("Starting speed benchmark - Write test")
-            
-            test_file = os.path.join(drive, "uct_benchmark_test.bin")
-            
-            # Write test
-            start_time = time.time()
-            with open(test_file, "wb") as f:
-                f.write(os.urandom(self.BENCHMARK_SIZE))
-            write_time = time.time() - start_time
-            write_speed = (self.BENCHMARK_SIZE / (1024 * 1024)) / write_time
-            
-            logging.info(f"Write test completed - Speed: {write_speed:.2f} MB/s, Time: {write_time:.2f}s")
-            
-            self.progress["value"] = 60
-            self.process_queue.put("Testing read speed...\n")
-            logging.info("Starting read test")
-            
-            # Read test
-            start_time = time.time()
-            with open(test_file, "rb") as f:
-                while f.read(self.CHUNK_SIZE):
-                    pass
-            read_time = time.time() - start_time
-            read_speed = (self.BENCHMARK_SIZE / (1024 * 1024)) / read_time
-            
-            logging.info(f"Read test completed - Speed: {read_speed:.2f} MB/s, Time: {read_time:.2f}s")
-            
-            # Results
-            self.process_queue.put(f"\nSPEED BENCHMARK RESULTS\n")
-            self.process_queue.put(f"{'='*50}\n")
-            self.process_queue.put(f"Write Speed: {write_speed:.2f} MB/s\n")
-            self.process_queue.put(f"Read Speed: {read_speed:.2f} MB/s\n")
-            
-            # Performance rating
-            avg_speed = (write_speed + read_speed) / 2
-            if avg_speed > 100:
-                rating = "Excellent (USB 3.0+)"
-            elif avg_speed > 30:
-                rating = "Good (USB 3.0)"
-            elif avg_speed > 10:
-                rating = "Average (USB 2.0)"
-            else:
-                rating = "Slow (USB 2.0 or older)"
-            
-            self.process_queue.put(f"Performance: {rating}\n")
-            self.process_queue.put(f"{'='*50}\n")
-            
-            logging.info(f"Performance Rating: {rating}")
-            logging.info(f"Average Speed: {avg_speed:.2f} MB/s")
-            logging.info(f"Analysis completed successfully for {drive}")
-            
-            self.progress["value"] = 100
-        except Exception as e:
-            self.process_queue.put(f"Error during analysis: {e}\n")
-            logging.error(f"Error during full analysis of {drive}: {e}")
-        finally:
-            # Clean up test file
-            if test_file and os.path.exists(test_file):
-                try:
-                    os.remove(test_file)
-                    logging.info("Benchmark test file removed")
-                except Exception as e:
-                    logging.warning(f"Failed to remove test file: {e}")
-            self.is_running = False
+    def run_duplicates_in_thread(self):
+        """Find duplicate files on the selected drive."""
+        drive = self.validate_drive()
+        if drive:
+            self.run_operation(drive, "find_duplicates", drive)
+    
+    def run_history_in_thread(self):
+        """Show the benchmark trend of the selected drive."""
+        drive = self.validate_drive()
+        if drive:
+            self.run_operation(drive, "history_report", drive)
     
     def run_repair_in_thread(self, quick=True):
         """Run the USB repair process in a separate thread."""
-        if self.is_running:
-            self.process_queue.put("Another operation is already running.\n")
-            return
-        
         drive = self.validate_drive()
         if not drive:
             return
@@ -548,113 +625,39 @@ class USBCheckerApp:
         if not response:
             return
         
-        self.is_running = True
-        self.progress["value"] = 0
-        thread = threading.Thread(target=self.repair_usb, args=(drive, quick), daemon=True)
-        thread.start()
-    
-    def repair_usb(self, drive, quick=True):
-        """Repair the selected USB drive using chkdsk (Windows only)."""
-        if sys.platform != "win32":
-            self.process_queue.put("Repair function is only available on Windows.\n")
-            logging.warning("Repair attempted on non-Windows platform")
-            self.is_running = False
+        self.run_operation(drive, "repair", drive, quick)
+    
+    def run_surface_scan_in_thread(self):
+        """Run a read-only surface scan of the selected drive."""
+        drive = self.validate_drive()
+        if not drive:
             return
         
-        try:
-            # Check for admin privileges
-            if not ctypes.windll.shell32.IsUserAnAdmin():
-                self.process_queue.put("Error: Administrator privileges required for repair.\n")
-                logging.error("Repair failed - No administrator privileges")
-                return
-            
-            drive_letter = drive.rstrip("\\").rstrip("/")[0]
-            if not drive_letter.isalpha():
-                self.process_queue.put(f"Invalid drive letter: {drive_letter}\n")
-                logging.error(f"Invalid drive letter: {drive_letter}")
-                return
-            
-            # Determine repair mode
-            mode_text = "Quick Repair" if quick else "Deep Repair"
-            parameters = [f"{drive_letter}:", "/f"]
-            
-            if not quick:
-                parameters.append("/r")  # Add /r for bad sector scan
-            
-            # Run chkdsk
-            chkdsk_path = os.path.join(os.getenv("SystemRoot", "C:\\Windows"), "System32", "chkdsk.exe")
-            self.process_queue.put(f"{'='*50}\n")
-            self.process_queue.put(f"Starting {mode_text} on {drive_letter}:\n")
-            self.process_queue.put(f"{'='*50}\n")
-            
-            logging.info(f"{mode_text} started on {drive_letter}:")
-            logging.info(f"Command: {chkdsk_path} {' '.join(parameters)}")
-            
-            if not quick:
-                self.process_queue.put("WARNING: Deep Repair may take several hours!\n")
-                self.process_queue.put("The drive will be scanned sector by sector.\n\n")
-                logging.warning("Deep Repair initiated - This may take several hours")
-            
-            process = subprocess.Popen(
-                [chkdsk_path] + parameters,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            
-            # Read output
-            line_count = 0
-            for line in iter(process.stdout.readline, ""):
-                if line.strip():
-                    self.process_queue.put(line)
-                    line_count += 1
-                    
-                    # Update progress (more conservative for deep repair)
-                    if quick:
-                        if self.progress["value"] < 90:
-                            self.progress["value"] += 5
-                    else:
-                        # For deep repair, progress more slowly
-                        if line_count % 10 == 0 and self.progress["value"] < 95:
-                            self.progress["value"] += 1
-            
-            process.wait()
-            
-            if process.returncode == 0:
-                self.process_queue.put(f"\n{'='*50}\n")
-                self.process_queue.put(f"{mode_text} completed successfully!\n")
-                self.process_queue.put(f"{'='*50}\n")
-                logging.info(f"{mode_text} completed successfully on {drive_letter}:")
-            else:
-                stderr = process.stderr.read()
-                self.process_queue.put(f"\n{'='*50}\n")
-                self.process_queue.put(f"{mode_text} completed with warnings.\n")
-                if stderr:
-                    self.process_queue.put(f"{stderr}\n")
-                    logging.warning(f"{mode_text} completed with warnings: {stderr}")
-                self.process_queue.put(f"{'='*50}\n")
-                logging.warning(f"{mode_text} completed with return code: {process.returncode}")
-            
-            self.progress["value"] = 100
-        except Exception as e:
-            self.process_queue.put(f"Error during repair: {e}\n")
-            logging.error(f"Error during {mode_text} on {drive}: {e}")
-        finally:
-            self.is_running = False
-    
-    def run_backup_in_thread(self):
-        """Run the USB backup process in a separate thread."""
-        if self.is_running:
-            self.process_queue.put("Another operation is already running.\n")
+        if not check_admin_privileges():
+            messagebox.showwarning("Admin Rights Required", "Reading the raw device requires administrator privileges.")
             return
         
+        self.run_operation(drive, "surface_scan", drive, error_title="Surface Scan Failed", error_text="The surface scan failed")
+    
+    def run_backup_in_thread(self, incremental=False):
+        """Run the USB backup process in a separate thread."""
         drive = self.validate_drive()
         if not drive:
             return
         
+        # Incremental backups compare against the manifest of a previous run
+        base_manifest = None
+        if incremental:
+            base_manifest = filedialog.askopenfilename(
+                title="Select Previous Backup Manifest",
+                filetypes=[("UCT Manifest", f"*{MANIFEST_SUFFIX}"), ("All Files", "*.*")]
+            )
+            if not base_manifest:
+                return
+        
         # Ask user to choose backup location and filename
-        default_name = f"USB_Backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        prefix = "USB_Incremental" if incremental else "USB_Backup"
+        default_name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
         backup_file = filedialog.asksaveasfilename(
             title="Save Backup As",
             defaultextension=".zip",
@@ -671,7 +674,7 @@ class USBCheckerApp:
             size_gb = usage.used / (1024**3)
             response = messagebox.askyesno(
                 "Confirm Backup",
-                f"Create a ZIP backup of {drive}?\n\n"
+                f"Create {'an incremental' if incremental else 'a'} ZIP backup of {drive}?\n\n"
                 f"Used space: {size_gb:.2f} GB\n"
                 f"This may take several minutes.\n\n"
                 f"Save to: {os.path.basename(backup_file)}"
@@ -682,124 +685,161 @@ class USBCheckerApp:
             messagebox.showerror("Error", f"Failed to check drive size: {e}")
             return
         
-        self.is_running = True
-        self.progress["value"] = 0
-        thread = threading.Thread(target=self.backup_usb, args=(drive, backup_file), daemon=True)
-        thread.start()
+        self.run_operation(
+            drive, "backup", drive, backup_file, base_manifest,
+            on_success=self.show_backup_summary,
+            error_title="Backup Failed",
+            error_text="An error occurred during backup"
+        )
     
-    def backup_usb(self, drive, backup_file):
-        """Create a ZIP backup of the entire USB drive."""
+    def run_resume_backup_in_thread(self):
+        """Continue an interrupted backup from its checkpoint journal."""
+        journal_file = filedialog.askopenfilename(
+            title="Select Backup Journal to Resume",
+            filetypes=[("UCT Backup Journal", f"*{JOURNAL_SUFFIX}"), ("All Files", "*.*")]
+        )
+        if not journal_file:
+            return
+        
         try:
-            self.process_queue.put(f"Creating ZIP backup: {os.path.basename(backup_file)}\n")
-            
-            # Count total files for progress tracking
-            total_files = 0
-            total_size = 0
-            files_to_backup = []
-            
-            self.process_queue.put("Scanning drive...\n")
-            
-            for root, dirs, files in os.walk(drive):
-                # Skip system directories
-                dirs[:] = [d for d in dirs if not d.startswith('$') and d != 'System Volume Information']
-                
-                for file in files:
-                    try:
-                        file_path = os.path.join(root, file)
-                        file_size = os.path.getsize(file_path)
-                        files_to_backup.append((file_path, file_size))
-                        total_files += 1
-                        total_size += file_size
-                    except Exception as e:
-                        logging.warning(f"Cannot access file {file_path}: {e}")
-                        continue
-            
-            if total_files == 0:
-                self.process_queue.put("No files found to backup.\n")
-                return
-            
-            self.process_queue.put(f"Found {total_files} files ({total_size / (1024**3):.2f} GB)\n")
-            self.process_queue.put("Creating ZIP archive...\n")
-            
-            # Create ZIP file
-            processed_size = 0
-            processed_files = 0
-            
-            with zipfile.ZipFile(backup_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zipf:
-                for file_path, file_size in files_to_backup:
-                    try:
-                        # Get relative path for archive
-                        arcname = os.path.relpath(file_path, drive)
-                        zipf.write(file_path, arcname)
-                        
-                        processed_files += 1
-                        processed_size += file_size
-                        
-                        # Update progress based on size processed
-                        progress = int((processed_size / total_size) * 100)
-                        self.progress["value"] = min(progress, 99)
-                        
-                        if processed_files % 50 == 0:  # Update every 50 files
-                            self.process_queue.put(
-                                f"Progress: {processed_files}/{total_files} files "
-                                f"({processed_size / (1024**3):.2f} GB)\n"
-                            )
-                    except Exception as e:
-                        logging.warning(f"Failed to add {file_path} to ZIP: {e}")
-                        continue
-            
-            # Get final ZIP size
-            zip_size = os.path.getsize(backup_file)
-            compression_ratio = (1 - zip_size / total_size) * 100 if total_size > 0 else 0
-            
-            self.process_queue.put(f"\n{'='*50}\n")
-            self.process_queue.put(f"Backup completed successfully!\n")
-            self.process_queue.put(f"Files backed up: {processed_files}\n")
-            self.process_queue.put(f"Original size: {total_size / (1024**3):.2f} GB\n")
-            self.process_queue.put(f"ZIP size: {zip_size / (1024**3):.2f} GB\n")
-            self.process_queue.put(f"Compression: {compression_ratio:.1f}%\n")
-            self.process_queue.put(f"Saved to: {backup_file}\n")
-            self.process_queue.put(f"{'='*50}\n")
-            
-            self.progress["value"] = 100
-            logging.info(f"Backed up {drive} to {backup_file} - {processed_files} files, {zip_size / (1024**3):.2f} GB")
-            
-            messagebox.showinfo(
-                "Backup Complete",
-                f"Successfully backed up {processed_files} files.\n\n"
-                f"ZIP size: {zip_size / (1024**3):.2f} GB\n"
-                f"Compression: {compression_ratio:.1f}%"
-            )
+            header, members = load_journal(journal_file)
         except Exception as e:
-            self.process_queue.put(f"Error during backup: {e}\n")
-            logging.error(f"Error during backup: {e}")
-            messagebox.showerror("Backup Failed", f"An error occurred during backup:\n{e}")
-        finally:
-            self.is_running = False
+            messagebox.showerror("Error", f"Failed to read the backup journal: {e}")
+            return
+        
+        # The drive may have been remounted elsewhere since the backup was interrupted
+        drive = header["drive"] if os.path.exists(header["drive"]) else self.validate_drive()
+        if not drive:
+            return
+        
+        response = messagebox.askyesno(
+            "Confirm Resume",
+            f"Resume the backup of {drive} to {os.path.basename(header['archive'])}?\n\n"
+            f"{len(members)} files were already archived."
+        )
+        if not response:
+            return
+        
+        self.run_operation(
+            drive, "backup", drive, header["archive"], header["parent"], True,
+            on_success=self.show_backup_summary,
+            error_title="Backup Failed",
+            error_text="An error occurred during backup"
+        )
+    
+    def run_image_in_thread(self):
+        """Create a raw sector image of the selected drive."""
+        drive = self.validate_drive()
+        if not drive:
+            return
+        
+        if not check_admin_privileges():
+            messagebox.showwarning("Admin Rights Required", "Reading the raw device requires administrator privileges.")
+            return
+        
+        default_name = f"USB_Image_{datetime.now().strftime('%Y%m%d_%H%M%S')}.img.gz"
+        image_file = filedialog.asksaveasfilename(
+            title="Save Sector Image As",
+            defaultextension=".img.gz",
+            filetypes=[("Compressed Image", "*.img.gz"), ("Raw Image", "*.img"), ("All Files", "*.*")],
+            initialfile=default_name
+        )
+        if not image_file:
+            return
+        
+        # A raw image stays mountable by other tools; .gz stores only the compressed data blocks
+        compression = "zlib" if image_file.endswith(".gz") else None
+        self.run_operation(
+            drive, "image", drive, image_file, compression,
+            error_title="Sector Image Failed",
+            error_text="An error occurred while imaging the drive"
+        )
+    
+    def show_backup_summary(self, summary):
+        """Show the result of a finished backup."""
+        verification = summary.get("verification")
+        if verification and (verification["mismatched"] or verification["missing"] or verification["skipped"]):
+            messagebox.showwarning(
+                "Backup Verification Failed",
+                f"Backed up {summary['files']} files, but verification found problems:\n\n"
+                f"Mismatched: {len(verification['mismatched'])}\n"
+                f"Missing: {len(verification['missing'])}\n"
+                f"Skipped: {len(verification['skipped'])}\n\n"
+                f"See the output window and log file for the affected files."
+            )
+            return
+        
+        verified_text = f"\nVerified: {verification['verified']} files" if verification else ""
+        messagebox.showinfo(
+            "Backup Complete",
+            f"Successfully backed up {summary['files']} files.\n\n"
+            f"ZIP size: {summary['zip_size'] / (1024**3):.2f} GB\n"
+            f"Compression: {summary['compression']:.1f}%"
+            f"{verified_text}"
+        )
+    
+    def run_restore_in_thread(self):
+        """Run a restore from a backup manifest or ZIP archive in a separate thread."""
+        manifest_file = filedialog.askopenfilename(
+            title="Select Backup Manifest or Archive to Restore",
+            filetypes=[("UCT Manifest", f"*{MANIFEST_SUFFIX}"), ("ZIP Archive", "*.zip"), ("All Files", "*.*")]
+        )
+        if not manifest_file:
+            return
+        
+        target_dir = filedialog.askdirectory(title="Restore Files To")
+        if not target_dir:
+            return
+        
+        selection = simpledialog.askstring(
+            "Restore Selection",
+            "Folders or glob patterns to restore, separated by ';'\n(leave empty to restore everything):",
+            parent=self.root
+        )
+        if selection is None:
+            return
+        patterns = [pattern.strip() for pattern in selection.split(";") if pattern.strip()]
+        
+        response = messagebox.askyesno(
+            "Confirm Restore",
+            f"Restore {', '.join(patterns) if patterns else 'everything'} from {os.path.basename(manifest_file)} to {target_dir}?\n\n"
+            f"Existing files with the same names will be overwritten."
+        )
+        if not response:
+            return
+        
+        self.run_operation(
+            target_dir, "restore", manifest_file, target_dir, patterns,
+            error_title="Restore Failed",
+            error_text="An error occurred during restore"
+        )
     
     def update_result_display(self, text):
-        """Update the result display with new text and log it."""
+        """Append text to the result display, keeping at most MAX_DISPLAY_LINES lines."""
         self.result_display.config(state="normal")
         self.result_display.insert(tk.END, text)
+        
+        # Drop the oldest lines once the display is full
+        line_count = int(self.result_display.index("end-1c").split(".")[0])
+        if line_count > self.MAX_DISPLAY_LINES:
+            self.result_display.delete("1.0", f"{line_count - self.MAX_DISPLAY_LINES + 1}.0")
+        
         self.result_display.see(tk.END)
         self.result_display.config(state="disabled")
         
-        # Also log to file (remove empty lines and format)
+        # Also log to file, from the background mirror thread
         if text.strip():
-            # Remove ANSI codes and excessive newlines
-            clean_text = text.strip()
-            if clean_text and clean_text != "="*50:
-                logging.info(clean_text)
-
-
-def check_admin_privileges():
-    """Check if the application is running with administrator privileges."""
-    if sys.platform == "win32":
-        try:
-            return ctypes.windll.shell32.IsUserAnAdmin()
-        except:
-            return False
-    return True  # Assume admin on non-Windows platforms
+            self.log_queue.put(text)
+    
+    def mirror_display_to_log(self):
+        """Write display output to the log file so file I/O never blocks the Tk thread."""
+        while True:
+            text = self.log_queue.get()
+            for line in text.splitlines():
+                # Skip empty lines and separators
+                clean_text = line.strip()
+                if clean_text and clean_text != "="*50:
+                    logging.info(clean_text)
 
 
 def restart_as_admin():
@@ -820,8 +860,11 @@ def restart_as_admin():
 
 def main():
     """Main entry point for the application."""
+    # Open the window, print the time to first paint and exit (for startup regression checks)
+    measure_startup = sys.argv[1:] == ["--startup-time"]
+    
     # Check for administrator privileges (required for repair function)
-    if sys.platform == "win32" and not check_admin_privileges():
+    if sys.platform == "win32" and not measure_startup and not check_admin_privileges():
         response = messagebox.askyesno(
             "Administrator Privileges",
             "Some features require administrator privileges.\n"
@@ -844,7 +887,10 @@ def main():
     # Create and run the application
     root = tk.Tk()
     app = USBCheckerApp(root)
+    app.exit_after_paint = measure_startup
     root.mainloop()
+    if measure_startup and app.first_paint is not None:
+        print(f"Time to first paint: {app.first_paint * 1000:.0f} ms")
 
 
 if __name__ == "__main__":
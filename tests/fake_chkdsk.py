@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Stand-in for chkdsk.exe that prints the output of an NTFS check.
+
+Usage: fake_chkdsk.py VOLUME /f [/r]
+
+Prints the stages with "Progress: ... Total: NN%" lines rewritten in place by
+carriage returns, like chkdsk on Windows 8 and later. /r adds the two bad cluster
+stages. First writes about 200 KB to stderr, more than a pipe buffer holds, so a
+caller that does not drain stderr while reading stdout hangs. Exits with 1
+("errors found and fixed").
+"""
+
+import sys
+import time
+
+STAGES = [
+    "Examining basic file system structure ...",
+    "Examining file name linkage ...",
+    "Examining security descriptors ...",
+    "Looking for bad clusters in user file data ...",
+    "Looking for bad, free clusters ...",
+]
+
+
+def main():
+    deep = "/r" in sys.argv[1:]
+    stages = STAGES if deep else STAGES[:3]
+    
+    sys.stderr.write("chkdsk diagnostic line written to stderr\n" * 5000)
+    sys.stderr.flush()
+    
+    out = sys.stdout
+    out.write("The type of the file system is NTFS.\nVolume label is USB.\n\n")
+    for stage, name in enumerate(stages, 1):
+        out.write(f"Stage {stage}: {name}\n")
+        for percent in range(0, 101, 25):
+            total = int((stage - 1 + percent / 100) / len(stages) * 100)
+            out.write(f"Progress: {percent} of 100 done; Stage: {percent:3d}%; Total: {total:3d}%; ETA:   0:00:0{4 - percent // 25} \r")
+            out.flush()
+            time.sleep(0.005)
+        out.write("\n  256 file records processed.\n")
+        if stage == 1:
+            out.write('Deleting corrupt attribute record (128, "") from file record segment 42.\n')
+            out.write("Correcting error in index $I30 for file 5.\n")
+        if stage == 4:
+            out.write("Adding 3 bad clusters to the Bad Clusters File.\n")
+    out.write("\nWindows has made corrections to the file system.\nNo further action is required.\n\n")
+    out.write("  15,646,719 KB total disk space.\n        12 KB in bad sectors.\n")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Backup, resume and restore round trips on small generated trees."""
+
+import os
+import zipfile
+
+import pytest
+
+from uct_engine import UCTEngine, BackupJournal, journal_path_for, load_journal
+
+
+def make_tree(root, count=12, size=50000):
+    for index in range(count):
+        folder = root / ("c" if index % 2 else "d")
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"file{index:02d}.bin").write_bytes(bytes([index]) * size + os.urandom(size))
+
+
+def engine():
+    engine = UCTEngine()
+    engine.BACKUP_WORKERS = 1
+    return engine
+
+
+def interrupted_backup(monkeypatch, drive, archive, after=4):
+    """Run a backup that dies after `after` members have been journaled."""
+    original = BackupJournal.add
+    calls = []
+    
+    def add(self, *args, **kwargs):
+        original(self, *args, **kwargs)
+        calls.append(args)
+        if len(calls) == after:
+            raise KeyboardInterrupt("simulated interruption")
+    
+    monkeypatch.setattr(BackupJournal, "add", add)
+    with pytest.raises(KeyboardInterrupt):
+        engine().backup(str(drive), str(archive))
+    monkeypatch.undo()
+    
+    _, members = load_journal(journal_path_for(str(archive)))
+    return [record["filename"] for record in members]
+
+
+def check_archive(drive, archive):
+    with zipfile.ZipFile(archive) as zipf:
+        names = zipf.namelist()
+        assert len(names) == len(set(names))
+        on_drive = sorted(
+            os.path.relpath(os.path.join(folder, name), drive).replace(os.sep, "/")
+            for folder, _, files in os.walk(drive) for name in files
+        )
+        assert sorted(names) == on_drive
+        for name in names:
+            with open(os.path.join(drive, name), "rb") as f:
+                assert zipf.read(name) == f.read()
+
+
+def test_resume_after_interruption(tmp_path, monkeypatch):
+    drive = tmp_path / "drive"
+    make_tree(drive)
+    archive = tmp_path / "backup.zip"
+    
+    journaled = interrupted_backup(monkeypatch, drive, archive)
+    result = engine().backup(str(drive), str(archive), resume=True)
+    
+    assert result["verification"]["mismatched"] == []
+    assert not os.path.exists(journal_path_for(str(archive)))
+    check_archive(str(drive), str(archive))
+    assert len(journaled) == 4
+
+
+def test_resume_rearchives_changed_and_deleted_files(tmp_path, monkeypatch):
+    drive = tmp_path / "drive"
+    make_tree(drive)
+    archive = tmp_path / "backup.zip"
+    
+    journaled = interrupted_backup(monkeypatch, drive, archive)
+    changed, deleted = drive / journaled[0], drive / journaled[1]
+    with open(changed, "ab") as f:
+        f.write(b"appended after the interruption")
+    os.remove(deleted)
+    
+    result = engine().backup(str(drive), str(archive), resume=True)
+    
+    assert result["verification"]["mismatched"] == []
+    check_archive(str(drive), str(archive))
+    with open(result["manifest"], encoding="utf-8") as f:
+        assert journaled[1] not in f.read()
+
+
+def test_archive_inside_the_drive_is_not_backed_up(tmp_path):
+    drive = tmp_path / "drive"
+    make_tree(drive)
+    archive = drive / "self.zip"
+    
+    result = engine().backup(str(drive), str(archive))
+    
+    assert result["verification"]["mismatched"] == []
+    with zipfile.ZipFile(archive) as zipf:
+        names = zipf.namelist()
+    assert len(names) == 12
+    assert not any(name.startswith("self.") for name in names)
@@ -0,0 +1,32 @@
+"""Benchmark profiles on a temporary test file."""
+
+import os
+
+import uct_engine
+from uct_engine import IOBenchmark
+
+
+def test_read_profiles_survive_fsync_failing_on_read_only_handles(tmp_path, monkeypatch):
+    # Windows fallback: no direct I/O, no posix_fadvise, fsync rejects read-only handles
+    fsync = os.fsync
+    read_only = set()
+    
+    def open_buffered(path, mode):
+        f = open(path, mode, buffering=0)
+        if mode == "rb":
+            read_only.add(f.fileno())
+        return f, False
+    
+    def strict_fsync(fd):
+        if fd in read_only:
+            raise OSError(9, "Bad file descriptor")
+        fsync(fd)
+    
+    monkeypatch.setattr(uct_engine, "open_unbuffered", open_buffered)
+    monkeypatch.setattr(os, "fsync", strict_fsync)
+    monkeypatch.delattr(os, "posix_fadvise", raising=False)
+    
+    benchmark = IOBenchmark(str(tmp_path / "test.bin"), 4 * 1024 * 1024, queue_depth=2, duration=0.2)
+    for key in ("seq1m-write", "seq1m-read", "rand4k-read"):
+        result = benchmark.run(key)
+        assert result["bytes"] > 0
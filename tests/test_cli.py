@@ -0,0 +1,37 @@
+"""Command line entry points."""
+
+import json
+import os
+import subprocess
+import sys
+
+from uct_engine import UCTEngine, build_parser, run_command
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_uct_command_line_works_without_tkinter(tmp_path):
+    # A tkinter that cannot be imported, as on headless stations without Tk
+    (tmp_path / "tkinter.py").write_text('raise ImportError("No module named _tkinter")\n')
+    env = dict(os.environ, PYTHONPATH=str(tmp_path))
+    
+    completed = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "UCT.py"), "drives", "--json"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60
+    )
+    
+    assert completed.returncode == 0, completed.stderr
+    assert isinstance(json.loads(completed.stdout), list)
+
+
+def test_history_limit_is_not_a_bandwidth_limit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = UCTEngine()
+    limits = []
+    monkeypatch.setattr(engine, "set_io_limit", limits.append)
+    
+    run_command(engine, build_parser().parse_args(["history", "--limit", "5"]))
+    assert limits == []
+    
+    args = build_parser().parse_args(["backup", "src", "out.zip", "--limit", "20"])
+    assert args.io_limit == 20
@@ -0,0 +1,29 @@
+"""Content report and its per-directory cache."""
+
+import os
+
+from uct_engine import ContentAnalyzer, TreeWalker
+
+
+def test_directory_removed_during_the_walk_is_reported_empty(tmp_path, monkeypatch):
+    for folder in ("keep", "gone"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "data.bin").write_bytes(b"x" * 1000)
+    original = TreeWalker.list_directory
+    
+    def list_then_remove(self, path, relpath):
+        result = original(self, path, relpath)
+        if relpath == "":
+            # Disappears after its parent was listed, before it is visited
+            os.remove(tmp_path / "gone" / "data.bin")
+            os.rmdir(tmp_path / "gone")
+        return result
+    
+    monkeypatch.setattr(TreeWalker, "list_directory", list_then_remove)
+    analyzer = ContentAnalyzer(str(tmp_path))
+    summaries = analyzer.run()
+    
+    assert summaries["gone"]["files"] == 0
+    assert summaries["keep"]["files"] == 1
+    assert "gone" not in analyzer.changed
+    assert analyzer.report()["files"] == 1
@@ -0,0 +1,15 @@
+"""Drive inventory details that do not need real removable drives."""
+
+import os
+from types import SimpleNamespace
+
+from uct_engine import DriveInventory
+
+
+def test_linux_labels_undo_udev_escapes_only(monkeypatch):
+    names = ["Über\\x20Stick", "BACKUP\\x2fOLD", "plain"]
+    entries = [SimpleNamespace(name=name, path=f"/dev/sd{letter}1") for name, letter in zip(names, "abc")]
+    monkeypatch.setattr(os, "scandir", lambda path: iter(entries))
+    
+    labels = DriveInventory._linux_labels()
+    assert labels == {"/dev/sda1": "Über Stick", "/dev/sdb1": "BACKUP/OLD", "/dev/sdc1": "plain"}
@@ -0,0 +1,51 @@
+"""Background priority of operations."""
+
+import sys
+from types import SimpleNamespace
+
+import psutil
+
+import uct_engine
+from uct_engine import BackgroundPriority
+
+NORMAL = 0x20
+BELOW_NORMAL = 0x4000
+
+
+class FakeProcess:
+    """A Windows process as psutil reports it: one priority class and I/O priority for all threads."""
+    
+    priority = NORMAL
+    io_priority = 2
+    
+    def nice(self, value=None):
+        if value is None:
+            return FakeProcess.priority
+        FakeProcess.priority = value
+    
+    def ionice(self, value=None):
+        if value is None:
+            return FakeProcess.io_priority
+        FakeProcess.io_priority = value
+
+
+def test_windows_process_priority_is_restored_by_the_last_background_job(monkeypatch):
+    fake_psutil = SimpleNamespace(
+        Process=FakeProcess, Error=psutil.Error, BELOW_NORMAL_PRIORITY_CLASS=BELOW_NORMAL, IOPRIO_VERYLOW=0
+    )
+    monkeypatch.setattr(uct_engine, "psutil", fake_psutil)
+    monkeypatch.setattr(sys, "platform", "win32")
+    
+    first, second = BackgroundPriority(), BackgroundPriority()
+    first.__enter__()
+    second.__enter__()
+    assert (FakeProcess.priority, FakeProcess.io_priority) == (BELOW_NORMAL, 0)
+    
+    first.__exit__(None, None, None)
+    assert (FakeProcess.priority, FakeProcess.io_priority) == (BELOW_NORMAL, 0)  # second is still running
+    
+    second.__exit__(None, None, None)
+    assert (FakeProcess.priority, FakeProcess.io_priority) == (NORMAL, 2)
+    
+    with BackgroundPriority(enabled=False):
+        assert FakeProcess.priority == NORMAL
@@ -0,0 +1,22 @@
+"""Profiling of operations that work in pool threads."""
+
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+from uct_engine import ThreadProfiler
+
+
+def pool_work(n):
+    return sum(range(n))
+
+
+def test_profile_includes_worker_threads(tmp_path):
+    stats_file = str(tmp_path / "run.prof")
+    with ThreadProfiler() as profiler:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            assert list(pool.map(pool_work, [1000] * 4)) == [499500] * 4
+    profiler.dump(stats_file)
+    
+    functions = {function for _, _, function in pstats.Stats(stats_file).stats}
+    assert "pool_work" in functions
+    assert "map" in functions  # Called on the main thread
@@ -0,0 +1,81 @@
+"""Repair runner against the chkdsk stand-in in fake_chkdsk.py."""
+
+import os
+import sys
+import threading
+
+import pytest
+
+from uct_engine import ChkdskRunner, UCTEngine
+
+FAKE_CHKDSK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_chkdsk.py")
+
+
+def run(*arguments):
+    lines = []
+    progress = []
+    runner = ChkdskRunner(
+        [sys.executable, FAKE_CHKDSK, "E:", "/f", *arguments],
+        stages=5 if "/r" in arguments else 3,
+        on_line=lines.append,
+        on_progress=lambda fraction, stage, eta: progress.append((fraction, stage, eta))
+    )
+    
+    # A runner that does not drain stderr concurrently deadlocks on the stand-in
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(runner.run()), daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "chkdsk runner blocked"
+    return result, lines, progress
+
+
+def test_progress_follows_stages_and_percentages():
+    _, lines, progress = run("/r")
+    fractions = [fraction for fraction, _, _ in progress]
+    
+    assert fractions == sorted(fractions)
+    assert fractions[-1] == 1.0
+    assert {stage for _, stage, _ in progress} == {1, 2, 3, 4, 5}
+    assert (0.5, 3, 2) in [(fraction, stage, eta) for fraction, stage, eta in progress]
+    assert progress[-1][2] == 0
+    # Progress lines update the bar instead of being shown
+    assert not any(line.startswith("Progress:") for line in lines)
+    assert "Stage 4: Looking for bad clusters in user file data ...\n" in lines
+
+
+def test_summary_fields():
+    summary, _, _ = run("/r")
+    
+    assert summary["returncode"] == 1
+    assert summary["result"] == "errors found and fixed"
+    assert summary["stages"] == 5
+    assert summary["bad_sectors_kb"] == 12
+    assert summary["bad_clusters"] == 3
+    assert summary["total_kb"] == 15646719
+    assert summary["corrections"] == [
+        'Deleting corrupt attribute record (128, "") from file record segment 42.',
+        "Correcting error in index $I30 for file 5.",
+    ]
+    assert summary["made_corrections"]
+    assert not summary["no_problems"]
+    assert summary["problems_not_fixed"] == []
+
+
+def test_large_stderr_is_drained_and_capped():
+    summary, lines, _ = run()
+    
+    assert summary["stages"] == 3
+    assert len(summary["stderr"]) == ChkdskRunner.MAX_STDERR_LINES
+    assert lines.count("chkdsk diagnostic line written to stderr\n") == 5000
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="runs the stand-in script directly")
+def test_engine_repair_with_stand_in(tmp_path):
+    engine = UCTEngine()
+    engine.CHKDSK_PATH = FAKE_CHKDSK
+    result = engine.repair(str(tmp_path), quick=False)
+    
+    assert result["mode"] == "Deep Repair"
+    assert result["bad_clusters"] == 3
+    assert engine.event.fraction == 1.0
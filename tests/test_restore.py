@@ -0,0 +1,89 @@
+"""Incremental manifest chains and selective restore."""
+
+import os
+import zipfile
+
+import pytest
+
+from uct_engine import UCTEngine, restore_backup
+
+BASE_TIME = 1_600_000_000
+
+
+def engine():
+    engine = UCTEngine()
+    engine.BACKUP_WORKERS = 1
+    return engine
+
+
+def write(path, data, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+
+
+def snapshot(root):
+    """Map relative paths to (content, mtime) for every file under root."""
+    files = {}
+    for folder, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(folder, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = (f.read(), int(os.stat(path).st_mtime))
+    return files
+
+
+@pytest.fixture
+def chain(tmp_path):
+    """A full backup followed by an incremental one; returns (drive, incremental manifest)."""
+    drive = tmp_path / "drive"
+    for index in range(6):
+        write(drive / "Documents" / f"doc{index}.txt", f"document {index}\n".encode() * 500, BASE_TIME + index)
+        write(drive / "Photos" / "2020" / f"img{index}.jpg", os.urandom(20000), BASE_TIME + 100 + index)
+    write(drive / "notes.txt", b"top level", BASE_TIME + 200)
+    full = engine().backup(str(drive), str(tmp_path / "full.zip"))
+    
+    write(drive / "Documents" / "doc0.txt", b"rewritten after the full backup", BASE_TIME + 1000)
+    os.remove(drive / "Documents" / "doc1.txt")
+    os.remove(drive / "Photos" / "2020" / "img0.jpg")
+    write(drive / "Photos" / "2021" / "new.jpg", os.urandom(30000), BASE_TIME + 1001)
+    incremental = engine().backup(str(drive), str(tmp_path / "incremental.zip"), full["manifest"])
+    
+    with zipfile.ZipFile(tmp_path / "incremental.zip") as zipf:
+        assert sorted(zipf.namelist()) == ["Documents/doc0.txt", "Photos/2021/new.jpg"]
+    return drive, incremental["manifest"]
+
+
+def test_incremental_chain_restores_the_drive(chain, tmp_path):
+    drive, manifest = chain
+    target = tmp_path / "restored"
+    
+    result = engine().restore(manifest, str(target))
+    
+    assert snapshot(target) == snapshot(drive)  # Contents and modification times
+    assert result["restored"] == 12
+
+
+def test_select_subtree_and_glob(chain, tmp_path):
+    drive, manifest = chain
+    target = tmp_path / "selected"
+    
+    engine().restore(manifest, str(target), ["Documents", "Photos/*/new.jpg"])
+    
+    expected = {path: value for path, value in snapshot(drive).items()
+                if path.startswith("Documents/") or path == "Photos/2021/new.jpg"}
+    assert snapshot(target) == expected
+    assert len(expected) == 6
+
+
+def test_unsafe_member_is_rejected(tmp_path):
+    archive = tmp_path / "evil.zip"
+    with zipfile.ZipFile(archive, "w") as zipf:
+        zipf.writestr("fine.txt", b"fine")
+        zipf.writestr("../escaped.txt", b"outside the target")
+    target = tmp_path / "target"
+    
+    with pytest.raises(ValueError, match="Unsafe path"):
+        restore_backup(str(archive), str(target))
+    assert not (tmp_path / "escaped.txt").exists()
+    assert not target.exists()
@@ -0,0 +1,57 @@
+"""Job scheduling across drives and volumes."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import uct_engine
+from uct_engine import JobScheduler, volume_key
+
+
+@pytest.fixture
+def mounts(monkeypatch):
+    partitions = [
+        SimpleNamespace(device="/dev/sda2", mountpoint="/"),
+        SimpleNamespace(device="/dev/sdb1", mountpoint="/media/usb"),
+        SimpleNamespace(device="/dev/sdc1", mountpoint="/media/usb2"),
+    ]
+    monkeypatch.setattr(uct_engine.psutil, "disk_partitions", lambda all=False: partitions)
+
+
+@pytest.mark.skipif(uct_engine.sys.platform == "win32", reason="POSIX mount points")
+def test_volume_key(mounts):
+    assert volume_key("/media/usb") == "/media/usb"
+    assert volume_key("/media/usb/Restored/new") == "/media/usb"
+    assert volume_key("/dev/sdb1") == "/media/usb"
+    assert volume_key("/media/usb2/x") == "/media/usb2"
+    assert volume_key("/home/user") == "/"
+
+
+@pytest.mark.skipif(uct_engine.sys.platform == "win32", reason="POSIX mount points")
+def test_jobs_on_one_volume_run_one_after_another(mounts):
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+    
+    def operation(engine, name):
+        with lock:
+            running.append(name)
+            overlaps.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(name)
+        return name
+    
+    scheduler = JobScheduler()
+    jobs = [
+        scheduler.submit("/media/usb", operation, "backup"),
+        scheduler.submit("/media/usb/Restored", operation, "restore"),
+    ]
+    assert scheduler.is_busy("/media/usb/other")
+    assert not scheduler.is_busy("/media/usb2")
+    scheduler.wait()
+    
+    assert [job.result for job in jobs] == ["backup", "restore"]
+    assert max(overlaps) == 1
@@ -0,0 +1,57 @@
+"""Surface scans of generated image files."""
+
+import os
+
+import pytest
+
+from uct_engine import SurfaceScanner, UCTEngine
+
+REGION = 256 * 1024
+BAD_OFFSET = 3 * REGION + SurfaceScanner.SECTOR_RETRY  # Second retry step of the fourth region
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "usb.img"
+    path.write_bytes(os.urandom(8 * REGION))
+    return str(path)
+
+
+@pytest.fixture
+def bad_sector(monkeypatch):
+    """Fail every read that touches BAD_OFFSET, and never call a region slow."""
+    original = SurfaceScanner._read
+    
+    def _read(self, f, view, offset, length):
+        if offset <= BAD_OFFSET < offset + length:
+            raise OSError("simulated read error")
+        return original(self, f, view, offset, length)
+    
+    monkeypatch.setattr(SurfaceScanner, "_read", _read)
+    monkeypatch.setattr(SurfaceScanner, "SLOW_FACTOR", float("inf"))
+
+
+def test_scan_maps_unreadable_sectors(image, bad_sector):
+    result = SurfaceScanner(image, readers=3, region_size=REGION).run()
+    
+    sectors_per_region = REGION // SurfaceScanner.SECTOR_SIZE
+    first_bad = BAD_OFFSET // SurfaceScanner.SECTOR_SIZE
+    last_bad = first_bad + SurfaceScanner.SECTOR_RETRY // SurfaceScanner.SECTOR_SIZE - 1
+    assert result["cells"] == "...X...."
+    assert result["regions"] == 8
+    assert result["unreadable"] == 1
+    assert result["bad_bytes"] == SurfaceScanner.SECTOR_RETRY
+    assert result["bad_sectors"] == [(first_bad, last_bad)]
+    assert [(entry["start_sector"], entry["end_sector"], entry["status"], entry["bad_bytes"]) for entry in result["map"]] == [
+        (0, 3 * sectors_per_region - 1, "ok", 0),
+        (3 * sectors_per_region, 4 * sectors_per_region - 1, "unreadable", SurfaceScanner.SECTOR_RETRY),
+        (4 * sectors_per_region, 8 * sectors_per_region - 1, "ok", 0),
+    ]
+
+
+def test_engine_scan_region_size(image, bad_sector):
+    result = UCTEngine().surface_scan(image, readers=2, region_size=REGION)
+    
+    assert result["region_size"] == REGION
+    assert result["cells"] == "...X...."
+    assert SurfaceScanner.REGION_SIZE == 4 * 1024 * 1024  # Other scans keep the default
@@ -0,0 +1,53 @@
+"""Parallel directory walk: completeness and stable order."""
+
+import os
+import time
+import zipfile
+
+from uct_engine import TreeWalker, UCTEngine
+
+
+def make_tree(root):
+    for folder in ("b/z", "b/a", "a", "c/deep/er", ""):
+        path = root / folder
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ("y.txt", "x.txt", "10.txt", "2.txt"):
+            (path / name).write_text(f"{folder}/{name}")
+
+
+def test_walk_matches_os_walk_in_depth_first_name_order(tmp_path):
+    make_tree(tmp_path)
+    expected = []
+    for folder, dirs, files in os.walk(tmp_path):
+        dirs.sort()
+        relpath = os.path.relpath(folder, tmp_path).replace(os.sep, "/")
+        expected.extend(name if relpath == "." else f"{relpath}/{name}" for name in sorted(files))
+    
+    assert [entry[1] for entry in TreeWalker(str(tmp_path)).walk()] == expected
+
+
+def test_walk_order_does_not_depend_on_listing_speed(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    original = TreeWalker.list_directory
+    
+    def slow_first_directories(self, path, relpath):
+        # Directories found first finish last
+        if relpath in ("a", "b"):
+            time.sleep(0.05)
+        return original(self, path, relpath)
+    
+    expected = [entry[1] for entry in TreeWalker(str(tmp_path)).walk()]
+    monkeypatch.setattr(TreeWalker, "list_directory", slow_first_directories)
+    assert [entry[1] for entry in TreeWalker(str(tmp_path)).walk()] == expected
+
+
+def test_backups_of_the_same_tree_have_the_same_member_order(tmp_path):
+    drive = tmp_path / "drive"
+    make_tree(drive)
+    orders = []
+    for run in range(3):
+        archive = tmp_path / f"backup{run}.zip"
+        UCTEngine().backup(str(drive), str(archive))
+        with zipfile.ZipFile(archive) as zipf:
+            orders.append(zipf.namelist())
+    assert orders[0] == orders[1] == orders[2]
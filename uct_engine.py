@@ -0,0 +1,4140 @@
+"""Headless UCT engine: analysis, benchmark, backup, restore and repair without a GUI.
+
+Usage: python uct_engine.py analyze E:\\ --json
+       python uct_engine.py backup /media/usb backup.zip --workers 8
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import importlib
+import zlib
+import json
+import bisect
+import heapq
+import itertools
+import fnmatch
+import re
+import atexit
+import struct
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty, Full
+from datetime import datetime
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access.
+    
+    Keeps heavy or rarely used imports off the startup path. The module's namespace
+    is copied in on first use, so later lookups cost the same as on the module.
+    """
+    
+    def __init__(self, name):
+        self.__dict__["_lazy_name"] = name
+    
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__dict__["_lazy_name"])
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+    
+    def __repr__(self):
+        return f"<lazy module {self.__dict__['_lazy_name']!r}>"
+
+
+# Loaded on first use: the GUI paints its window before any of these are needed
+argparse = LazyModule("argparse")
+cProfile = LazyModule("cProfile")
+ctypes = LazyModule("ctypes")
+hashlib = LazyModule("hashlib")
+lzma = LazyModule("lzma")
+mmap = LazyModule("mmap")
+pstats = LazyModule("pstats")
+psutil = LazyModule("psutil")
+random = LazyModule("random")
+shutil = LazyModule("shutil")
+sqlite3 = LazyModule("sqlite3")
+statistics = LazyModule("statistics")
+subprocess = LazyModule("subprocess")
+tempfile = LazyModule("tempfile")
+zipfile = LazyModule("zipfile")
+
+
+LOG_FILE = "usb_checker.log"
+LOG_MAX_SIZE = 10 * 1024 * 1024  # 10 MB
+LOG_BACKUP_COUNT = 5  # Rotated log files kept as usb_checker.log.1 ... .5
+OPERATIONS_LOG = "usb_checker.operations.jsonl"
+HISTORY_DB = "usb_checker_history.db"
+CONTENT_INDEX_DB = "usb_checker_index.db"
+MANIFEST_SUFFIX = ".manifest.jsonl"
+JOURNAL_SUFFIX = ".journal.jsonl"
+IMAGE_INFO_SUFFIX = ".image.json"
+
+ArchivedMember = namedtuple("ArchivedMember", ["entry", "zinfo", "digest", "error"])
+BenchmarkProfile = namedtuple("BenchmarkProfile", ["name", "block_size", "random", "read_ratio", "queue_depth"])
+
+
+class ProgressEvent(namedtuple("ProgressEvent", ["phase", "bytes_done", "bytes_total", "items_done", "items_total", "timestamp"])):
+    """Structured progress of an operation, published by the engine from its worker thread."""
+    
+    __slots__ = ()
+    
+    @property
+    def fraction(self):
+        """Completed fraction (0-1), by bytes when the total is known, otherwise by items."""
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        if self.items_total:
+            return min(self.items_done / self.items_total, 1.0)
+        return 0.0
+
+
+class ThroughputMeter:
+    """Moving-average throughput and ETA over the last WINDOW seconds of progress events."""
+    
+    WINDOW = 5.0  # Seconds
+    
+    def __init__(self):
+        self.samples = deque()
+    
+    def update(self, event):
+        self.samples.append((event.timestamp, event.bytes_done, event.fraction))
+        while len(self.samples) > 2 and event.timestamp - self.samples[0][0] > self.WINDOW:
+            self.samples.popleft()
+    
+    def _span(self):
+        samples = list(self.samples)
+        if len(samples) < 2 or samples[-1][0] <= samples[0][0]:
+            return None
+        return samples[0], samples[-1]
+    
+    @property
+    def mbps(self):
+        """Recent throughput in MB/s."""
+        span = self._span()
+        if not span:
+            return 0.0
+        (start_time, start_bytes, _), (end_time, end_bytes, _) = span
+        return max(end_bytes - start_bytes, 0) / (1024 * 1024) / (end_time - start_time)
+    
+    @property
+    def eta(self):
+        """Estimated seconds until completion, or None if progress has stalled."""
+        span = self._span()
+        if not span:
+            return None
+        (start_time, _, start_fraction), (end_time, _, end_fraction) = span
+        rate = (end_fraction - start_fraction) / (end_time - start_time)
+        if rate <= 0:
+            return None
+        return (1.0 - end_fraction) / rate
+
+
+class TraceSpan:
+    """A timed phase; records itself in its tracer when the with block ends."""
+    
+    __slots__ = ("tracer", "name", "category", "args", "start")
+    
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args["error"] = str(exc_value)
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter() - self.start, self.args)
+
+
+class Tracer:
+    """Thread-safe phase timings and byte/file counters of an operation.
+    
+    Totals per phase and counters are always kept. With events=True every span is
+    also stored, with its thread, for export as Chrome trace-event JSON
+    (chrome://tracing or ui.perfetto.dev).
+    """
+    
+    def __init__(self, events=False):
+        self.events = [] if events else None
+        self.phases = {}  # name -> [seconds, count]
+        self.counters = {}
+        self.threads = {}
+        self._lock = threading.Lock()
+    
+    def span(self, name, category="phase", **args):
+        """Time a with block as one phase."""
+        return TraceSpan(self, name, category, args)
+    
+    def record(self, name, category, start, seconds, args=None):
+        """Add a finished span that started at perf_counter() value start."""
+        with self._lock:
+            total = self.phases.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+            if self.events is not None:
+                thread = threading.current_thread()
+                self.threads[thread.ident] = thread.name
+                self.events.append((name, category, start, seconds, thread.ident, args or None))
+    
+    def add(self, name, seconds):
+        """Add time to a phase without a trace event, for steps repeated per chunk."""
+        with self._lock:
+            total = self.phases.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+    
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def merge(self, other):
+        """Fold the phases, counters and events of another tracer into this one."""
+        with self._lock, other._lock:
+            for name, (seconds, count) in other.phases.items():
+                total = self.phases.setdefault(name, [0.0, 0])
+                total[0] += seconds
+                total[1] += count
+            for name, value in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            if self.events is not None and other.events:
+                self.events.extend(other.events)
+                self.threads.update(other.threads)
+    
+    def summary(self):
+        """Return {"phases": {name: {"seconds", "count"}}, "counters": {...}} sorted by time spent."""
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda item: -item[1][0])
+            return {
+                "phases": {name: {"seconds": round(seconds, 4), "count": count} for name, (seconds, count) in phases},
+                "counters": dict(self.counters),
+            }
+    
+    def export_chrome(self, trace_file):
+        """Write the recorded spans as Chrome trace-event JSON."""
+        with self._lock:
+            events = list(self.events or ())
+            threads = dict(self.threads)
+            counters = dict(self.counters)
+        origin = min((event[2] for event in events), default=0.0)
+        pid = os.getpid()
+        trace = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        end = 0.0
+        for name, category, start, seconds, tid, args in events:
+            record = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - origin) * 1e6, 1),
+                "dur": round(seconds * 1e6, 1),
+                "pid": pid,
+                "tid": tid,
+            }
+            if args:
+                record["args"] = args
+            trace.append(record)
+            end = max(end, record["ts"] + record["dur"])
+        if counters:
+            trace.append({"name": "counters", "ph": "C", "ts": end, "pid": pid, "args": counters})
+        with open(trace_file, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, default=str)
+
+
+class ThreadProfiler:
+    """cProfile over the calling thread and every thread started while it is active.
+    
+    A Profile only sees the thread that enabled it, and backups, analyses and scans do
+    their work in pool threads. Each new thread therefore enables its own Profile from a
+    threading.setprofile() hook, and dump() merges them all into one stats file.
+    """
+    
+    PER_THREAD = sys.version_info < (3, 12)  # From 3.12 cProfile uses sys.monitoring, which covers every thread
+    
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        if self.PER_THREAD:
+            threading.setprofile(self._start_thread)
+        self._start_thread()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiles[0].disable()
+        threading.setprofile(None)
+    
+    def _start_thread(self, *event):
+        """Profile the current thread; replaces the setprofile() hook on the thread's first event."""
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+    
+    def dump(self, stats_file):
+        """Write the merged stats of all threads, loadable with python -m pstats."""
+        with self._lock:
+            stats = pstats.Stats(*self.profiles)
+        stats.dump_stats(stats_file)
+
+
+class RateLimiter:
+    """Token bucket shared by every read and write path that should respect a bandwidth limit.
+    
+    consume() blocks until the bucket holds enough tokens; a request larger than the
+    bucket is let through and leaves a debt the following requests wait off. The rate
+    can be changed at any time, including while other threads are waiting.
+    """
+    
+    BURST = 0.25  # Seconds of transfer the bucket can hold
+    
+    def __init__(self, rate=0):
+        self.rate = 0  # Bytes per second, 0 = unlimited
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self._condition = threading.Condition()
+        self.set_rate(rate)
+    
+    def set_rate(self, rate):
+        """Change the limit in bytes per second (0 lifts it) and wake waiting threads."""
+        with self._condition:
+            self._refill(time.monotonic())
+            self.rate = max(0, int(rate or 0))
+            self.tokens = min(self.tokens, self.rate * self.BURST)
+            self._condition.notify_all()
+    
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.rate * self.BURST)
+        self.updated = now
+    
+    def consume(self, amount):
+        """Wait until amount bytes may be transferred."""
+        if not self.rate:
+            return
+        with self._condition:
+            while self.rate:
+                self._refill(time.monotonic())
+                if self.tokens >= 0:
+                    self.tokens -= amount
+                    return
+                self._condition.wait(-self.tokens / self.rate)
+
+
+class BackgroundPriority:
+    """Lower the CPU and I/O priority of the calling thread, and the threads it starts, while in use.
+    
+    On Linux nice and ionice apply per thread, so only the operation's threads are
+    demoted. On Windows the whole process gets a lower priority class and I/O priority,
+    so other jobs running at the same time are demoted too; the process is demoted by the
+    first background operation and restored when the last one finishes.
+    """
+    
+    NICE = 10
+    
+    _lock = threading.Lock()
+    _process_users = 0  # Background operations currently holding the Windows process demotion
+    _process_saved = None  # (priority class, I/O priority) to restore when the last one exits
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.process = None
+        self.saved = None
+    
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        if sys.platform == "win32":
+            self._demote_process()
+            return self
+        try:
+            self.process = psutil.Process(threading.get_native_id())
+            self.saved = (self.process.nice(), self.process.ionice() if hasattr(self.process, "ionice") else None)
+            self.process.nice(max(self.saved[0], self.NICE))
+            if self.saved[1] is not None:
+                self.process.ionice(psutil.IOPRIO_CLASS_IDLE)
+            logging.info("Running with background priority")
+        except (psutil.Error, OSError) as e:
+            logging.warning(f"Cannot lower process priority: {e}")
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.enabled:
+            return
+        if sys.platform == "win32":
+            self._restore_process()
+            return
+        if not self.saved:
+            return
+        nice, ionice = self.saved
+        try:
+            if ionice is not None:
+                self.process.ionice(ionice.ioclass, ionice.value)
+            self.process.nice(nice)
+        except (psutil.Error, OSError) as e:
+            # Raising the priority again may need privileges; the demoted threads are finishing anyway
+            logging.info(f"Could not restore priority after background operation: {e}")
+    
+    @classmethod
+    def _demote_process(cls):
+        with cls._lock:
+            cls._process_users += 1
+            if cls._process_users > 1:
+                return  # Already demoted by another background operation
+            try:
+                process = psutil.Process()
+                cls._process_saved = (process.nice(), process.ionice())
+                process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+                process.ionice(psutil.IOPRIO_VERYLOW)
+                logging.info("Running with background priority")
+            except (psutil.Error, OSError) as e:
+                logging.warning(f"Cannot lower process priority: {e}")
+    
+    @classmethod
+    def _restore_process(cls):
+        with cls._lock:
+            cls._process_users -= 1
+            if cls._process_users or not cls._process_saved:
+                return
+            nice, ionice = cls._process_saved
+            cls._process_saved = None
+            try:
+                process = psutil.Process()
+                process.ionice(ionice)
+                process.nice(nice)
+            except (psutil.Error, OSError) as e:
+                logging.info(f"Could not restore priority after background operation: {e}")
+
+
+def aligned_buffer(size, fill=False):
+    """Return a page-aligned buffer, as required for direct (uncached) I/O."""
+    buffer = mmap.mmap(-1, size)
+    if fill:
+        buffer.write(os.urandom(size))
+        buffer.seek(0)
+    return buffer
+
+
+def open_unbuffered(path, mode):
+    """Open a file for I/O that bypasses the OS page cache where the platform allows it.
+    
+    Returns (raw file object, True if the cache is bypassed). Offsets, sizes
+    and buffers must then be sector aligned.
+    """
+    if sys.platform == "win32":
+        try:
+            import msvcrt
+            from ctypes import wintypes
+            
+            GENERIC_READ = 0x80000000
+            GENERIC_WRITE = 0x40000000
+            FILE_SHARE_READ_WRITE = 0x00000003
+            CREATE_ALWAYS = 2
+            OPEN_EXISTING = 3
+            FILE_FLAG_NO_BUFFERING = 0x20000000
+            FILE_FLAG_WRITE_THROUGH = 0x80000000
+            
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            kernel32.CreateFileW.restype = wintypes.HANDLE
+            access = GENERIC_READ if mode == "rb" else GENERIC_READ | GENERIC_WRITE
+            disposition = CREATE_ALWAYS if mode == "wb" else OPEN_EXISTING
+            handle = kernel32.CreateFileW(
+                path, access, FILE_SHARE_READ_WRITE, None, disposition,
+                FILE_FLAG_NO_BUFFERING | FILE_FLAG_WRITE_THROUGH, None
+            )
+            if handle in (None, wintypes.HANDLE(-1).value):
+                raise ctypes.WinError(ctypes.get_last_error())
+            
+            fd = msvcrt.open_osfhandle(handle, os.O_RDONLY if mode == "rb" else os.O_RDWR)
+            return open(fd, "r+b" if mode == "wb" else mode, buffering=0), True
+        except Exception as e:
+            logging.warning(f"Unbuffered I/O not available for {path}: {e}")
+    elif hasattr(os, "O_DIRECT"):
+        flags = {"rb": os.O_RDONLY, "r+b": os.O_RDWR, "wb": os.O_RDWR | os.O_CREAT | os.O_TRUNC}[mode]
+        try:
+            fd = os.open(path, flags | os.O_DIRECT, 0o644)
+            return open(fd, "r+b" if mode == "wb" else mode, buffering=0), True
+        except OSError as e:
+            logging.warning(f"O_DIRECT not supported for {path}: {e}")
+    
+    f = open(path, mode, buffering=0)
+    if sys.platform == "darwin":
+        try:
+            import fcntl
+            fcntl.fcntl(f.fileno(), fcntl.F_NOCACHE, 1)
+            return f, True
+        except Exception as e:
+            logging.warning(f"F_NOCACHE not supported for {path}: {e}")
+    return f, False
+
+
+def drop_file_cache(f):
+    """Flush a file to the device and evict its pages from the OS cache if possible.
+    
+    Best effort: returns False if the pages could not be evicted. Only handles opened for
+    writing are flushed, since fsync on a read-only handle fails on Windows.
+    """
+    try:
+        if f.writable():
+            os.fsync(f.fileno())
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            return True
+    except OSError as e:
+        logging.warning(f"Cannot evict {f.name} from the OS cache: {e}")
+    return False
+
+
+def detect_throughput_cliff(timeline, drop=0.5, sustained=3):
+    """Find a sustained throughput drop, as caused by an exhausted SLC cache or thermal throttling.
+    
+    Returns (offset_mb, speed_before, speed_after) or None.
+    """
+    if len(timeline) < sustained * 2:
+        return None
+    
+    baseline = statistics.median(mbps for _, mbps in timeline[:max(sustained, len(timeline) // 4)])
+    for index in range(len(timeline) - sustained + 1):
+        window = timeline[index:index + sustained]
+        if all(mbps < baseline * drop for _, mbps in window):
+            after = statistics.median(mbps for _, mbps in timeline[index:])
+            return timeline[index][0], baseline, after
+    return None
+
+
+class IOBenchmark:
+    """Run sequential and random I/O profiles against a test file on the drive.
+    
+    The test file is opened with the OS cache bypassed where possible, so the
+    numbers describe the drive rather than RAM. Queue depth is emulated with one
+    thread and file handle per outstanding request. Sequential profiles run at
+    queue depth 1 and record a throughput timeline; random profiles use the
+    configured depth and run for a fixed duration.
+    """
+    
+    PROFILES = {
+        "seq1m-write": BenchmarkProfile("Seq 1M Write", 1024 * 1024, False, 0.0, 1),
+        "seq1m-read": BenchmarkProfile("Seq 1M Read", 1024 * 1024, False, 1.0, 1),
+        "rand4k-read": BenchmarkProfile("Random 4K Read", 4096, True, 1.0, None),
+        "rand4k-write": BenchmarkProfile("Random 4K Write", 4096, True, 0.0, None),
+        "mixed": BenchmarkProfile("Mixed 4K 70/30", 4096, True, 0.7, None),
+    }
+    HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500)
+    TIMELINE_WINDOW = 8 * 1024 * 1024  # One throughput sample per 8 MB
+    
+    def __init__(self, test_file, file_size, queue_depth=1, duration=5.0, limiter=None):
+        self.test_file = test_file
+        self.file_size = file_size
+        self.queue_depth = queue_depth
+        self.duration = duration
+        self.limiter = limiter or RateLimiter()
+    
+    def run(self, key):
+        """Run one profile and return its result dict."""
+        profile = self.PROFILES[key]
+        if not profile.random:
+            if profile.read_ratio == 0:
+                return self._sequential(key, profile, write=True)
+            self._ensure_test_file()
+            return self._sequential(key, profile, write=False)
+        
+        self._ensure_test_file()
+        queue_depth = profile.queue_depth or self.queue_depth
+        deadline = time.perf_counter() + self.duration
+        latencies = [[] for _ in range(queue_depth)]
+        direct = []
+        errors = []
+        threads = [
+            threading.Thread(target=self._worker, args=(profile, deadline, latencies[i], direct, errors, i), daemon=True)
+            for i in range(queue_depth)
+        ]
+        
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+        
+        if errors:
+            raise errors[0]
+        merged = [latency for thread_latencies in latencies for latency in thread_latencies]
+        return self._summarize(key, profile, merged, elapsed, queue_depth, all(direct))
+    
+    def _ensure_test_file(self):
+        """Lay out the test file for the read profiles if the write profile has not run."""
+        if not os.path.exists(self.test_file) or os.path.getsize(self.test_file) < self.file_size:
+            self._sequential("seq1m-write", self.PROFILES["seq1m-write"], write=True)
+    
+    def _sequential(self, key, profile, write):
+        """Stream the whole test file through one reused chunk buffer and record a timeline."""
+        block_size = profile.block_size
+        blocks = self.file_size // block_size
+        blocks_per_sample = max(1, self.TIMELINE_WINDOW // block_size)
+        buffer = aligned_buffer(block_size, fill=write)
+        latencies = []
+        timeline = []
+        
+        f, direct = open_unbuffered(self.test_file, "wb" if write else "rb")
+        try:
+            if not write and not direct:
+                drop_file_cache(f)
+            
+            start_time = time.perf_counter()
+            sample_start = start_time
+            for index in range(blocks):
+                self.limiter.consume(block_size)
+                op_start = time.perf_counter()
+                if write:
+                    f.write(buffer)
+                else:
+                    f.readinto(buffer)
+                latencies.append(time.perf_counter() - op_start)
+                
+                if (index + 1) % blocks_per_sample == 0 or index + 1 == blocks:
+                    # Without direct I/O, sync each window so it measures the drive, not the cache
+                    if write and not direct:
+                        os.fsync(f.fileno())
+                    now = time.perf_counter()
+                    sample_blocks = (index % blocks_per_sample) + 1
+                    timeline.append((
+                        (index + 1) * block_size / (1024 * 1024),
+                        sample_blocks * block_size / (1024 * 1024) / max(now - sample_start, 1e-9)
+                    ))
+                    sample_start = now
+            
+            if write:
+                os.fsync(f.fileno())
+            elapsed = time.perf_counter() - start_time
+            
+            # Evict the freshly written data so the read profiles hit the drive
+            if write and not direct and not drop_file_cache(f):
+                logging.warning("Cannot evict benchmark file from the OS cache; read results may be cached")
+        finally:
+            f.close()
+            buffer.close()
+        
+        result = self._summarize(key, profile, latencies, elapsed, 1, direct)
+        result["timeline"] = timeline
+        result["cliff"] = detect_throughput_cliff(timeline)
+        return result
+    
+    def _worker(self, profile, deadline, latencies, direct, errors, seed):
+        """Issue random requests from one thread until the duration has elapsed."""
+        rng = random.Random(seed)
+        block_size = profile.block_size
+        blocks = self.file_size // block_size
+        buffer = aligned_buffer(block_size)
+        data = aligned_buffer(block_size, fill=True)
+        
+        try:
+            f, is_direct = open_unbuffered(self.test_file, "rb" if profile.read_ratio >= 1 else "r+b")
+            direct.append(is_direct)
+            with f:
+                if not is_direct:
+                    drop_file_cache(f)
+                
+                while time.perf_counter() < deadline:
+                    offset = rng.randrange(blocks) * block_size
+                    is_read = rng.random() < profile.read_ratio
+                    self.limiter.consume(block_size)
+                    op_start = time.perf_counter()
+                    f.seek(offset)
+                    if is_read:
+                        f.readinto(buffer)
+                    else:
+                        f.write(data)
+                    latencies.append(time.perf_counter() - op_start)
+                
+                if profile.read_ratio < 1:
+                    os.fsync(f.fileno())
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.close()
+            data.close()
+    
+    def _summarize(self, key, profile, latencies, elapsed, queue_depth, direct):
+        """Build the result dict with IOPS, MB/s, latency percentiles and histogram."""
+        latencies_ms = sorted(latency * 1000 for latency in latencies)
+        ops = len(latencies_ms)
+        elapsed = max(elapsed, 1e-9)
+        
+        def percentile(p):
+            if not latencies_ms:
+                return 0.0
+            return latencies_ms[min(ops - 1, int(ops * p / 100))]
+        
+        histogram = []
+        counted = 0
+        for bound in self.HISTOGRAM_BOUNDS_MS:
+            below = bisect.bisect_left(latencies_ms, bound)
+            histogram.append((f"<{bound:g}ms", below - counted))
+            counted = below
+        histogram.append((f">={self.HISTOGRAM_BOUNDS_MS[-1]:g}ms", ops - counted))
+        
+        return {
+            "profile": key,
+            "name": profile.name,
+            "block_size": profile.block_size,
+            "queue_depth": queue_depth,
+            "direct": direct,
+            "ops": ops,
+            "bytes": ops * profile.block_size,
+            "seconds": elapsed,
+            "iops": ops / elapsed,
+            "mbps": ops * profile.block_size / (1024 * 1024) / elapsed,
+            "latency_ms": {
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "max": latencies_ms[-1] if latencies_ms else 0.0,
+            },
+            "histogram": histogram,
+        }
+
+
+def rate_performance(results):
+    """Rate a drive: sequential speed sets the USB class, random 4K writes the small-file tier."""
+    sequential = [results[key]["mbps"] for key in ("seq1m-write", "seq1m-read") if key in results]
+    rating = None
+    if sequential:
+        avg_speed = sum(sequential) / len(sequential)
+        if avg_speed > 100:
+            rating = "Excellent (USB 3.0+)"
+        elif avg_speed > 30:
+            rating = "Good (USB 3.0)"
+        elif avg_speed > 10:
+            rating = "Average (USB 2.0)"
+        else:
+            rating = "Slow (USB 2.0 or older)"
+    
+    random_key = next((key for key in ("rand4k-write", "mixed", "rand4k-read") if key in results), None)
+    if random_key:
+        iops = results[random_key]["iops"]
+        if iops > 1000:
+            tier = "Fast"
+        elif iops > 200:
+            tier = "Average"
+        else:
+            tier = "Slow"
+        small_files = f"small files: {tier} ({iops:.0f} IOPS {results[random_key]['name']})"
+        rating = f"{rating}, {small_files}" if rating else small_files
+    
+    return rating or "Unknown"
+
+
+def drive_identity(drive):
+    """Return a stable identity for the volume: serial or file system UUID plus its size.
+    
+    Falls back to the path when neither is available (plain directories and image files).
+    """
+    total = shutil.disk_usage(drive).total
+    if sys.platform == "win32":
+        try:
+            serial = ctypes.c_uint32()
+            if ctypes.windll.kernel32.GetVolumeInformationW(
+                ctypes.c_wchar_p(os.path.splitdrive(os.path.abspath(drive))[0] + "\\"),
+                None, 0, ctypes.byref(serial), None, None, None, 0
+            ):
+                return f"serial-{serial.value:08X}-{total}"
+        except Exception as e:
+            logging.warning(f"Cannot read volume serial of {drive}: {e}")
+    else:
+        mountpoint = os.path.abspath(drive)
+        partition = next((p for p in psutil.disk_partitions(all=True) if p.mountpoint == mountpoint), None)
+        if partition and partition.device.startswith("/dev/"):
+            device = os.path.realpath(partition.device)
+            try:
+                for entry in os.scandir("/dev/disk/by-uuid"):
+                    if os.path.realpath(entry.path) == device:
+                        return f"uuid-{entry.name}-{total}"
+            except OSError:
+                pass
+    return f"path-{os.path.normcase(os.path.abspath(drive))}-{total}"
+
+
+class BenchmarkHistory:
+    """SQLite store of analysis and benchmark runs per drive, with trend and degradation queries."""
+    
+    DEGRADATION_THRESHOLD = 0.3  # Flag a drop of 30% against the drive's own baseline
+    BASELINE_RUNS = 3  # The first runs of a drive form its baseline
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS drives (
+            identity TEXT PRIMARY KEY,
+            label TEXT,
+            total INTEGER,
+            first_seen TEXT,
+            last_seen TEXT
+        );
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            identity TEXT NOT NULL REFERENCES drives(identity),
+            time TEXT NOT NULL,
+            drive TEXT,
+            used INTEGER,
+            free INTEGER,
+            rating TEXT
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            run_id INTEGER NOT NULL REFERENCES runs(id),
+            profile TEXT NOT NULL,
+            mbps REAL,
+            iops REAL,
+            p50_ms REAL,
+            p99_ms REAL,
+            PRIMARY KEY (run_id, profile)
+        );
+        CREATE INDEX IF NOT EXISTS runs_by_drive ON runs(identity, id);
+        CREATE INDEX IF NOT EXISTS results_by_profile ON results(profile, run_id);
+    """
+    
+    def __init__(self, db_file=HISTORY_DB):
+        self.conn = sqlite3.connect(db_file, timeout=30)
+        self.conn.executescript(self.SCHEMA)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        self.conn.close()
+    
+    def record(self, identity, label, storage, results=None, rating=None):
+        """Store one analysis run (with benchmark results, if any) and return its id."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO drives (identity, label, total, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(identity) DO UPDATE SET label = excluded.label, last_seen = excluded.last_seen",
+                (identity, label, storage["total"], now, now)
+            )
+            run_id = self.conn.execute(
+                "INSERT INTO runs (identity, time, drive, used, free, rating) VALUES (?, ?, ?, ?, ?, ?)",
+                (identity, now, storage["drive"], storage["used"], storage["free"], rating)
+            ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO results (run_id, profile, mbps, iops, p50_ms, p99_ms) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, key, result["mbps"], result["iops"], result["latency_ms"]["p50"], result["latency_ms"]["p99"])
+                    for key, result in (results or {}).items()
+                ]
+            )
+        return run_id
+    
+    def trend(self, identity, profile, limit=20):
+        """Return the latest (time, mbps, iops) results of a profile for a drive, oldest first."""
+        rows = self.conn.execute(
+            "SELECT runs.time, results.mbps, results.iops FROM runs "
+            "JOIN results ON results.run_id = runs.id "
+            "WHERE runs.identity = ? AND results.profile = ? ORDER BY runs.id DESC LIMIT ?",
+            (identity, profile, limit)
+        ).fetchall()
+        return rows[::-1]
+    
+    def profiles(self, identity):
+        """Return the benchmark profiles recorded for a drive."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT results.profile FROM runs JOIN results ON results.run_id = runs.id WHERE runs.identity = ?",
+            (identity,)
+        )]
+    
+    def drives(self):
+        """Return (identity, label, total, first_seen, last_seen, runs) for every known drive."""
+        return self.conn.execute(
+            "SELECT drives.identity, label, total, first_seen, last_seen, COUNT(runs.id) FROM drives "
+            "LEFT JOIN runs ON runs.identity = drives.identity GROUP BY drives.identity ORDER BY last_seen DESC"
+        ).fetchall()
+    
+    def baseline(self, identity, profile):
+        """Return the average MB/s of the drive's first BASELINE_RUNS results for a profile, or None."""
+        row = self.conn.execute(
+            "SELECT AVG(mbps), COUNT(*) FROM ("
+            "SELECT results.mbps FROM runs JOIN results ON results.run_id = runs.id "
+            "WHERE runs.identity = ? AND results.profile = ? ORDER BY runs.id LIMIT ?)",
+            (identity, profile, self.BASELINE_RUNS)
+        ).fetchone()
+        return row[0] if row[1] else None
+    
+    def check_degradation(self, identity, results, threshold=None):
+        """Compare results with the drive's baseline; return (profile, baseline, current, drop) alerts."""
+        threshold = self.DEGRADATION_THRESHOLD if threshold is None else threshold
+        alerts = []
+        for key, result in results.items():
+            baseline = self.baseline(identity, key)
+            if baseline and result["mbps"] < baseline * (1 - threshold):
+                alerts.append((key, baseline, result["mbps"], 1 - result["mbps"] / baseline))
+        return alerts
+    
+    def degraded_drives(self, threshold=None):
+        """Return {identity: alerts} for drives whose latest run dropped below their baseline."""
+        degraded = {}
+        for identity, *_ in self.drives():
+            latest = {}
+            for profile in self.profiles(identity):
+                history = self.trend(identity, profile, limit=1)
+                if history:
+                    latest[profile] = {"mbps": history[-1][1]}
+            alerts = self.check_degradation(identity, latest, threshold)
+            if alerts:
+                degraded[identity] = alerts
+        return degraded
+
+
+class SurfaceScanner:
+    """Read-only surface scan of a block device or image file, split across several readers.
+    
+    Every region is read with aligned readinto() calls into a reused buffer and timed.
+    Unreadable regions are re-read in SECTOR_RETRY steps to narrow down the bad sectors.
+    """
+    
+    SECTOR_SIZE = 512
+    ALIGNMENT = 4096  # Read sizes are rounded up to this for unbuffered I/O
+    REGION_SIZE = 4 * 1024 * 1024  # 4 MB per timed region
+    SECTOR_RETRY = 64 * 1024  # Granularity when narrowing down read errors
+    SLOW_FACTOR = 5.0  # A region is slow if it takes this many times the median
+    SLOW_MS = 1000.0  # ... or longer than this in any case
+    
+    def __init__(self, target, readers=4, region_size=None, on_region=None):
+        self.target = target
+        self.readers = max(1, readers)
+        self.region_size = region_size or self.REGION_SIZE
+        self.on_region = on_region or (lambda done, total, bytes_done, size: None)
+        self.size = self.device_size(target)
+        self.regions = []  # (offset, length, milliseconds, bad_bytes)
+        self.bad_ranges = []  # (first_sector, last_sector) that could not be read
+        self.direct = False
+        self._lock = threading.Lock()
+        self._bytes_done = 0
+    
+    @staticmethod
+    def device_size(target):
+        """Return the size of an image file or block device in bytes."""
+        if os.path.isfile(target):
+            return os.path.getsize(target)
+        if sys.platform == "win32" and target.startswith("\\\\.\\"):
+            # The file system's cluster total leaves out the reserved and FAT areas of the volume
+            import msvcrt
+            IOCTL_DISK_GET_LENGTH_INFO = 0x0007405C
+            length = ctypes.c_longlong()
+            returned = ctypes.c_ulong()
+            with open(target, "rb", buffering=0) as f:
+                if not ctypes.windll.kernel32.DeviceIoControl(
+                    ctypes.c_void_p(msvcrt.get_osfhandle(f.fileno())), IOCTL_DISK_GET_LENGTH_INFO, None, 0,
+                    ctypes.byref(length), ctypes.sizeof(length), ctypes.byref(returned), None
+                ):
+                    raise ctypes.WinError()
+            return length.value
+        with open(target, "rb") as f:
+            return f.seek(0, os.SEEK_END)
+    
+    def run(self):
+        """Scan the whole target and return the summary with its health map."""
+        start = time.perf_counter()
+        total = -(-self.size // self.region_size)
+        per_reader = -(-total // self.readers)
+        slices = [(first, min(first + per_reader, total)) for first in range(0, total, per_reader)]
+        
+        with ThreadPoolExecutor(max_workers=len(slices)) as pool:
+            for future in [pool.submit(self._reader, first, last, total) for first, last in slices]:
+                future.result()
+        
+        self.regions.sort()
+        merged = []
+        for first_sector, last_sector in sorted(self.bad_ranges):
+            if merged and merged[-1][1] + 1 >= first_sector:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last_sector))
+            else:
+                merged.append((first_sector, last_sector))
+        self.bad_ranges = merged
+        return self._summarize(time.perf_counter() - start)
+    
+    def _reader(self, first, last, total):
+        f, direct = open_unbuffered(self.target, "rb")
+        self.direct = self.direct or direct
+        buffer = aligned_buffer(self.region_size)
+        view = memoryview(buffer)
+        try:
+            for index in range(first, last):
+                offset = index * self.region_size
+                length = min(self.region_size, self.size - offset)
+                started = time.perf_counter()
+                bad_bytes = 0
+                try:
+                    self._read(f, view, offset, length)
+                except OSError:
+                    bad_bytes = self._retry(f, view, offset, length)
+                elapsed = (time.perf_counter() - started) * 1000
+                
+                with self._lock:
+                    self.regions.append((offset, length, elapsed, bad_bytes))
+                    self._bytes_done += length
+                    self.on_region(len(self.regions), total, self._bytes_done, self.size)
+        finally:
+            view.release()
+            buffer.close()
+            f.close()
+    
+    def _read(self, f, view, offset, length):
+        """Read length bytes at offset into the buffer; sizes are rounded up for unbuffered I/O."""
+        aligned = -(-length // self.ALIGNMENT) * self.ALIGNMENT
+        f.seek(offset)
+        done = 0
+        while done < length:
+            count = f.readinto(view[done:aligned])
+            if not count:
+                raise OSError(f"Unexpected end of data at offset {offset + done}")
+            done += count
+    
+    def _retry(self, f, view, offset, length):
+        """Re-read a failed region in small steps and return the number of unreadable bytes."""
+        bad_bytes = 0
+        for sub_offset in range(offset, offset + length, self.SECTOR_RETRY):
+            sub_length = min(self.SECTOR_RETRY, offset + length - sub_offset)
+            try:
+                self._read(f, view, sub_offset, sub_length)
+            except OSError as e:
+                bad_bytes += sub_length
+                with self._lock:
+                    self.bad_ranges.append((sub_offset // self.SECTOR_SIZE, (sub_offset + sub_length - 1) // self.SECTOR_SIZE))
+                logging.warning(f"Unreadable: {self.target} bytes {sub_offset}-{sub_offset + sub_length}: {e}")
+        return bad_bytes
+    
+    def classify(self, milliseconds, bad_bytes, slow_ms):
+        if bad_bytes:
+            return "unreadable"
+        return "slow" if milliseconds > slow_ms else "ok"
+    
+    def _summarize(self, seconds):
+        times = [ms for _, length, ms, bad in self.regions if not bad and length == self.region_size]
+        median = statistics.median(times) if times else 0.0
+        slow_ms = min(median * self.SLOW_FACTOR, self.SLOW_MS) if median else self.SLOW_MS
+        
+        # Merge neighbouring regions with the same status into sector ranges
+        health_map = []
+        for offset, length, ms, bad in self.regions:
+            status = self.classify(ms, bad, slow_ms)
+            first_sector = offset // self.SECTOR_SIZE
+            last_sector = (offset + length - 1) // self.SECTOR_SIZE
+            if health_map and health_map[-1]["status"] == status:
+                health_map[-1]["end_sector"] = last_sector
+                health_map[-1]["max_ms"] = max(health_map[-1]["max_ms"], ms)
+                health_map[-1]["bad_bytes"] += bad
+            else:
+                health_map.append({
+                    "start_sector": first_sector, "end_sector": last_sector,
+                    "status": status, "max_ms": ms, "bad_bytes": bad,
+                })
+        
+        statuses = [self.classify(ms, bad, slow_ms) for _, _, ms, bad in self.regions]
+        return {
+            "target": self.target,
+            "size": self.size,
+            "region_size": self.region_size,
+            "readers": self.readers,
+            "direct": self.direct,
+            "seconds": seconds,
+            "mbps": self.size / (1024 * 1024) / seconds if seconds > 0 else 0.0,
+            "median_ms": median,
+            "slow_ms": slow_ms,
+            "regions": len(self.regions),
+            "slow": statuses.count("slow"),
+            "unreadable": statuses.count("unreadable"),
+            "bad_bytes": sum(bad for _, _, _, bad in self.regions),
+            "map": health_map,
+            "bad_sectors": self.bad_ranges,
+            "cells": "".join({"ok": ".", "slow": "s", "unreadable": "X"}[status] for status in statuses),
+        }
+
+
+def scan_target(drive):
+    """Return the raw device behind a drive or mount point; image files and devices are used as is."""
+    if os.path.isfile(drive) or drive.startswith("/dev/") or drive.startswith("\\\\.\\"):
+        return drive
+    if sys.platform == "win32":
+        return "\\\\.\\" + os.path.splitdrive(os.path.abspath(drive))[0]
+    mountpoint = os.path.abspath(drive)
+    partition = next((p for p in psutil.disk_partitions(all=True) if p.mountpoint == mountpoint), None)
+    if not partition or not partition.device.startswith("/dev/"):
+        raise ValueError(f"No block device found for {drive}")
+    return partition.device
+
+
+def volume_key(path):
+    """Return a key for the volume a drive, folder or device lives on; paths on one volume share it."""
+    if sys.platform == "win32":
+        if path.startswith("\\\\.\\"):
+            path = path[4:]  # \\.\F: is the device of F:
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        return os.path.normcase(drive or os.path.abspath(path))
+    path = os.path.realpath(path)
+    partitions = psutil.disk_partitions(all=True)
+    for partition in partitions:
+        if partition.device.startswith("/dev/") and os.path.realpath(partition.device) == path:
+            return partition.mountpoint
+    mountpoints = [
+        partition.mountpoint for partition in partitions
+        if path == partition.mountpoint or path.startswith(partition.mountpoint.rstrip("/") + "/")
+    ]
+    return max(mountpoints, key=len, default=path)
+
+
+class ChkdskRunner:
+    """Run chkdsk (or a stand-in with the same output) and turn its output into progress and a summary.
+    
+    stdout and stderr are drained on their own threads so neither pipe can fill up and
+    stall the check. chkdsk rewrites its progress line with carriage returns, so output
+    is split on both line endings. Progress comes from the stage number and the percent
+    (or "Total: NN%") chkdsk prints; the summary collects bad sectors and corrections.
+    """
+    
+    ENCODING = "oem" if sys.platform == "win32" else "utf-8"
+    EXIT_CODES = {
+        0: "no errors found",
+        1: "errors found and fixed",
+        2: "disk cleanup performed, or cleanup skipped without /f",
+        3: "could not check the disk, or errors were not fixed",
+    }
+    STAGE = re.compile(r"stage\s+(\d+)(?:\s+of\s+(\d+))?", re.IGNORECASE)
+    PERCENT = re.compile(r"(\d+)\s*(?:percent complete|%)", re.IGNORECASE)
+    TOTAL = re.compile(r"Total:\s*(\d+)\s*%", re.IGNORECASE)
+    ETA = re.compile(r"ETA:\s*(\d+):(\d+):(\d+)", re.IGNORECASE)
+    BAD_SECTORS = re.compile(r"([\d,.\s]+?)\s*KB in bad sectors", re.IGNORECASE)
+    BAD_CLUSTERS = re.compile(r"Adding\s+(\d+)\s+bad clusters?", re.IGNORECASE)
+    TOTAL_SPACE = re.compile(r"([\d,.\s]+?)\s*KB total disk space", re.IGNORECASE)
+    CORRECTIONS = ("correcting", "deleting", "recovering", "fixing", "replacing", "truncating", "inserting", "repairing")
+    NO_PROBLEMS = ("found no problems",)
+    MADE_CORRECTIONS = ("made corrections to the file system", "has made corrections")
+    NOT_FIXED = ("found problems with the file system", "cannot continue in read-only mode", "cannot run because the volume is in use", "cannot lock")
+    
+    MAX_STDERR_LINES = 100  # Kept in the summary; every line is still shown
+    
+    def __init__(self, command, stages=3, on_line=None, on_progress=None):
+        self.command = command
+        self.stages = stages
+        self.on_line = on_line or (lambda text: None)
+        self.on_progress = on_progress or (lambda fraction, stage, eta: None)
+        self.stage = 0
+        self.fraction = 0.0
+        self.eta = None
+        self.lines = 0
+        self.stderr_lines = 0
+        self.summary = {
+            "returncode": None,
+            "result": None,
+            "stages": 0,
+            "bad_sectors_kb": 0,
+            "bad_clusters": 0,
+            "total_kb": None,
+            "corrections": [],
+            "no_problems": False,
+            "made_corrections": False,
+            "problems_not_fixed": [],
+            "stderr": [],
+        }
+    
+    @staticmethod
+    def _number(text):
+        digits = re.sub(r"\D", "", text)
+        return int(digits) if digits else 0
+    
+    def run(self):
+        """Run the command to completion and return the summary dict."""
+        process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        )
+        lines = Queue()
+        readers = [
+            threading.Thread(target=self._drain, args=(process.stdout, "stdout", lines), daemon=True),
+            threading.Thread(target=self._drain, args=(process.stderr, "stderr", lines), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        
+        open_streams = len(readers)
+        while open_streams:
+            stream, line = lines.get()
+            if line is None:
+                open_streams -= 1
+            elif stream == "stderr":
+                self.stderr_lines += 1
+                if len(self.summary["stderr"]) < self.MAX_STDERR_LINES:
+                    self.summary["stderr"].append(line)
+                self.on_line(line + "\n")
+            else:
+                self.lines += 1
+                self.feed(line)
+        
+        for reader in readers:
+            reader.join()
+        process.wait()
+        self.summary["returncode"] = process.returncode
+        self.summary["result"] = self.EXIT_CODES.get(process.returncode, f"exit code {process.returncode}")
+        return self.summary
+    
+    def _drain(self, pipe, name, lines):
+        """Split one pipe into lines on \r and \n until it closes."""
+        pending = b""
+        try:
+            while True:
+                data = pipe.read1(65536)
+                if not data:
+                    break
+                parts = re.split(rb"[\r\n]", pending + data)
+                pending = parts.pop()
+                for part in parts:
+                    if part.strip():
+                        lines.put((name, part.decode(self.ENCODING, "replace").rstrip()))
+            if pending.strip():
+                lines.put((name, pending.decode(self.ENCODING, "replace").rstrip()))
+        finally:
+            pipe.close()
+            lines.put((name, None))
+    
+    def feed(self, line):
+        """Parse one line of chkdsk output; progress-only lines update progress instead of being shown."""
+        lower = line.lower()
+        summary = self.summary
+        
+        stage = self.STAGE.search(line)
+        if stage:
+            self.stage = max(self.stage, int(stage.group(1)))
+            if stage.group(2):
+                self.stages = int(stage.group(2))
+            self.stages = max(self.stages, self.stage)
+            summary["stages"] = self.stage
+        
+        total = self.TOTAL.search(line)
+        percent = self.PERCENT.search(line)
+        eta = self.ETA.search(line)
+        if total:
+            fraction = int(total.group(1)) / 100
+        elif percent and self.stage:
+            fraction = (self.stage - 1 + int(percent.group(1)) / 100) / self.stages
+        elif percent:
+            fraction = int(percent.group(1)) / 100
+        elif stage:
+            fraction = (self.stage - 1) / self.stages
+        else:
+            fraction = None
+        if eta:
+            hours, minutes, seconds = (int(group) for group in eta.groups())
+            self.eta = hours * 3600 + minutes * 60 + seconds
+        if fraction is not None and fraction >= self.fraction:
+            self.fraction = min(fraction, 1.0)
+            self.on_progress(self.fraction, self.stage, self.eta)
+        if (percent or total) and not stage:
+            return  # Progress line, rewritten in place by chkdsk
+        
+        bad_sectors = self.BAD_SECTORS.search(line)
+        if bad_sectors:
+            summary["bad_sectors_kb"] = self._number(bad_sectors.group(1))
+        bad_clusters = self.BAD_CLUSTERS.search(line)
+        if bad_clusters:
+            summary["bad_clusters"] += int(bad_clusters.group(1))
+        total_space = self.TOTAL_SPACE.search(line)
+        if total_space:
+            summary["total_kb"] = self._number(total_space.group(1))
+        if lower.lstrip().startswith(self.CORRECTIONS):
+            summary["corrections"].append(line.strip())
+        if any(text in lower for text in self.NO_PROBLEMS):
+            summary["no_problems"] = True
+        if any(text in lower for text in self.MADE_CORRECTIONS):
+            summary["made_corrections"] = True
+        if any(text in lower for text in self.NOT_FIXED):
+            summary["problems_not_fixed"].append(line.strip())
+        
+        self.on_line(line + "\n")
+
+
+def image_info_path_for(image_file):
+    """Return the path of the description stored next to a sector image."""
+    return image_file + IMAGE_INFO_SUFFIX
+
+
+def mark_sparse(f):
+    """Let the file system store skipped ranges of a file as holes (NTFS needs a flag for that)."""
+    if sys.platform != "win32":
+        return True  # POSIX file systems create holes for ranges that are seeked over
+    try:
+        import msvcrt
+        FSCTL_SET_SPARSE = 0x000900C4
+        returned = ctypes.c_ulong()
+        return bool(ctypes.windll.kernel32.DeviceIoControl(
+            msvcrt.get_osfhandle(f.fileno()), FSCTL_SET_SPARSE, None, 0, None, 0, ctypes.byref(returned), None
+        ))
+    except Exception as e:
+        logging.warning(f"Cannot mark {f.name} as sparse: {e}")
+        return False
+
+
+def lock_volume(f):
+    """Lock and dismount the Windows volume open as f, so its file system sectors can be overwritten.
+    
+    Windows rejects writes to the sectors of a mounted file system. The volume stays
+    locked until f is closed and is mounted again on its next access.
+    """
+    import msvcrt
+    FSCTL_LOCK_VOLUME = 0x00090018
+    FSCTL_DISMOUNT_VOLUME = 0x00090020
+    handle = ctypes.c_void_p(msvcrt.get_osfhandle(f.fileno()))
+    returned = ctypes.c_ulong()
+    for code, action in ((FSCTL_LOCK_VOLUME, "lock"), (FSCTL_DISMOUNT_VOLUME, "dismount")):
+        if not ctypes.windll.kernel32.DeviceIoControl(handle, code, None, 0, None, 0, ctypes.byref(returned), None):
+            raise OSError(f"Cannot {action} {f.name}; close all programs and windows using it ({ctypes.WinError()})")
+
+
+def mount_point_of(device):
+    """Return where a block device is mounted, or None (POSIX)."""
+    device = os.path.realpath(device)
+    for partition in psutil.disk_partitions(all=True):
+        if partition.device.startswith("/dev/") and os.path.realpath(partition.device) == device:
+            return partition.mountpoint
+    return None
+
+
+class SectorImager:
+    """Copy a whole device (or partition) sequentially into an image file, skipping all-zero blocks.
+    
+    Without compression the image is a plain raw image with holes where the device reads
+    as zeros. With zlib or lzma only the non-zero blocks are stored, as one compressed
+    stream. Either way a JSON description next to the image lists the holes, so
+    restore() can rebuild the device byte for byte.
+    """
+    
+    BLOCK_SIZE = 64 * 1024  # Zero detection granularity
+    READ_SIZE = 8 * 1024 * 1024  # One large sequential read
+    BUFFERS = 3  # Reads in flight while the previous block is compressed and written
+    COMPRESSORS = {
+        "zlib": lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),  # gzip framing
+        "lzma": lambda level: lzma.LZMACompressor(preset=level),
+    }
+    DECOMPRESSORS = {
+        "zlib": lambda: zlib.decompressobj(31),
+        "lzma": lambda: lzma.LZMADecompressor(),
+    }
+    
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress or (lambda bytes_done, total: None)
+        self._zero = bytes(self.BLOCK_SIZE)
+    
+    def create(self, source, image_file, compression=None, level=6):
+        """Image source into image_file and return the description written next to it."""
+        if compression and compression not in self.COMPRESSORS:
+            raise ValueError(f"Unknown compression: {compression}")
+        size = SurfaceScanner.device_size(source)
+        compressor = self.COMPRESSORS[compression](level) if compression else None
+        holes = []  # [first_block, block_count]
+        data_crc = 0
+        data_bytes = 0
+        stored_bytes = 0
+        
+        free = Queue()
+        filled = Queue()
+        for _ in range(self.BUFFERS):
+            free.put(aligned_buffer(self.READ_SIZE))
+        reader = threading.Thread(target=self._read_device, args=(source, size, free, filled), daemon=True)
+        reader.start()
+        
+        with open(image_file, "wb") as out:
+            if not compressor:
+                mark_sparse(out)
+            try:
+                while True:
+                    item = filled.get()
+                    if isinstance(item, Exception):
+                        raise item
+                    if item is None:
+                        break
+                    offset, buffer, length = item
+                    view = memoryview(buffer)
+                    try:
+                        for start in range(0, length, self.BLOCK_SIZE):
+                            end = min(start + self.BLOCK_SIZE, length)
+                            block = (offset + start) // self.BLOCK_SIZE
+                            if buffer[start:end] == self._zero[:end - start]:
+                                if holes and holes[-1][0] + holes[-1][1] == block:
+                                    holes[-1][1] += 1
+                                else:
+                                    holes.append([block, 1])
+                                if not compressor:
+                                    out.seek(end - start, os.SEEK_CUR)
+                                continue
+                            
+                            data = view[start:end]
+                            data_crc = zlib.crc32(data, data_crc)
+                            data_bytes += end - start
+                            if compressor:
+                                data = compressor.compress(data)
+                            out.write(data)
+                            stored_bytes += len(data)
+                    finally:
+                        view.release()
+                        free.put(buffer)
+                    self.on_progress(offset + length, size)
+                
+                if compressor:
+                    tail = compressor.flush()
+                    out.write(tail)
+                    stored_bytes += len(tail)
+                else:
+                    out.truncate(size)  # A trailing hole still gives the image its full size
+            finally:
+                free.put(None)  # Unblocks the reader if we stopped early
+                reader.join()
+        
+        info = {
+            "version": 1,
+            "source": source,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "size": size,
+            "block_size": self.BLOCK_SIZE,
+            "compression": compression,
+            "data_bytes": data_bytes,
+            "stored_bytes": stored_bytes,
+            "data_crc32": data_crc,
+            "holes": holes,
+        }
+        with open(image_info_path_for(image_file), "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=1)
+        return info
+    
+    def _read_device(self, source, size, free, filled):
+        """Read the device sequentially into the free buffers (runs on its own thread)."""
+        try:
+            f, _ = open_unbuffered(source, "rb")
+            with f:
+                offset = 0
+                while offset < size:
+                    buffer = free.get()
+                    if buffer is None:
+                        return
+                    length = min(self.READ_SIZE, size - offset)
+                    view = memoryview(buffer)
+                    done = 0
+                    try:
+                        while done < length:
+                            # Unbuffered reads must be whole sectors; the device ends on one anyway
+                            count = f.readinto(view[done:-(-length // 4096) * 4096])
+                            if not count:
+                                raise OSError(f"Unexpected end of {source} at offset {offset + done}")
+                            done += count
+                    finally:
+                        view.release()
+                    filled.put((offset, buffer, length))
+                    offset += length
+            filled.put(None)
+        except Exception as e:
+            filled.put(e)
+    
+    def restore(self, image_file, target):
+        """Write an image back to a device or file and return the number of bytes restored.
+        
+        A Windows volume (\\\\.\\F:) is locked and dismounted first; mounted POSIX devices are refused.
+        """
+        with open(image_info_path_for(image_file), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        block_size = info["block_size"]
+        size = info["size"]
+        compression = info["compression"]
+        holes = deque(info["holes"])
+        
+        # A new image file can keep its holes; an existing device has to be zeroed there
+        new_file = not os.path.exists(target)
+        mount_point = mount_point_of(target) if target.startswith("/dev/") else None
+        if mount_point:
+            raise OSError(f"{target} is mounted at {mount_point}; unmount it before restoring")
+        data_crc = 0
+        with open(image_file, "rb") as src, open(target, "wb" if new_file else "r+b") as out:
+            if new_file:
+                mark_sparse(out)
+            elif sys.platform == "win32" and re.fullmatch(r"\\\\\.\\[A-Za-z]:", target):
+                lock_volume(out)
+            decompressor = self.DECOMPRESSORS[compression]() if compression else None
+            
+            def next_input():
+                """Return the compressed bytes to feed the decompressor next (b"" at the end)."""
+                if compression == "lzma":
+                    # lzma keeps unused input itself and asks for more once it has run dry
+                    return src.read(self.READ_SIZE) if decompressor.needs_input else b""
+                return decompressor.unconsumed_tail or src.read(self.READ_SIZE)
+            
+            def read_data(length):
+                """Return the next length bytes of block data from the image.
+                
+                Output is capped at what is still missing, since a chunk of erased
+                flash (all 0xFF) can expand a thousandfold.
+                """
+                if not decompressor:
+                    return src.read(length)
+                data = bytearray()
+                while len(data) < length and not decompressor.eof:
+                    chunk = next_input()
+                    if not chunk and (compression != "lzma" or decompressor.needs_input):
+                        break
+                    data += decompressor.decompress(chunk, length - len(data))
+                return data
+            
+            offset = 0
+            while offset < size:
+                block = offset // block_size
+                if holes and holes[0][0] == block:
+                    length = min(holes[0][1] * block_size, size - offset)
+                    holes.popleft()
+                    if not decompressor:
+                        src.seek(length, os.SEEK_CUR)  # Raw images keep the holes in place
+                    if new_file:
+                        out.seek(length, os.SEEK_CUR)
+                    else:
+                        for start in range(0, length, block_size):
+                            out.write(self._zero[:min(block_size, length - start)])
+                else:
+                    next_hole = holes[0][0] * block_size if holes else size
+                    length = min(next_hole, size, offset + self.READ_SIZE) - offset
+                    data = read_data(length)
+                    if len(data) != length:
+                        raise ValueError(f"{image_file} ends early at offset {offset}")
+                    data_crc = zlib.crc32(data, data_crc)
+                    out.write(data)
+                offset += length
+                self.on_progress(offset, size)
+            
+            if new_file:
+                out.truncate(size)
+        
+        if data_crc != info["data_crc32"]:
+            raise ValueError(f"{image_file} is damaged: checksum mismatch after restore")
+        return size
+
+
+class CompressionPolicy:
+    """Choose ZIP_STORED or a deflate level for each file.
+    
+    Known compressed formats are stored as-is. Everything else is judged by
+    trial-compressing a small sample from the start of the file.
+    """
+    
+    SAMPLE_SIZE = 16 * 1024  # 16 KB
+    STORE_RATIO = 0.9  # Samples that shrink less than 10% are stored
+    FAST_RATIO = 0.75  # Samples that shrink less than 25% use the fastest level
+    STORED_EXTENSIONS = {
+        ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+        ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac",
+        ".mp4", ".m4v", ".mkv", ".mov", ".avi", ".webm", ".wmv",
+        ".zip", ".7z", ".rar", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".cab",
+        ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".epub", ".jar", ".apk",
+    }
+    
+    def __init__(self, compresslevel=6):
+        self.compresslevel = compresslevel
+    
+    def choose(self, name, sample):
+        """Return (compress_type, compresslevel) for a file name and its leading bytes."""
+        if os.path.splitext(name)[1].lower() in self.STORED_EXTENSIONS:
+            return zipfile.ZIP_STORED, None
+        if not sample:
+            return zipfile.ZIP_DEFLATED, self.compresslevel
+        
+        ratio = len(zlib.compress(sample, 1)) / len(sample)
+        if ratio > self.STORE_RATIO:
+            return zipfile.ZIP_STORED, None
+        if ratio > self.FAST_RATIO:
+            return zipfile.ZIP_DEFLATED, 1
+        return zipfile.ZIP_DEFLATED, self.compresslevel
+
+
+def compress_file(file_path, arcname, policy, chunk_size=1024 * 1024, spool_size=8 * 1024 * 1024, hash_name=None, limiter=None, tracer=None):
+    """Compress a single file into a spooled buffer and return (ZipInfo, buffer, hex digest).
+    
+    Large files the policy stores uncompressed are returned without a buffer,
+    so the writer can copy them straight from the drive instead of spooling them.
+    Reads from the drive are charged to the limiter, and read and deflate times to the tracer.
+    """
+    started = time.perf_counter()
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    hasher = hashlib.new(hash_name) if hash_name else None
+    crc = 0
+    file_size = 0
+    read_time = 0.0
+    
+    with open(file_path, "rb") as f:
+        chunk = f.read(chunk_size)
+        read_time += time.perf_counter() - started
+        if limiter:
+            limiter.consume(len(chunk))
+        zinfo.compress_type, compresslevel = policy.choose(arcname, chunk[:policy.SAMPLE_SIZE])
+        if zinfo.compress_type == zipfile.ZIP_STORED and zinfo.file_size > spool_size:
+            if tracer:
+                tracer.record("read", "backup", started, read_time, {"file": arcname})
+            return zinfo, None, None
+        
+        compressor = None
+        if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        
+        try:
+            while chunk:
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                if hasher:
+                    hasher.update(chunk)
+                spool.write(compressor.compress(chunk) if compressor else chunk)
+                read_started = time.perf_counter()
+                chunk = f.read(chunk_size)
+                read_time += time.perf_counter() - read_started
+                if limiter:
+                    limiter.consume(len(chunk))
+            if compressor:
+                spool.write(compressor.flush())
+        except Exception:
+            spool.close()
+            raise
+    
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = spool.tell()
+    spool.seek(0)
+    if tracer:
+        seconds = time.perf_counter() - started
+        tracer.record("compress", "backup", started, seconds, {"file": arcname, "bytes": file_size, "read_ms": round(read_time * 1000, 2)})
+        tracer.add("read", read_time)
+        tracer.add("deflate", seconds - read_time)
+        tracer.count("bytes_read", file_size)
+    return zinfo, spool, hasher.hexdigest() if hasher else None
+
+
+class ParallelZipWriter:
+    """Write a ZIP archive in one pass while members are compressed on a thread pool.
+    
+    zlib releases the GIL while compressing, so worker threads use every core.
+    Members are appended in submission order, so the archive layout is deterministic.
+    """
+    
+    CHUNK_SIZE = 1024 * 1024  # 1 MB
+    
+    def __init__(self, backup_file, workers=None, compresslevel=6, hash_name=None, policy=None, resume=None, limiter=None, tracer=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.limiter = limiter or RateLimiter()
+        self.tracer = tracer or Tracer()
+        self.compresslevel = compresslevel
+        self.hash_name = hash_name
+        self.policy = policy or CompressionPolicy(compresslevel)
+        self.fp = None
+        if resume:
+            # Continue an interrupted archive: drop everything behind the last good member
+            offset, members = resume
+            self.fp = open(backup_file, "r+b")
+            self.fp.truncate(offset)
+            self.fp.seek(offset)
+            self.zipf = zipfile.ZipFile(self.fp, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+            for zinfo in members:
+                self.zipf.filelist.append(zinfo)
+                self.zipf.NameToInfo[zinfo.filename] = zinfo
+        else:
+            self.zipf = zipfile.ZipFile(backup_file, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="uct-deflate")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def write_members(self, entries):
+        """Compress (file_path, arcname, ...) entries and yield an ArchivedMember per entry in input order."""
+        pending = deque()
+        window = self.workers * 2  # Bounds the number of compressed members held in memory
+        
+        for entry in entries:
+            future = self.executor.submit(
+                compress_file, entry[0], entry[1], self.policy, self.CHUNK_SIZE, hash_name=self.hash_name, limiter=self.limiter, tracer=self.tracer
+            )
+            pending.append((entry, future))
+            if len(pending) >= window:
+                yield self._write_next(pending)
+        
+        while pending:
+            yield self._write_next(pending)
+    
+    def _write_next(self, pending):
+        """Wait for the oldest pending member and append it to the archive."""
+        entry, future = pending.popleft()
+        try:
+            with self.tracer.span("wait for compression", "backup"):
+                zinfo, spool, digest = future.result()
+        except Exception as e:
+            return ArchivedMember(entry, None, None, e)
+        
+        if spool is None:
+            try:
+                with self.tracer.span("copy stored", "backup", file=entry[1], bytes=zinfo.file_size):
+                    digest = self._copy_stored(zinfo, entry[0])
+            except Exception as e:
+                return ArchivedMember(entry, None, None, e)
+            self.tracer.count("bytes_read", zinfo.file_size)
+            self.tracer.count("bytes_written", zinfo.compress_size)
+            return ArchivedMember(entry, zinfo, digest, None)
+        
+        with spool, self.tracer.span("write", "backup", file=entry[1], bytes=zinfo.compress_size):
+            self._append(zinfo, spool)
+        self.tracer.count("bytes_written", zinfo.compress_size)
+        return ArchivedMember(entry, zinfo, digest, None)
+    
+    def _append(self, zinfo, data):
+        """Append an already compressed member (mirrors ZipFile.open(mode="w"))."""
+        zipf = self.zipf
+        zipf.fp.seek(zipf.start_dir)
+        zinfo.header_offset = zipf.fp.tell()
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        
+        zipf.fp.write(zinfo.FileHeader())
+        while True:
+            chunk = data.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            self.limiter.consume(len(chunk))
+            zipf.fp.write(chunk)
+        
+        zipf.start_dir = zipf.fp.tell()
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+    
+    def _copy_stored(self, zinfo, file_path):
+        """Copy a large stored member straight from its source file."""
+        hasher = hashlib.new(self.hash_name) if self.hash_name else None
+        with open(file_path, "rb") as src, self.zipf.open(zinfo, "w") as dest:
+            while True:
+                chunk = src.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                # Read from the drive and written to the archive
+                self.limiter.consume(2 * len(chunk))
+                if hasher:
+                    hasher.update(chunk)
+                dest.write(chunk)
+        return hasher.hexdigest() if hasher else None
+    
+    def flush(self):
+        """Make the members written so far readable through other file handles."""
+        self.zipf.fp.flush()
+    
+    def close(self):
+        """Stop the worker pool and write the central directory."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        with self.tracer.span("write central directory", "backup", members=len(self.zipf.filelist)):
+            self.zipf.close()
+        if self.fp:
+            self.fp.close()
+
+
+def read_member_crc(archive, zinfo, buffer):
+    """Read a member's data from an open archive file and return its (CRC32, uncompressed size)."""
+    archive.seek(zinfo.header_offset)
+    header = archive.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader:
+        raise ValueError("archive data truncated")
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[0] != zipfile.stringFileHeader:
+        raise ValueError("bad local header in archive")
+    archive.seek(fields[10] + fields[11], os.SEEK_CUR)  # File name and extra field
+    
+    decompressor = zlib.decompressobj(-15) if zinfo.compress_type == zipfile.ZIP_DEFLATED else None
+    crc = 0
+    size = 0
+    remaining = zinfo.compress_size
+    while remaining:
+        count = archive.readinto(buffer[:min(remaining, len(buffer))])
+        if not count:
+            raise ValueError("archive data truncated")
+        remaining -= count
+        data = decompressor.decompress(buffer[:count]) if decompressor else buffer[:count]
+        crc = zlib.crc32(data, crc)
+        size += len(data)
+    if decompressor:
+        data = decompressor.flush()
+        crc = zlib.crc32(data, crc)
+        size += len(data)
+    return crc, size
+
+
+class BackupVerifier:
+    """Check archive members against their source files on a thread pool while the archive is written.
+    
+    Each member is read back from the archive file and decompressed, and its source file is
+    read again; both must match the CRC32 and size recorded in the ZIP. Reads go through
+    readinto() into one reused buffer per thread.
+    """
+    
+    CHUNK_SIZE = 1024 * 1024  # 1 MB
+    
+    def __init__(self, backup_file, workers=None, limiter=None, tracer=None):
+        self.backup_file = backup_file
+        self.limiter = limiter or RateLimiter()
+        self.tracer = tracer or Tracer()
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1), thread_name_prefix="uct-verify")
+        self.pending = []
+        self.skipped = []
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+    
+    def submit(self, arcname, file_path, zinfo):
+        """Queue a member for verification; its data must already be flushed to the archive."""
+        self.pending.append((arcname, file_path, zinfo.CRC, zinfo.file_size, self.executor.submit(self._traced_verify, file_path, zinfo)))
+    
+    def skip(self, arcname, file_path, error):
+        """Record a file that could not be added to the archive."""
+        self.skipped.append({"path": arcname, "source": file_path, "error": str(error)})
+    
+    def finish(self):
+        """Wait for all checks, confirm every member is in the central directory and return the report."""
+        mismatched = []
+        missing = []
+        verified = 0
+        verified_size = 0
+        try:
+            with zipfile.ZipFile(self.backup_file) as zipf:
+                names = set(zipf.NameToInfo)
+            
+            for arcname, file_path, crc, file_size, future in self.pending:
+                try:
+                    problems = future.result()
+                except FileNotFoundError:
+                    missing.append({"path": arcname, "source": file_path, "reason": "source file no longer exists"})
+                    continue
+                except Exception as e:
+                    mismatched.append({"path": arcname, "source": file_path, "reason": str(e)})
+                    continue
+                
+                if arcname not in names:
+                    missing.append({"path": arcname, "source": file_path, "reason": "not in the archive directory"})
+                elif problems:
+                    mismatched.append({"path": arcname, "source": file_path, "reason": "; ".join(problems)})
+                else:
+                    verified += 1
+                    verified_size += file_size
+        finally:
+            self.close()
+        
+        return {
+            "verified": verified,
+            "verified_size": verified_size,
+            "mismatched": mismatched,
+            "missing": missing,
+            "skipped": self.skipped,
+        }
+    
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for handle in self._handles:
+            handle.close()
+    
+    def _thread_state(self):
+        """Return this thread's archive handle and read buffer."""
+        state = self._local
+        if not hasattr(state, "archive"):
+            state.archive = open(self.backup_file, "rb")
+            state.buffer = memoryview(bytearray(self.CHUNK_SIZE))
+            with self._lock:
+                self._handles.append(state.archive)
+        return state.archive, state.buffer
+    
+    def _traced_verify(self, file_path, zinfo):
+        with self.tracer.span("verify", "backup", file=zinfo.filename, bytes=zinfo.file_size):
+            return self._verify(file_path, zinfo)
+    
+    def _verify(self, file_path, zinfo):
+        """Return a list of problems found for one member (empty if it matches)."""
+        archive, buffer = self._thread_state()
+        problems = []
+        self.limiter.consume(zinfo.compress_size)
+        
+        # Member data as stored in the archive
+        try:
+            crc, size = read_member_crc(archive, zinfo, buffer)
+        except ValueError as e:
+            return [str(e)]
+        if (crc, size) != (zinfo.CRC, zinfo.file_size):
+            problems.append(f"archive member CRC/size {crc:08x}/{size} != {zinfo.CRC:08x}/{zinfo.file_size}")
+        
+        # Source file as it is on the drive now
+        crc = 0
+        size = 0
+        with open(file_path, "rb", buffering=0) as f:
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                self.limiter.consume(count)
+                crc = zlib.crc32(buffer[:count], crc)
+                size += count
+        if (crc, size) != (zinfo.CRC, zinfo.file_size):
+            problems.append(f"source CRC/size {crc:08x}/{size} != {zinfo.CRC:08x}/{zinfo.file_size}")
+        
+        return problems
+
+
+def journal_path_for(backup_file):
+    """Return the path of the checkpoint journal kept next to a backup archive while it is written."""
+    return os.path.splitext(backup_file)[0] + JOURNAL_SUFFIX
+
+
+ZINFO_FIELDS = (
+    "filename", "date_time", "compress_type", "CRC", "compress_size", "file_size", "header_offset",
+    "flag_bits", "external_attr", "internal_attr", "create_system", "create_version", "extract_version",
+)
+
+
+class BackupJournal:
+    """Checkpoint journal of the members already written to a backup archive, as JSON lines.
+    
+    A member is journaled only after its data has been flushed to the archive, so after an
+    interruption every journaled member whose bytes are intact can be kept and the archive
+    truncated behind the last of them.
+    """
+    
+    def __init__(self, journal_file, backup_file, drive, parent=None, members=()):
+        self.file = open(journal_file, "w", encoding="utf-8")
+        self._write({
+            "type": "header",
+            "archive": os.path.abspath(backup_file),
+            "drive": drive,
+            "parent": os.path.abspath(parent) if parent else None,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        })
+        for record in members:
+            self._write(record)
+        self.file.flush()
+    
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def add(self, zinfo, end, size, mtime, state, digest=None):
+        """Record a member whose data ends at offset end in the archive."""
+        record = {field: getattr(zinfo, field) for field in ZINFO_FIELDS}
+        record.update(type="member", end=end, size=size, mtime=mtime, state=state, hash=digest)
+        self._write(record)
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+    
+    @staticmethod
+    def zinfo(record):
+        """Rebuild the ZipInfo of a journaled member."""
+        zinfo = zipfile.ZipInfo(record["filename"], tuple(record["date_time"]))
+        for field in ZINFO_FIELDS[2:]:
+            setattr(zinfo, field, record[field])
+        return zinfo
+
+
+def load_journal(journal_file):
+    """Load a checkpoint journal and return (header, member records); a torn last line is ignored."""
+    header = None
+    members = []
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # Interrupted while writing this record
+            if record.get("type") == "header":
+                header = record
+            elif record.get("type") == "member":
+                members.append(record)
+    
+    if header is None:
+        raise ValueError(f"{journal_file} is not a UCT backup journal")
+    return header, members
+
+
+def _source_unchanged(drive, record):
+    """Check that the file behind a journaled member still has the size and mtime it was archived with."""
+    try:
+        stat = os.stat(os.path.join(drive, *record["filename"].split("/")))
+    except OSError:
+        return False
+    return stat.st_size == record["size"] and stat.st_mtime == record["mtime"]
+
+
+def resumable_members(backup_file, members, drive=None):
+    """Return (members to keep, archive offset to truncate to) for an interrupted backup.
+    
+    Members are kept up to the first one that is not intact on disk or, when drive is
+    given, whose source file was changed or deleted since; it and everything behind it
+    are archived again. The last kept member's data is read back and checked against
+    its CRC before it is trusted.
+    """
+    members = sorted(members, key=lambda record: record["header_offset"])
+    archive_size = os.path.getsize(backup_file) if os.path.exists(backup_file) else 0
+    kept = []
+    offset = 0
+    for record in members:
+        if record["header_offset"] != offset or record["end"] > archive_size:
+            break
+        if drive is not None and not _source_unchanged(drive, record):
+            logging.info(f"{record['filename']} changed since the interrupted backup, resuming before it")
+            break
+        kept.append(record)
+        offset = record["end"]
+    
+    if kept:
+        buffer = memoryview(bytearray(1024 * 1024))
+        with open(backup_file, "rb") as archive:
+            while kept:
+                zinfo = BackupJournal.zinfo(kept[-1])
+                try:
+                    if read_member_crc(archive, zinfo, buffer) == (zinfo.CRC, zinfo.file_size):
+                        break
+                except (ValueError, zlib.error):
+                    pass
+                logging.warning(f"Journaled member {zinfo.filename} is damaged, dropping it")
+                kept.pop()
+    
+    return kept, kept[-1]["end"] if kept else 0
+
+
+class TreeWalker:
+    """Walk a directory tree with os.scandir, listing subdirectories concurrently on a thread pool.
+    
+    File sizes and times come from the DirEntry, so each file costs at most one stat call
+    (none on Windows). Directories are listed in parallel but yielded in a fixed depth-first
+    order with names sorted, so the same tree always produces the same sequence.
+    """
+    
+    WORKERS = 8  # Directories listed at once; helps most on high-latency USB file systems
+    SKIP_DIRS = ("System Volume Information",)  # Also skipped: names starting with "$"
+    
+    def __init__(self, root, include=(), exclude=(), workers=None, skip_files=()):
+        self.root = root
+        self.include = tuple(include or ())
+        self.exclude = tuple(exclude or ())
+        self.workers = workers or self.WORKERS
+        # Files never listed, e.g. a backup archive written inside the tree being walked
+        self.skip_files = {os.path.normcase(os.path.abspath(path)) for path in skip_files}
+        self._skip_names = {os.path.normcase(os.path.basename(path)) for path in self.skip_files}
+    
+    def _matches(self, patterns, relpath, name):
+        return any(fnmatch.fnmatch(relpath, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+    
+    def list_directory(self, path, relpath):
+        """List one directory and return (files, subdirectories) as (path, relpath) pairs."""
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    entry_relpath = f"{relpath}/{entry.name}" if relpath else entry.name
+                    try:
+                        if entry.is_dir():
+                            # Skip system directories; like os.walk, do not follow directory links
+                            if (entry.name.startswith("$") or entry.name in self.SKIP_DIRS
+                                    or entry.is_symlink() or self._matches(self.exclude, entry_relpath, entry.name)):
+                                continue
+                            subdirs.append((entry.path, entry_relpath))
+                            continue
+                        
+                        if self._matches(self.exclude, entry_relpath, entry.name):
+                            continue
+                        if self.include and not self._matches(self.include, entry_relpath, entry.name):
+                            continue
+                        if (os.path.normcase(entry.name) in self._skip_names
+                                and os.path.normcase(os.path.abspath(entry.path)) in self.skip_files):
+                            continue
+                        stat = entry.stat()
+                    except Exception as e:
+                        logging.warning(f"Cannot access file {entry.path}: {e}")
+                        continue
+                    files.append((entry.path, entry_relpath, stat.st_size, stat.st_mtime))
+        except Exception as e:
+            logging.warning(f"Cannot list directory {path}: {e}")
+        files.sort(key=lambda entry: entry[1])
+        return files, subdirs
+    
+    def walk(self):
+        """Yield (file_path, relpath, file_size, mtime) for every file below the root."""
+        for _, files in self.walk_directories():
+            yield from files
+    
+    def walk_directories(self, visit=None):
+        """Call visit(path, relpath) on the pool for every directory and yield (relpath, result).
+        
+        visit returns (result, subdirectories) and defaults to list_directory; it decides
+        which subdirectories are walked next, so callers can serve them from a cache.
+        Every subdirectory is queued for listing as soon as it is found, while results are
+        yielded depth-first in name order, each one once its listing has finished.
+        """
+        visit = visit or self.list_directory
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="uct-walk")
+        try:
+            stack = [("", executor.submit(visit, self.root, ""))]
+            while stack:
+                relpath, future = stack.pop()
+                result, subdirs = future.result()
+                queued = [
+                    (sub_relpath, executor.submit(visit, path, sub_relpath))
+                    for path, sub_relpath in sorted(subdirs, key=lambda subdir: subdir[1])
+                ]
+                stack.extend(reversed(queued))
+                yield relpath, result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DriveScanner:
+    """Walk a drive on a background thread and stream file entries through a bounded queue.
+    
+    Memory use stays flat regardless of the file count: the walk blocks once
+    QUEUE_SIZE entries are waiting to be compressed.
+    """
+    
+    QUEUE_SIZE = 1024
+    _DONE = object()
+    
+    def __init__(self, drive, include=(), exclude=(), tracer=None, skip_files=()):
+        self.drive = drive
+        self.walker = TreeWalker(drive, include, exclude, skip_files=skip_files)
+        self.tracer = tracer or Tracer()
+        self.queue = Queue(maxsize=self.QUEUE_SIZE)
+        self.files_found = 0
+        self.bytes_found = 0
+        self.finished = False
+        self.error = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def cancel(self):
+        """Stop the walk and release a scanner blocked on a full queue."""
+        self._cancelled.set()
+        try:
+            while True:
+                self.queue.get_nowait()
+        except Empty:
+            pass
+    
+    def __iter__(self):
+        """Yield (file_path, arcname, file_size, mtime) entries until the walk is done."""
+        while True:
+            entry = self.queue.get()
+            if entry is self._DONE:
+                return
+            yield entry
+    
+    def _put(self, item):
+        while not self._cancelled.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+    
+    def _list_directory(self, path, relpath):
+        with self.tracer.span("list directory", "walk", path=relpath or "/"):
+            return self.walker.list_directory(path, relpath)
+    
+    def _run(self):
+        try:
+            with self.tracer.span("walk", "walk"):
+                for _, files in self.walker.walk_directories(self._list_directory):
+                    self.tracer.count("directories")
+                    for entry in files:
+                        self.files_found += 1
+                        self.bytes_found += entry[2]
+                        if not self._put(entry):
+                            return
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._put(self._DONE)
+
+
+class ContentIndex:
+    """SQLite store of per-directory content summaries, keyed by drive identity and directory path."""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS directories (
+            identity TEXT NOT NULL,
+            path TEXT NOT NULL,
+            mtime REAL NOT NULL,
+            summary TEXT NOT NULL,
+            PRIMARY KEY (identity, path)
+        );
+    """
+    
+    def __init__(self, db_file=CONTENT_INDEX_DB):
+        self.conn = sqlite3.connect(db_file, timeout=30)
+        self.conn.executescript(self.SCHEMA)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        self.conn.close()
+    
+    def load(self, identity):
+        """Return {path: summary} for every indexed directory of a drive."""
+        return {
+            path: dict(json.loads(summary), mtime=mtime)
+            for path, mtime, summary in self.conn.execute(
+                "SELECT path, mtime, summary FROM directories WHERE identity = ?", (identity,)
+            )
+        }
+    
+    def save(self, identity, changed, removed):
+        """Store the rescanned directory summaries and forget directories that are gone."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO directories (identity, path, mtime, summary) VALUES (?, ?, ?, ?)",
+                [
+                    (identity, path, summary["mtime"], json.dumps({k: v for k, v in summary.items() if k != "mtime"}))
+                    for path, summary in changed.items()
+                ]
+            )
+            self.conn.executemany(
+                "DELETE FROM directories WHERE identity = ? AND path = ?", [(identity, path) for path in removed]
+            )
+
+
+class ContentAnalyzer:
+    """Summarize what fills a drive from per-directory summaries, reusing the cached ones.
+    
+    A directory is only listed again when its mtime changed, which happens whenever an
+    entry is added, removed or renamed in it. Files rewritten in place keep the old
+    summary until something else touches their directory.
+    """
+    
+    TOP_FILES = 20  # Largest files kept per directory and reported overall
+    SIZE_BUCKETS = (
+        ("< 4 KB", 4 * 1024),
+        ("4 KB - 64 KB", 64 * 1024),
+        ("64 KB - 1 MB", 1024 * 1024),
+        ("1 MB - 16 MB", 16 * 1024 * 1024),
+        ("16 MB - 256 MB", 256 * 1024 * 1024),
+        ("256 MB - 1 GB", 1024 * 1024 * 1024),
+        (">= 1 GB", None),
+    )
+    
+    def __init__(self, root, cache=None):
+        self.root = root
+        self.walker = TreeWalker(root)
+        self.cache = cache or {}
+        self.summaries = {}
+        self.changed = {}
+    
+    def run(self, on_directory=None):
+        """Walk the drive and return {relpath: summary} for every directory."""
+        for relpath, summary in self.walker.walk_directories(self._visit):
+            self.summaries[relpath] = summary
+            if on_directory:
+                on_directory(len(self.summaries), len(self.cache))
+        return self.summaries
+    
+    @property
+    def removed(self):
+        """Cached directories that no longer exist."""
+        return [path for path in self.cache if path not in self.summaries]
+    
+    def _visit(self, path, relpath):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError as e:
+            # Removed or unreadable during the walk: report it as empty instead of aborting
+            logging.warning(f"Cannot access directory {path}: {e}")
+            return {
+                "mtime": None,
+                "subdirs": [],
+                "files": 0,
+                "bytes": 0,
+                "extensions": {},
+                "buckets": [[0, 0] for _ in self.SIZE_BUCKETS],
+                "largest": [],
+            }, []
+        cached = self.cache.get(relpath)
+        if cached and cached["mtime"] == mtime:
+            return cached, [(os.path.join(path, name), f"{relpath}/{name}" if relpath else name) for name in cached["subdirs"]]
+        
+        files, subdirs = self.walker.list_directory(path, relpath)
+        extensions = {}
+        buckets = [[0, 0] for _ in self.SIZE_BUCKETS]
+        for _, file_relpath, size, _ in files:
+            ext = os.path.splitext(file_relpath)[1].lower() or "(none)"
+            counts = extensions.setdefault(ext, [0, 0])
+            counts[0] += 1
+            counts[1] += size
+            bucket = next(i for i, (_, limit) in enumerate(self.SIZE_BUCKETS) if limit is None or size < limit)
+            buckets[bucket][0] += 1
+            buckets[bucket][1] += size
+        
+        summary = {
+            "mtime": mtime,
+            "subdirs": [sub_relpath.rsplit("/", 1)[-1] for _, sub_relpath in subdirs],
+            "files": len(files),
+            "bytes": sum(size for _, _, size, _ in files),
+            "extensions": extensions,
+            "buckets": buckets,
+            "largest": heapq.nlargest(self.TOP_FILES, ([size, file_relpath] for _, file_relpath, size, _ in files)),
+        }
+        self.changed[relpath] = summary
+        return summary, subdirs
+    
+    def report(self, top=10):
+        """Combine the directory summaries into the drive-wide report."""
+        totals = {}  # Recursive bytes and file count per directory
+        extensions = {}
+        buckets = [[0, 0] for _ in self.SIZE_BUCKETS]
+        for relpath, summary in self.summaries.items():
+            parts = relpath.split("/") if relpath else []
+            for depth in range(len(parts) + 1):
+                total = totals.setdefault("/".join(parts[:depth]), [0, 0])
+                total[0] += summary["bytes"]
+                total[1] += summary["files"]
+            for ext, (count, size) in summary["extensions"].items():
+                counts = extensions.setdefault(ext, [0, 0])
+                counts[0] += count
+                counts[1] += size
+            for bucket, (count, size) in zip(buckets, summary["buckets"]):
+                bucket[0] += count
+                bucket[1] += size
+        
+        # Top-level directories, with the files directly in the root as "."
+        top_level = [(path, size, count) for path, (size, count) in totals.items() if path and "/" not in path]
+        root_files = self.summaries.get("")
+        if root_files and root_files["files"]:
+            top_level.append((".", root_files["bytes"], root_files["files"]))
+        return {
+            "files": totals.get("", [0, 0])[1],
+            "bytes": totals.get("", [0, 0])[0],
+            "directories": len(self.summaries),
+            "rescanned": len(self.changed),
+            "top_directories": [
+                {"path": path, "bytes": size, "files": count}
+                for path, size, count in sorted(top_level, key=lambda item: item[1], reverse=True)[:top]
+            ],
+            "largest_files": [
+                {"path": path, "bytes": size}
+                for size, path in heapq.nlargest(top, itertools.chain.from_iterable(
+                    summary["largest"] for summary in self.summaries.values()
+                ))
+            ],
+            "extensions": [
+                {"extension": ext, "files": count, "bytes": size}
+                for ext, (count, size) in sorted(extensions.items(), key=lambda item: item[1][1], reverse=True)[:top]
+            ],
+            "size_distribution": [
+                {"range": label, "files": count, "bytes": size}
+                for (label, _), (count, size) in zip(self.SIZE_BUCKETS, buckets)
+            ],
+        }
+
+
+class DuplicateFinder:
+    """Find files with identical content, reading as little of the drive as possible.
+    
+    Files are grouped by size first; only sizes shared by several files get a partial hash
+    of their first and last block, and only partial-hash collisions are hashed in full.
+    Hashing runs on a thread pool (hashlib releases the GIL for large buffers).
+    """
+    
+    BLOCK_SIZE = 64 * 1024  # Read from each end for the partial hash
+    CHUNK_SIZE = 1024 * 1024  # 1 MB
+    WORKERS = 8
+    
+    def __init__(self, root, min_size=1, include=(), exclude=(), workers=None):
+        self.root = root
+        self.min_size = max(1, min_size)
+        self.walker = TreeWalker(root, include, exclude)
+        self.workers = workers or self.WORKERS
+        self.stats = {"files": 0, "candidates": 0, "partial_hashed": 0, "full_hashed": 0, "bytes_read": 0}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def _buffer(self):
+        if not hasattr(self._local, "buffer"):
+            self._local.buffer = memoryview(bytearray(self.CHUNK_SIZE))
+        return self._local.buffer
+    
+    def _count(self, key, bytes_read):
+        with self._lock:
+            self.stats[key] += 1
+            self.stats["bytes_read"] += bytes_read
+    
+    def _partial_hash(self, entry):
+        """Hash the first and last block of a file; small files are hashed whole."""
+        path, _, size, _ = entry
+        buffer = self._buffer()
+        hasher = hashlib.blake2b()
+        read = 0
+        with open(path, "rb", buffering=0) as f:
+            count = f.readinto(buffer[:self.BLOCK_SIZE])
+            hasher.update(buffer[:count])
+            read += count
+            if size > self.BLOCK_SIZE:
+                f.seek(max(size - self.BLOCK_SIZE, self.BLOCK_SIZE))
+                count = f.readinto(buffer[:self.BLOCK_SIZE])
+                hasher.update(buffer[:count])
+                read += count
+        self._count("partial_hashed", read)
+        return hasher.hexdigest()
+    
+    def _full_hash(self, entry):
+        path = entry[0]
+        buffer = self._buffer()
+        hasher = hashlib.blake2b()
+        read = 0
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                hasher.update(buffer[:count])
+                read += count
+        self._count("full_hashed", read)
+        return hasher.hexdigest()
+    
+    def _hash_groups(self, executor, groups, hash_function):
+        """Split each group of entries by a hash computed on the pool; unreadable files drop out."""
+        entries = [entry for group in groups for entry in group]
+        futures = [executor.submit(hash_function, entry) for entry in entries]
+        split = {}
+        for entry, future in zip(entries, futures):
+            try:
+                digest = future.result()
+            except OSError as e:
+                logging.warning(f"Cannot read {entry[0]}: {e}")
+                continue
+            split.setdefault((entry[2], digest), []).append(entry)
+        return [group for group in split.values() if len(group) > 1]
+    
+    def run(self, on_phase=None):
+        """Return duplicate groups as dicts (size, files, reclaimable), largest savings first."""
+        on_phase = on_phase or (lambda phase, done, total: None)
+        by_size = {}
+        for entry in self.walker.walk():
+            self.stats["files"] += 1
+            if entry[2] >= self.min_size:
+                by_size.setdefault(entry[2], []).append(entry)
+        groups = [group for group in by_size.values() if len(group) > 1]
+        self.stats["candidates"] = sum(len(group) for group in groups)
+        on_phase("partial hash", 0, len(groups))
+        
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="uct-hash") as executor:
+            groups = self._hash_groups(executor, groups, self._partial_hash)
+            
+            # The partial hash already covered every byte of files up to two blocks long
+            small = [group for group in groups if group[0][2] <= 2 * self.BLOCK_SIZE]
+            large = [group for group in groups if group[0][2] > 2 * self.BLOCK_SIZE]
+            on_phase("full hash", 0, len(large))
+            groups = small + self._hash_groups(executor, large, self._full_hash)
+        
+        duplicates = [
+            {
+                "size": group[0][2],
+                "files": sorted(entry[1] for entry in group),
+                "reclaimable": group[0][2] * (len(group) - 1),
+            }
+            for group in groups
+        ]
+        duplicates.sort(key=lambda group: group["reclaimable"], reverse=True)
+        return duplicates
+
+
+def manifest_path_for(backup_file):
+    """Return the path of the manifest stored next to a backup archive."""
+    return os.path.splitext(backup_file)[0] + MANIFEST_SUFFIX
+
+
+def relative_to(path, base_dir):
+    """Return path relative to base_dir, or absolute if it lives on another drive."""
+    try:
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(base_dir)).replace(os.sep, "/")
+    except ValueError:
+        return os.path.abspath(path)
+
+
+def load_manifest(manifest_file):
+    """Load a backup manifest and return (header, files, deleted)."""
+    header = None
+    files = {}
+    deleted = []
+    
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.get("type")
+            if kind == "header":
+                header = record
+            elif kind == "file":
+                files[record["path"]] = record
+            elif kind == "deleted":
+                deleted.append(record["path"])
+    
+    if header is None:
+        raise ValueError(f"{manifest_file} is not a UCT backup manifest")
+    return header, files, deleted
+
+
+class ManifestWriter:
+    """Stream the manifest of one backup run to disk as JSON lines.
+    
+    Every run lists the complete drive state, and each file record names the
+    archive holding its content, so any manifest restores its point in time
+    without replaying the chain of increments.
+    """
+    
+    def __init__(self, manifest_file, backup_file, drive, parent=None, hash_name=None):
+        self.manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+        self.archive = relative_to(backup_file, self.manifest_dir)
+        self.counts = {"added": 0, "changed": 0, "unchanged": 0, "deleted": 0}
+        self.file = open(manifest_file, "w", encoding="utf-8")
+        self._write({
+            "type": "header",
+            "version": 1,
+            "archive": self.archive,
+            "drive": drive,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "parent": relative_to(parent, self.manifest_dir) if parent else None,
+            "hash": hash_name,
+        })
+    
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def add_file(self, path, size, mtime, digest=None, state="added", previous=None):
+        """Record a file; unchanged files keep pointing at the archive that holds them."""
+        archive = self.archive
+        if previous is not None:
+            archive = relative_to(os.path.join(previous["_dir"], previous["archive"]), self.manifest_dir)
+            digest = digest or previous.get("hash")
+        
+        self.counts[state] += 1
+        self._write({"type": "file", "path": path, "size": size, "mtime": mtime, "hash": digest, "archive": archive})
+    
+    def add_deleted(self, path):
+        """Record a file that existed in the previous run but is gone now."""
+        self.counts["deleted"] += 1
+        self._write({"type": "deleted", "path": path})
+    
+    def close(self):
+        """Write the summary record and close the manifest."""
+        self._write(dict(type="summary", **self.counts))
+        self.file.close()
+
+
+def load_previous_files(manifest_file):
+    """Load the file records of a previous run, tagged with the directory they are relative to."""
+    _, files, _ = load_manifest(manifest_file)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+    for record in files.values():
+        record["_dir"] = manifest_dir
+    return files
+
+
+RestoreMember = namedtuple("RestoreMember", ["path", "archive", "zinfo", "mtime"])
+
+
+def restore_index(source):
+    """Index the members a manifest or plain ZIP archive can restore, from the archives' central directories.
+    
+    Returns {path: RestoreMember}; for a manifest each file comes from the archive that holds its content.
+    """
+    index = {}
+    directories = {}
+    try:
+        if source.endswith(MANIFEST_SUFFIX):
+            _, files, _ = load_manifest(source)
+            manifest_dir = os.path.dirname(os.path.abspath(source))
+            for path, record in files.items():
+                archive_path = os.path.join(manifest_dir, record["archive"])
+                if archive_path not in directories:
+                    with zipfile.ZipFile(archive_path) as zipf:
+                        directories[archive_path] = zipf.NameToInfo
+                zinfo = directories[archive_path].get(path)
+                if zinfo is None:
+                    raise ValueError(f"{path} is missing from {archive_path}")
+                index[path] = RestoreMember(path, archive_path, zinfo, record["mtime"])
+        else:
+            with zipfile.ZipFile(source) as zipf:
+                for zinfo in zipf.infolist():
+                    if not zinfo.is_dir():
+                        index[zinfo.filename] = RestoreMember(
+                            zinfo.filename, os.path.abspath(source), zinfo, time.mktime(zinfo.date_time + (0, 0, -1))
+                        )
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Cannot read archive: {e}")
+    return index
+
+
+def select_members(index, patterns=()):
+    """Return the indexed members matching any pattern: a subtree (folder/...), a path or a glob."""
+    if not patterns:
+        return list(index.values())
+    selected = []
+    for path, member in index.items():
+        for pattern in patterns:
+            prefix = pattern.strip("/")
+            if path == prefix or path.startswith(prefix + "/") or fnmatch.fnmatch(path, pattern):
+                selected.append(member)
+                break
+    return selected
+
+
+def restore_backup(source, target_dir, patterns=(), on_file=None, workers=None):
+    """Extract the selected members of a manifest or ZIP archive in parallel and return (files, bytes).
+    
+    Each worker thread streams members through its own archive handles, and every
+    restored file gets its original modification time back.
+    """
+    members = select_members(restore_index(source), patterns)
+    for member in members:
+        parts = member.path.split("/")
+        if os.path.isabs(member.path) or ".." in parts:
+            raise ValueError(f"Unsafe path in backup: {member.path}")
+    
+    # Read each archive front to back
+    members.sort(key=lambda member: (member.archive, member.zinfo.header_offset))
+    local = threading.local()
+    lock = threading.Lock()
+    handles = []
+    restored = 0
+    restored_size = 0
+    
+    def extract(member):
+        nonlocal restored, restored_size
+        archives = getattr(local, "archives", None)
+        if archives is None:
+            archives = local.archives = {}
+        if member.archive not in archives:
+            archives[member.archive] = zipfile.ZipFile(member.archive, "r")
+            with lock:
+                handles.append(archives[member.archive])
+        
+        target = os.path.join(target_dir, *member.path.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with archives[member.archive].open(member.zinfo) as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.utime(target, (member.mtime, member.mtime))
+        
+        with lock:
+            restored += 1
+            restored_size += member.zinfo.file_size
+            if on_file:
+                on_file(restored, len(members), member.path, member.zinfo.file_size)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) + 2), thread_name_prefix="uct-restore") as executor:
+            for future in [executor.submit(extract, member) for member in members]:
+                future.result()
+    finally:
+        for handle in handles:
+            handle.close()
+    
+    return restored, restored_size
+
+
+Volume = namedtuple("Volume", ["device", "mountpoint", "label", "fstype", "removable"])
+
+
+class DriveInventory:
+    """Cached list of removable volumes, refreshed in one pass and watched for hotplug changes.
+    
+    The platform's mount table is polled cheaply (/proc/self/mountinfo on Linux, the logical
+    drive mask on Windows) and only re-enumerated when it changes. on_change(added, removed)
+    is called from the watcher thread with lists of Volume tuples, and always after the first scan.
+    """
+    
+    POLL_INTERVAL = 2.0  # Seconds
+    MOUNTINFO = "/proc/self/mountinfo"
+    
+    def __init__(self, on_change=None):
+        self.on_change = on_change or (lambda added, removed: None)
+        self.volumes = {}  # mountpoint -> Volume
+        self._cache = {}  # (device, mountpoint, fstype) -> Volume, including non-removable ones
+        self._signature = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Enumerate the drives and keep watching for changes in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def refresh(self):
+        """Re-enumerate now, report the differences and return (added, removed)."""
+        with self._lock:
+            initial = self._signature is None
+            self._signature = self._mount_signature()
+            volumes = self.scan()
+            added = [volume for key, volume in volumes.items() if self.volumes.get(key) != volume]
+            removed = [volume for key, volume in self.volumes.items() if volumes.get(key) != volume]
+            self.volumes = volumes
+        
+        if added or removed or initial:
+            logging.info(f"Drive inventory: {len(added)} added, {len(removed)} removed, {len(volumes)} USB drive(s)")
+            self.on_change(added, removed)
+        return added, removed
+    
+    def refresh_async(self):
+        """Run refresh() in a background thread."""
+        threading.Thread(target=self.refresh, daemon=True).start()
+    
+    def scan(self):
+        """Enumerate the mounted partitions once and return the removable ones by mount point."""
+        labels = self._linux_labels() if sys.platform.startswith("linux") else {}
+        volumes = {}
+        cache = {}
+        for partition in psutil.disk_partitions(all=True):
+            key = (partition.device, partition.mountpoint, partition.fstype)
+            volume = self._cache.get(key)
+            if volume is None:
+                removable = self._is_removable(partition)
+                volume = Volume(
+                    partition.device,
+                    partition.mountpoint,
+                    self._label(partition, labels) if removable else "",
+                    partition.fstype,
+                    removable,
+                )
+            cache[key] = volume
+            if volume.removable:
+                volumes[volume.mountpoint] = volume
+        self._cache = cache
+        return volumes
+    
+    def _watch(self):
+        self.refresh()
+        while not self._stop.wait(self.POLL_INTERVAL):
+            try:
+                if self._mount_signature() != self._signature:
+                    self.refresh()
+            except Exception as e:
+                logging.error(f"Error watching drives: {e}")
+    
+    def _mount_signature(self):
+        """Return a cheap value that changes whenever a volume is mounted or removed."""
+        if sys.platform == "win32":
+            return ctypes.windll.kernel32.GetLogicalDrives()
+        if os.path.exists(self.MOUNTINFO):
+            with open(self.MOUNTINFO, "rb") as f:
+                return f.read()
+        return tuple(psutil.disk_partitions(all=True))
+    
+    @staticmethod
+    def _is_removable(partition):
+        """Check if a partition is on a removable (USB) device."""
+        try:
+            if sys.platform == "win32":
+                return ctypes.windll.kernel32.GetDriveTypeW(partition.device) == 2  # DRIVE_REMOVABLE
+            
+            if "removable" in partition.opts.lower():
+                return True
+            if sys.platform == "darwin":
+                return partition.mountpoint.startswith("/Volumes/")
+            
+            # Linux: look the block device up in sysfs; partitions inherit the flag of their disk
+            if not partition.device.startswith("/dev/"):
+                return False
+            block = os.path.realpath(os.path.join("/sys/class/block", os.path.basename(os.path.realpath(partition.device))))
+            if not os.path.exists(block):
+                return False
+            if "/usb" in block:
+                return True
+            disk = os.path.dirname(block) if os.path.exists(os.path.join(block, "partition")) else block
+            with open(os.path.join(disk, "removable")) as f:
+                return f.read().strip() == "1"
+        except Exception as e:
+            logging.error(f"Error checking if drive is USB: {e}")
+            return False
+    
+    @staticmethod
+    def _linux_labels():
+        """Map device paths to file system labels from /dev/disk/by-label."""
+        labels = {}
+        by_label = "/dev/disk/by-label"
+        try:
+            for entry in os.scandir(by_label):
+                # udev escapes spaces and other special characters as \xNN but leaves UTF-8 bytes raw
+                name = re.sub(rb"\\x([0-9a-fA-F]{2})", lambda m: bytes([int(m.group(1), 16)]), os.fsencode(entry.name))
+                label = name.decode("utf-8", "replace")
+                labels[os.path.realpath(entry.path)] = label
+        except OSError:
+            pass
+        return labels
+    
+    @staticmethod
+    def _label(partition, labels):
+        """Get the label of the volume (if available)."""
+        if sys.platform != "win32":
+            return labels.get(os.path.realpath(partition.device)) or os.path.basename(partition.mountpoint) or "No Label"
+        
+        try:
+            volume_name_buffer = ctypes.create_unicode_buffer(1024)
+            file_system_buffer = ctypes.create_unicode_buffer(1024)
+            
+            ctypes.windll.kernel32.GetVolumeInformationW(
+                ctypes.c_wchar_p(partition.device),
+                volume_name_buffer,
+                ctypes.sizeof(volume_name_buffer),
+                None,
+                None,
+                None,
+                file_system_buffer,
+                ctypes.sizeof(file_system_buffer)
+            )
+            
+            label = volume_name_buffer.value.strip()
+            return label if label else "No Label"
+        except Exception as e:
+            logging.error(f"Error getting drive label: {e}")
+            return "No Label"
+
+
+class UCTEngine:
+    """GUI-free implementation of every UCT operation.
+    
+    Operations report text through on_message and a 0-100 value through
+    on_progress, so the same engine drives the Tk window and the command line.
+    Failures are reported, logged and re-raised to the caller.
+    """
+    
+    # Constants
+    BENCHMARK_SIZE = 100 * 1024 * 1024  # 100 MB
+    BENCHMARK_QUEUE_DEPTH = 4  # Threads issuing random I/O at once
+    BENCHMARK_DURATION = 5.0  # Seconds per random I/O profile
+    QUICK_PROFILES = ("seq1m-write", "seq1m-read")
+    FULL_PROFILES = ("seq1m-write", "seq1m-read", "rand4k-read", "rand4k-write", "mixed")
+    CHUNK_SIZE = 1024 * 1024  # 1 MB
+    BACKUP_WORKERS = 0  # Compression threads, 0 = one per CPU core
+    BACKUP_COMPRESS_LEVEL = 6
+    BACKUP_HASH = None  # Content hash stored in manifests, e.g. "sha256"
+    BACKUP_INCLUDE = ()  # Glob patterns; when set, only matching files are backed up
+    BACKUP_EXCLUDE = ()  # Glob patterns for files and directories to leave out
+    BACKUP_VERIFY = True  # Check every member against its source file after writing
+    HISTORY_FILE = HISTORY_DB  # SQLite benchmark history, None to disable
+    CONTENT_INDEX_FILE = CONTENT_INDEX_DB  # Cached directory summaries, None to always rescan
+    RESTORE_WORKERS = 0  # Extraction threads, 0 = CPU cores + 2
+    IMAGE_COMPRESS_LEVEL = 6
+    SCAN_READERS = 2  # Threads reading separate parts of the device during a surface scan
+    CHKDSK_PATH = None  # Program run instead of chkdsk.exe, e.g. a stand-in script for testing
+    BACKGROUND_PRIORITY = False  # Run operations with lowered CPU and I/O priority
+    TRACE_EVENTS = False  # Keep every traced span for export_trace(), not just phase totals
+    limiter = RateLimiter()  # Bandwidth limit shared by every backup and benchmark, see set_io_limit()
+    
+    def __init__(self, on_message=None, on_progress=None):
+        self.on_message = on_message or (lambda text: None)
+        self.on_progress = on_progress or (lambda event: None)
+        self.progress = 0
+        self.event = None
+        self.tracer = Tracer(events=self.TRACE_EVENTS)
+    
+    def export_trace(self, trace_file):
+        """Write the spans traced so far as Chrome trace-event JSON."""
+        self.tracer.export_chrome(trace_file)
+        logging.info(f"Trace written to {trace_file}")
+    
+    def emit(self, text):
+        """Send a line of output to the front end."""
+        self.on_message(text)
+    
+    def report_progress(self, phase, bytes_done=0, bytes_total=0, items_done=0, items_total=0):
+        """Publish a structured progress event for the current operation."""
+        event = ProgressEvent(phase, bytes_done, bytes_total, items_done, items_total, time.monotonic())
+        self.progress = event.fraction * 100
+        self.event = event
+        self.on_progress(event)
+    
+    def set_io_limit(self, mbps):
+        """Limit backup and benchmark I/O to mbps MB/s (0 for unlimited); running jobs follow immediately."""
+        self.limiter.set_rate((mbps or 0) * 1024 * 1024)
+        logging.info(f"I/O limit set to {f'{mbps} MB/s' if mbps else 'unlimited'}")
+    
+    def _report_io_limit(self):
+        if self.limiter.rate:
+            self.emit(f"Bandwidth limit: {self.limiter.rate / (1024 * 1024):.1f} MB/s\n")
+    
+    def list_drives(self):
+        """Return the removable drives as dicts with device, mountpoint, label and fstype."""
+        drives = [
+            {"device": volume.device, "mountpoint": volume.mountpoint, "label": volume.label, "fstype": volume.fstype}
+            for volume in DriveInventory().scan().values()
+        ]
+        logging.info(f"Found {len(drives)} USB drive(s)")
+        return drives
+    
+    def has_benchmark_space(self, drive):
+        """Check that the drive has room for the benchmark test file."""
+        return shutil.disk_usage(drive).free >= self.BENCHMARK_SIZE * 1.5
+    
+    def storage_info(self, drive):
+        """Return capacity and file system information for a drive."""
+        usage = shutil.disk_usage(drive)
+        partitions = psutil.disk_partitions()
+        drive_info = next((p for p in partitions if p.device == drive), None)
+        return {
+            "drive": drive,
+            "fstype": drive_info.fstype if drive_info else None,
+            "total": usage.total,
+            "used": usage.used,
+            "free": usage.free,
+            "percent": usage.used / usage.total * 100 if usage.total else 0.0,
+        }
+    
+    def _report_storage(self, storage, title, log_title):
+        """Print and log a storage summary."""
+        message = f"{'='*50}\n"
+        message += f"{title}\n"
+        message += f"{'='*50}\n"
+        message += f"Drive: {storage['drive']}\n"
+        if storage["fstype"]:
+            message += f"File System: {storage['fstype']}\n"
+        
+        message += (
+            f"Total: {storage['total'] / (1024**3):.2f} GB\n"
+            f"Used: {storage['used'] / (1024**3):.2f} GB\n"
+            f"Free: {storage['free'] / (1024**3):.2f} GB\n"
+            f"Usage: {storage['percent']:.1f}%\n"
+            f"{'='*50}\n"
+        )
+        
+        self.emit(message)
+        
+        # Detailed logging
+        logging.info(f"{log_title} - Drive: {storage['drive']}")
+        if storage["fstype"]:
+            logging.info(f"File System: {storage['fstype']}")
+        logging.info(f"Total: {storage['total'] / (1024**3):.2f} GB")
+        logging.info(f"Used: {storage['used'] / (1024**3):.2f} GB")
+        logging.info(f"Free: {storage['free'] / (1024**3):.2f} GB")
+        logging.info(f"Usage: {storage['percent']:.1f}%")
+    
+    def analyze(self, drive):
+        """Analyze storage information of the drive."""
+        try:
+            storage = self.storage_info(drive)
+            self._report_storage(storage, "STORAGE ANALYSIS", "Storage Analysis")
+            self._record_history(drive, storage)
+            return storage
+        except Exception as e:
+            self.emit(f"Error analyzing drive: {e}\n")
+            logging.error(f"Error analyzing drive {drive}: {e}")
+            raise
+    
+    def analyze_content(self, drive, top=10):
+        """Report what fills the drive: top directories, largest files, extensions and file sizes."""
+        try:
+            self.emit(f"Analyzing content of {drive}...\n")
+            started = time.perf_counter()
+            identity = drive_identity(drive)
+            
+            cache = {}
+            if self.CONTENT_INDEX_FILE:
+                with ContentIndex(self.CONTENT_INDEX_FILE) as index:
+                    cache = index.load(identity)
+            
+            analyzer = ContentAnalyzer(drive, cache)
+            analyzer.run(on_directory=lambda done, known: self.report_progress("content", items_done=done, items_total=max(known, done)))
+            if self.CONTENT_INDEX_FILE:
+                with ContentIndex(self.CONTENT_INDEX_FILE) as index:
+                    index.save(identity, analyzer.changed, analyzer.removed)
+            
+            report = analyzer.report(top)
+            report["seconds"] = time.perf_counter() - started
+            
+            message = f"{'='*50}\nCONTENT ANALYSIS\n{'='*50}\n"
+            message += (
+                f"{report['files']} files, {report['bytes'] / (1024**3):.2f} GB in {report['directories']} directories "
+                f"({report['rescanned']} rescanned, {report['seconds']:.1f}s)\n"
+            )
+            message += "\nTop directories:\n"
+            for entry in report["top_directories"]:
+                message += f"  {entry['bytes'] / (1024**2):10.1f} MB  {entry['files']:8d} files  {entry['path']}\n"
+            message += "\nLargest files:\n"
+            for entry in report["largest_files"]:
+                message += f"  {entry['bytes'] / (1024**2):10.1f} MB  {entry['path']}\n"
+            message += "\nBy extension:\n"
+            for entry in report["extensions"]:
+                message += f"  {entry['bytes'] / (1024**2):10.1f} MB  {entry['files']:8d} files  {entry['extension']}\n"
+            message += "\nFile sizes:\n"
+            for entry in report["size_distribution"]:
+                message += f"  {entry['range']:>15}: {entry['files']:8d} files  {entry['bytes'] / (1024**2):10.1f} MB\n"
+            message += f"{'='*50}\n"
+            self.emit(message)
+            
+            logging.info(
+                f"Content analysis of {drive} - {report['files']} files, {report['bytes']} bytes, "
+                f"{report['directories']} directories, {report['rescanned']} rescanned in {report['seconds']:.2f}s"
+            )
+            return report
+        except Exception as e:
+            self.emit(f"Error analyzing content: {e}\n")
+            logging.error(f"Error analyzing content of {drive}: {e}")
+            raise
+    
+    def find_duplicates(self, drive, min_size=1, top=20):
+        """Report groups of identical files and the space removing the extra copies would free."""
+        try:
+            self.emit(f"Searching for duplicate files on {drive}...\n")
+            started = time.perf_counter()
+            finder = DuplicateFinder(drive, min_size)
+            duplicates = finder.run(on_phase=lambda phase, done, total: self.report_progress(phase, items_done=done, items_total=total))
+            seconds = time.perf_counter() - started
+            reclaimable = sum(group["reclaimable"] for group in duplicates)
+            stats = finder.stats
+            
+            message = f"{'='*50}\nDUPLICATE FILES\n{'='*50}\n"
+            for group in duplicates[:top]:
+                message += (
+                    f"{len(group['files'])} x {group['size'] / (1024**2):.2f} MB "
+                    f"(reclaimable {group['reclaimable'] / (1024**2):.2f} MB):\n"
+                )
+                for path in group["files"]:
+                    message += f"  {path}\n"
+            if len(duplicates) > top:
+                message += f"... and {len(duplicates) - top} more groups\n"
+            message += (
+                f"\n{len(duplicates)} duplicate groups, {reclaimable / (1024**3):.2f} GB reclaimable\n"
+                f"Checked {stats['files']} files in {seconds:.1f}s: {stats['candidates']} shared a size, "
+                f"{stats['partial_hashed']} partially and {stats['full_hashed']} fully hashed, "
+                f"{stats['bytes_read'] / (1024**2):.1f} MB read\n"
+                f"{'='*50}\n"
+            )
+            self.emit(message)
+            self.report_progress("duplicates", items_done=1, items_total=1)
+            logging.info(
+                f"Duplicate search on {drive} - {len(duplicates)} groups, {reclaimable} bytes reclaimable, "
+                f"{stats['files']} files, {stats['bytes_read']} bytes read in {seconds:.2f}s"
+            )
+            return {"groups": duplicates, "reclaimable": reclaimable, "seconds": seconds, "stats": stats}
+        except Exception as e:
+            self.emit(f"Error searching for duplicates: {e}\n")
+            logging.error(f"Error searching for duplicates on {drive}: {e}")
+            raise
+    
+    def analyze_full(self, drive, profiles=QUICK_PROFILES):
+        """Perform complete analysis including storage and speed benchmark."""
+        test_file = None
+        try:
+            # First: Storage Analysis
+            with self.tracer.span("storage", "analyze"):
+                storage = self.storage_info(drive)
+            self._report_storage(storage, "USB DRIVE ANALYSIS", "Full Analysis Started")
+            
+            self.report_progress("storage", items_done=1, items_total=len(profiles) + 1)
+            
+            # Second: Speed Benchmark
+            self.emit("Running speed benchmark...\n")
+            logging.info(f"Starting speed benchmark - Profiles: {', '.join(profiles)}")
+            
+            test_file = os.path.join(drive, "uct_benchmark_test.bin")
+            benchmark = IOBenchmark(
+                test_file,
+                self.BENCHMARK_SIZE,
+                queue_depth=self.BENCHMARK_QUEUE_DEPTH,
+                duration=self.BENCHMARK_DURATION,
+                limiter=self.limiter
+            )
+            limited = bool(self.limiter.rate)
+            self._report_io_limit()
+            
+            results = {}
+            bytes_done = 0
+            for index, key in enumerate(profiles):
+                self.emit(f"Testing {IOBenchmark.PROFILES[key].name}...\n")
+                with self.tracer.span(f"benchmark {key}", "analyze") as span:
+                    result = benchmark.run(key)
+                    span.args.update(bytes=result["bytes"], mbps=round(result["mbps"], 2))
+                results[key] = result
+                self.tracer.count("bytes_benchmarked", result["bytes"])
+                
+                latency = result["latency_ms"]
+                logging.info(
+                    f"{result['name']} completed - Speed: {result['mbps']:.2f} MB/s, IOPS: {result['iops']:.0f}, "
+                    f"QD: {result['queue_depth']}, Latency p50/p95/p99/max: {latency['p50']:.2f}/"
+                    f"{latency['p95']:.2f}/{latency['p99']:.2f}/{latency['max']:.2f} ms"
+                )
+                logging.info(f"{result['name']} latency histogram: {result['histogram']}")
+                bytes_done += result["bytes"]
+                self.report_progress(result["name"], bytes_done, items_done=index + 2, items_total=len(profiles) + 1)
+            
+            # Results
+            self.emit(f"\nSPEED BENCHMARK RESULTS\n")
+            self.emit(f"{'='*50}\n")
+            for result in results.values():
+                latency = result["latency_ms"]
+                self.emit(
+                    f"{result['name']} (QD{result['queue_depth']}): {result['mbps']:.2f} MB/s, "
+                    f"{result['iops']:.0f} IOPS\n"
+                    f"  Latency p50 {latency['p50']:.2f} / p95 {latency['p95']:.2f} / "
+                    f"p99 {latency['p99']:.2f} / max {latency['max']:.2f} ms\n"
+                )
+                histogram = "  ".join(f"{label}: {count}" for label, count in result["histogram"] if count)
+                self.emit(f"  Histogram: {histogram}\n")
+                if not result["direct"]:
+                    self.emit("  Note: OS cache could not be bypassed on this drive\n")
+                
+                timeline = result.get("timeline")
+                if timeline:
+                    step = max(1, len(timeline) // 20)
+                    samples = " ".join(f"{mbps:.0f}" for _, mbps in timeline[::step])
+                    self.emit(f"  Timeline (MB/s): {samples}\n")
+                    logging.info(f"{result['name']} timeline (MB, MB/s): {[(round(mb), round(mbps, 1)) for mb, mbps in timeline]}")
+                if result.get("cliff"):
+                    offset_mb, before, after = result["cliff"]
+                    self.emit(
+                        f"  Throughput drop after {offset_mb:.0f} MB: {before:.1f} -> {after:.1f} MB/s "
+                        f"(cache exhausted or thermal throttling)\n"
+                    )
+                    logging.warning(f"{result['name']} throughput drop after {offset_mb:.0f} MB: {before:.1f} -> {after:.1f} MB/s")
+            
+            # Performance rating
+            rating = rate_performance(results)
+            
+            self.emit(f"Performance: {rating}\n")
+            self.emit(f"{'='*50}\n")
+            
+            logging.info(f"Performance Rating: {rating}")
+            logging.info(f"Analysis completed successfully for {drive}")
+            
+            # Throttled numbers describe the limit, not the drive, so keep them out of its baseline
+            alerts = []
+            if limited or self.limiter.rate:
+                self.emit("Results are capped by the bandwidth limit and were not added to the drive history.\n")
+            else:
+                with self.tracer.span("history", "analyze"):
+                    alerts = self._record_history(drive, storage, results, rating)
+            return {"storage": storage, "benchmark": results, "rating": rating, "alerts": alerts}
+        except Exception as e:
+            self.emit(f"Error during analysis: {e}\n")
+            logging.error(f"Error during full analysis of {drive}: {e}")
+            raise
+        finally:
+            # Clean up test file
+            if test_file and os.path.exists(test_file):
+                try:
+                    os.remove(test_file)
+                    logging.info("Benchmark test file removed")
+                except Exception as e:
+                    logging.warning(f"Failed to remove test file: {e}")
+    
+    def _record_history(self, drive, storage, results=None, rating=None):
+        """Store the run in the benchmark history and report degradation against the drive's baseline."""
+        if not self.HISTORY_FILE:
+            return []
+        try:
+            identity = drive_identity(drive)
+            with BenchmarkHistory(self.HISTORY_FILE) as history:
+                alerts = history.check_degradation(identity, results or {})
+                history.record(identity, drive, storage, results, rating)
+        except Exception as e:
+            logging.error(f"Error recording benchmark history for {drive}: {e}")
+            return []
+        
+        for key, baseline, current, drop in alerts:
+            self.emit(
+                f"WARNING: {IOBenchmark.PROFILES[key].name} dropped {drop:.0%} below this drive's baseline "
+                f"({baseline:.1f} -> {current:.1f} MB/s)\n"
+            )
+            logging.warning(f"Degradation on {drive} ({identity}): {key} {baseline:.1f} -> {current:.1f} MB/s")
+        return [{"profile": key, "baseline_mbps": baseline, "mbps": current, "drop": drop} for key, baseline, current, drop in alerts]
+    
+    def history_report(self, drive=None, limit=10):
+        """Print the benchmark trend of a drive, or all known drives with degradation flags."""
+        try:
+            with BenchmarkHistory(self.HISTORY_FILE) as history:
+                if drive is None:
+                    degraded = history.degraded_drives()
+                    self.emit(f"{'='*50}\nBENCHMARK HISTORY\n{'='*50}\n")
+                    for identity, label, total, first_seen, last_seen, runs in history.drives():
+                        flag = "  DEGRADED" if identity in degraded else ""
+                        self.emit(f"{label} ({total / (1024**3):.1f} GB): {runs} run(s), last {last_seen}{flag}\n")
+                    return {"degraded": {identity: [alert[0] for alert in alerts] for identity, alerts in degraded.items()}}
+                
+                identity = drive_identity(drive)
+                trends = {key: history.trend(identity, key, limit) for key in history.profiles(identity)}
+                self.emit(f"{'='*50}\nBENCHMARK HISTORY - {drive}\n{'='*50}\n")
+                if not trends:
+                    self.emit("No benchmark runs recorded for this drive yet.\n")
+                for key, rows in trends.items():
+                    baseline = history.baseline(identity, key)
+                    name = IOBenchmark.PROFILES[key].name if key in IOBenchmark.PROFILES else key
+                    self.emit(f"{name} (baseline {baseline:.1f} MB/s): " + "  ".join(f"{mbps:.1f}" for _, mbps, _ in rows) + "\n")
+                return {"identity": identity, "trends": trends}
+        except Exception as e:
+            self.emit(f"Error reading benchmark history: {e}\n")
+            logging.error(f"Error reading benchmark history: {e}")
+            raise
+    
+    def surface_scan(self, drive, readers=None, region_size=None):
+        """Read the whole device (or image file) without writing and map slow and unreadable regions."""
+        try:
+            target = scan_target(drive)
+            scanner = SurfaceScanner(
+                target,
+                readers=readers or self.SCAN_READERS,
+                region_size=region_size,
+                on_region=lambda done, total, bytes_done, size: self.report_progress("surface scan", bytes_done, size, done, total)
+            )
+            self.emit(f"{'='*50}\nSURFACE SCAN (read-only)\n{'='*50}\n")
+            self.emit(f"Target: {target} ({scanner.size / (1024**3):.2f} GB, {scanner.readers} reader(s))\n")
+            logging.info(f"Surface scan started - Target: {target}, Size: {scanner.size}, Readers: {scanner.readers}")
+            
+            result = scanner.run()
+            
+            # One cell per region: . ok, s slow, X unreadable
+            self.emit(f"\nHealth map ({result['region_size'] // (1024 * 1024)} MB per cell):\n")
+            cells = result["cells"]
+            for start in range(0, len(cells), 64):
+                self.emit(f"{cells[start:start + 64]}\n")
+            
+            for entry in result["map"]:
+                if entry["status"] != "ok":
+                    self.emit(
+                        f"{entry['status'].upper()}: sectors {entry['start_sector']}-{entry['end_sector']} "
+                        f"(max {entry['max_ms']:.0f} ms, {entry['bad_bytes'] // SurfaceScanner.SECTOR_SIZE} bad sectors)\n"
+                    )
+                    logging.warning(f"Surface scan {entry['status']}: {target} sectors {entry['start_sector']}-{entry['end_sector']}")
+            for first_sector, last_sector in result["bad_sectors"]:
+                self.emit(f"  Unreadable sectors {first_sector}-{last_sector}\n")
+            
+            self.emit(
+                f"\nScanned {result['regions']} regions in {result['seconds']:.1f}s ({result['mbps']:.1f} MB/s): "
+                f"{result['slow']} slow, {result['unreadable']} unreadable\n"
+            )
+            if not result["direct"]:
+                self.emit("Note: OS cache could not be bypassed, timings of cached regions are optimistic\n")
+            self.emit(f"{'='*50}\n")
+            logging.info(
+                f"Surface scan completed - {target}: {result['slow']} slow, {result['unreadable']} unreadable, "
+                f"{result['bad_bytes']} bad bytes, {result['mbps']:.1f} MB/s"
+            )
+            return result
+        except Exception as e:
+            self.emit(f"Error during surface scan: {e}\n")
+            logging.error(f"Error during surface scan of {drive}: {e}")
+            raise
+    
+    def image(self, drive, image_file, compression=None):
+        """Copy the raw device behind a drive into a sector image, skipping all-zero blocks."""
+        try:
+            source = scan_target(drive)
+            self.emit(f"Creating sector image of {source}: {os.path.basename(image_file)}\n")
+            if compression:
+                self.emit(f"Compression: {compression} (level {self.IMAGE_COMPRESS_LEVEL})\n")
+            logging.info(f"Sector image started - Source: {source}, Image: {image_file}, Compression: {compression}")
+            
+            imager = SectorImager(on_progress=lambda bytes_done, total: self.report_progress("image", bytes_done, total))
+            started = time.perf_counter()
+            info = imager.create(source, image_file, compression, self.IMAGE_COMPRESS_LEVEL)
+            seconds = time.perf_counter() - started
+            
+            hole_bytes = info["size"] - info["data_bytes"]
+            info["seconds"] = seconds
+            info["mbps"] = info["size"] / (1024 * 1024) / seconds if seconds > 0 else 0.0
+            self.emit(f"\n{'='*50}\n")
+            self.emit(f"Sector image completed!\n")
+            self.emit(f"Device size: {info['size'] / (1024**3):.2f} GB\n")
+            self.emit(f"Data: {info['data_bytes'] / (1024**3):.2f} GB, zero blocks skipped: {hole_bytes / (1024**3):.2f} GB\n")
+            self.emit(f"Image size: {info['stored_bytes'] / (1024**3):.2f} GB\n")
+            self.emit(f"Read speed: {info['mbps']:.1f} MB/s in {seconds:.1f}s\n")
+            self.emit(f"Saved to: {image_file}\n")
+            self.emit(f"{'='*50}\n")
+            logging.info(
+                f"Sector image of {source} completed - {info['data_bytes']} data bytes, {hole_bytes} zero bytes skipped, "
+                f"{info['stored_bytes']} bytes stored, {info['mbps']:.1f} MB/s"
+            )
+            return info
+        except Exception as e:
+            self.emit(f"Error during sector image: {e}\n")
+            logging.error(f"Error during sector image of {drive}: {e}")
+            raise
+    
+    def restore_image(self, image_file, target):
+        """Write a sector image back to a device (or to a new raw image file)."""
+        try:
+            self.emit(f"Restoring sector image {os.path.basename(image_file)} to {target}\n")
+            logging.info(f"Image restore started - Image: {image_file}, Target: {target}")
+            imager = SectorImager(on_progress=lambda bytes_done, total: self.report_progress("restore image", bytes_done, total))
+            size = imager.restore(image_file, target)
+            self.emit(f"Restored {size / (1024**3):.2f} GB to {target} (checksum verified)\n")
+            logging.info(f"Image restore completed - {size} bytes to {target}")
+            return {"image": image_file, "target": target, "size": size}
+        except Exception as e:
+            self.emit(f"Error during image restore: {e}\n")
+            logging.error(f"Error restoring image {image_file} to {target}: {e}")
+            raise
+    
+    def repair(self, drive, quick=True):
+        """Repair the drive using chkdsk (Windows only, or CHKDSK_PATH); returns None if it could not run."""
+        mode_text = "Quick Repair" if quick else "Deep Repair"
+        if sys.platform != "win32" and not self.CHKDSK_PATH:
+            self.emit("Repair function is only available on Windows.\n")
+            logging.warning("Repair attempted on non-Windows platform")
+            return None
+        
+        try:
+            if sys.platform == "win32":
+                # Check for admin privileges
+                if not self.CHKDSK_PATH and not ctypes.windll.shell32.IsUserAnAdmin():
+                    self.emit("Error: Administrator privileges required for repair.\n")
+                    logging.error("Repair failed - No administrator privileges")
+                    return None
+                
+                drive_letter = drive.rstrip("\\").rstrip("/")[0]
+                if not drive_letter.isalpha():
+                    self.emit(f"Invalid drive letter: {drive_letter}\n")
+                    logging.error(f"Invalid drive letter: {drive_letter}")
+                    return None
+                volume = f"{drive_letter}:"
+            else:
+                volume = drive
+            
+            # Determine repair mode
+            parameters = [volume, "/f"]
+            
+            if not quick:
+                parameters.append("/r")  # Add /r for bad sector scan
+            
+            # Run chkdsk
+            chkdsk_path = self.CHKDSK_PATH or os.path.join(os.getenv("SystemRoot", "C:\\Windows"), "System32", "chkdsk.exe")
+            self.emit(f"{'='*50}\n")
+            self.emit(f"Starting {mode_text} on {volume}\n")
+            self.emit(f"{'='*50}\n")
+            
+            logging.info(f"{mode_text} started on {volume}")
+            logging.info(f"Command: {chkdsk_path} {' '.join(parameters)}")
+            
+            if not quick:
+                self.emit("WARNING: Deep Repair may take several hours!\n")
+                self.emit("The drive will be scanned sector by sector.\n\n")
+                logging.warning("Deep Repair initiated - This may take several hours")
+            
+            stage_started = [0, time.perf_counter()]
+            
+            def end_stage(now):
+                stage, started = stage_started
+                self.tracer.record(f"chkdsk stage {stage}" if stage else "chkdsk start", "repair", started, now - started)
+            
+            def on_progress(fraction, stage, eta):
+                if stage != stage_started[0]:
+                    now = time.perf_counter()
+                    end_stage(now)
+                    stage_started[:] = [stage, now]
+                phase = f"chkdsk stage {stage}/{runner.stages}" if stage else "chkdsk"
+                self.report_progress(phase, items_done=round(fraction * 1000), items_total=1000)
+            
+            # NTFS runs 3 stages, /r adds the file data and free space scans
+            runner = ChkdskRunner(
+                [chkdsk_path] + parameters,
+                stages=3 if quick else 5,
+                on_line=self.emit,
+                on_progress=on_progress
+            )
+            summary = runner.run()
+            end_stage(time.perf_counter())
+            self.tracer.count("chkdsk_lines", runner.lines)
+            self.tracer.count("chkdsk_stderr_lines", runner.stderr_lines)
+            returncode = summary["returncode"]
+            
+            self.emit(f"\n{'='*50}\n")
+            if returncode in (0, 1) and not summary["problems_not_fixed"]:
+                self.emit(f"{mode_text} completed successfully!\n")
+                logging.info(f"{mode_text} completed successfully on {volume}: {summary['result']}")
+            else:
+                self.emit(f"{mode_text} completed with warnings.\n")
+                logging.warning(f"{mode_text} completed with return code: {returncode} ({summary['result']})")
+            self.emit(f"Result: {summary['result']}\n")
+            if summary["no_problems"]:
+                self.emit("No problems found on the file system.\n")
+            if summary["corrections"] or summary["made_corrections"]:
+                self.emit(f"Corrections made: {len(summary['corrections'])}\n")
+                for line in summary["corrections"][:10]:
+                    self.emit(f"  {line}\n")
+            for line in summary["problems_not_fixed"]:
+                self.emit(f"Not fixed: {line}\n")
+            if summary["bad_sectors_kb"] or summary["bad_clusters"]:
+                self.emit(f"Bad sectors: {summary['bad_sectors_kb']} KB ({summary['bad_clusters']} clusters added this run)\n")
+                logging.warning(f"{volume}: {summary['bad_sectors_kb']} KB in bad sectors, {summary['bad_clusters']} bad clusters added")
+            if summary["stderr"]:
+                logging.warning(f"{mode_text} stderr: {' | '.join(summary['stderr'])}")
+            self.emit(f"{'='*50}\n")
+            
+            self.report_progress("chkdsk", items_done=1000, items_total=1000)
+            return {"drive": drive, "mode": mode_text, **summary}
+        except Exception as e:
+            self.emit(f"Error during repair: {e}\n")
+            logging.error(f"Error during {mode_text} on {drive}: {e}")
+            raise
+    
+    def backup(self, drive, backup_file, base_manifest=None, resume=False):
+        """Create a ZIP backup of the drive, incremental when a previous manifest is given.
+        
+        With resume, an interrupted run of the same archive continues from its checkpoint
+        journal. Returns a summary dict, or None if there was nothing to back up.
+        """
+        manifest = None
+        scanner = None
+        verifier = None
+        journal = None
+        try:
+            self.emit(f"Creating ZIP backup: {os.path.basename(backup_file)}\n")
+            
+            previous_files = {}
+            if base_manifest:
+                previous_files = load_previous_files(base_manifest)
+                self.emit(f"Incremental backup based on: {os.path.basename(base_manifest)}\n")
+            
+            # Members of an interrupted run that are intact in the archive are kept
+            journal_file = journal_path_for(backup_file)
+            resumed = {}
+            resume_offset = 0
+            if resume and os.path.exists(journal_file):
+                _, members = load_journal(journal_file)
+                kept, resume_offset = resumable_members(backup_file, members, drive)
+                resumed = {record["filename"]: record for record in kept}
+                self.emit(
+                    f"Resuming interrupted backup: {len(kept)} files already archived "
+                    f"({resume_offset / (1024**3):.2f} GB kept)\n"
+                )
+                logging.info(f"Resuming {backup_file} at offset {resume_offset} with {len(kept)} members")
+            elif resume:
+                self.emit("No checkpoint journal found, starting a new backup.\n")
+            journal = BackupJournal(journal_file, backup_file, drive, base_manifest, resumed.values())
+            
+            manifest_file = manifest_path_for(backup_file)
+            manifest = ManifestWriter(manifest_file, backup_file, drive, parent=base_manifest, hash_name=self.BACKUP_HASH)
+            
+            # Compression starts while the scanner is still walking the drive;
+            # used space is the size estimate until the scan has finished.
+            estimated_size = shutil.disk_usage(drive).used
+            # The archive and its side files may be written inside the drive being backed up
+            scanner = DriveScanner(
+                drive, self.BACKUP_INCLUDE, self.BACKUP_EXCLUDE, tracer=self.tracer,
+                skip_files=(backup_file, manifest_file, journal_file)
+            )
+            scanner.start()
+            
+            workers = self.BACKUP_WORKERS or os.cpu_count() or 1
+            self.emit(f"Scanning drive and creating ZIP archive ({workers} compression threads)...\n")
+            self._report_io_limit()
+            
+            processed_size = 0  # Bytes handled so far, including unchanged files
+            processed_files = 0
+            written_size = 0
+            stored_size = 0
+            stored_files = 0
+            deflated_size = 0
+            deflated_output = 0
+            
+            def update_progress():
+                total_size = scanner.bytes_found if scanner.finished else max(estimated_size, scanner.bytes_found)
+                self.report_progress(
+                    "backup" if scanner.finished else "scan + backup",
+                    processed_size, total_size, processed_files, scanner.files_found
+                )
+            
+            def count_member(zinfo):
+                nonlocal processed_files, written_size, stored_files, stored_size, deflated_size, deflated_output
+                processed_files += 1
+                written_size += zinfo.file_size
+                if zinfo.compress_type == zipfile.ZIP_STORED:
+                    stored_files += 1
+                    stored_size += zinfo.file_size
+                else:
+                    deflated_size += zinfo.file_size
+                    deflated_output += zinfo.compress_size
+            
+            def changed_files():
+                """Record unchanged and already archived files in the manifest and yield the ones to compress."""
+                nonlocal processed_size
+                for file_path, arcname, file_size, mtime in scanner:
+                    previous = previous_files.pop(arcname, None)
+                    if previous and previous["size"] == file_size and previous["mtime"] == mtime:
+                        manifest.add_file(arcname, file_size, mtime, state="unchanged", previous=previous)
+                        processed_size += file_size
+                        self.tracer.count("files_unchanged")
+                        continue
+                    
+                    done = resumed.get(arcname)
+                    if done and done["size"] == file_size and done["mtime"] == mtime:
+                        manifest.add_file(arcname, done["file_size"], mtime, done["hash"], state=done["state"])
+                        count_member(BackupJournal.zinfo(done))
+                        processed_size += file_size
+                        self.tracer.count("files_resumed")
+                        continue
+                    
+                    yield file_path, arcname, file_size, mtime, "changed" if previous else "added"
+            
+            if self.BACKUP_VERIFY:
+                verifier = BackupVerifier(backup_file, limiter=self.limiter, tracer=self.tracer)
+            
+            with ParallelZipWriter(
+                backup_file,
+                workers=workers,
+                compresslevel=self.BACKUP_COMPRESS_LEVEL,
+                hash_name=self.BACKUP_HASH,
+                resume=(resume_offset, [BackupJournal.zinfo(record) for record in resumed.values()]) if resumed else None,
+                limiter=self.limiter,
+                tracer=self.tracer
+            ) as writer:
+                for member in writer.write_members(changed_files()):
+                    file_path, arcname, file_size, mtime, state = member.entry
+                    processed_size += file_size
+                    if member.error:
+                        self.tracer.count("files_failed")
+                        logging.warning(f"Failed to add {file_path} to ZIP: {member.error}")
+                        if verifier:
+                            verifier.skip(arcname, file_path, member.error)
+                        continue
+                    
+                    # Checkpoint the flushed member; verification runs while the next ones are compressed
+                    with self.tracer.span("checkpoint", "backup"):
+                        writer.flush()
+                        journal.add(member.zinfo, writer.zipf.start_dir, file_size, mtime, state, member.digest)
+                    if verifier:
+                        verifier.submit(arcname, file_path, member.zinfo)
+                    
+                    manifest.add_file(arcname, member.zinfo.file_size, mtime, member.digest, state=state)
+                    count_member(member.zinfo)
+                    self.tracer.count("files_archived")
+                    update_progress()
+                    
+                    if processed_files % 50 == 0:  # Update every 50 files
+                        found = f"{scanner.files_found}" if scanner.finished else f"{scanner.files_found}+"
+                        self.emit(
+                            f"Progress: {processed_files}/{found} files "
+                            f"({processed_size / (1024**3):.2f} GB)\n"
+                        )
+            
+            if scanner.error:
+                raise scanner.error
+            
+            # Whatever is left of the previous run no longer exists on the drive
+            for arcname in sorted(previous_files):
+                manifest.add_deleted(arcname)
+            manifest.close()
+            
+            # The archive is complete, so there is nothing left to resume
+            journal.close()
+            os.remove(journal_file)
+            
+            if scanner.files_found == 0 and not base_manifest:
+                os.remove(backup_file)
+                os.remove(manifest_file)
+                self.emit("No files found to backup.\n")
+                return None
+            
+            self.emit(f"Scanned {scanner.files_found} files ({scanner.bytes_found / (1024**3):.2f} GB)\n")
+            
+            verification = None
+            if verifier:
+                self.emit("Verifying archive against source files...\n")
+                with self.tracer.span("wait for verification", "backup"):
+                    verification = verifier.finish()
+                verifier = None
+                for problem in verification["mismatched"]:
+                    logging.error(f"Verify mismatch: {problem['path']}: {problem['reason']}")
+                for problem in verification["missing"]:
+                    logging.error(f"Verify missing: {problem['path']}: {problem['reason']}")
+            
+            # Get final ZIP size
+            zip_size = os.path.getsize(backup_file)
+            compression_ratio = (1 - zip_size / written_size) * 100 if written_size > 0 else 0
+            
+            self.emit(f"\n{'='*50}\n")
+            if verification and (verification["mismatched"] or verification["missing"] or verification["skipped"]):
+                self.emit(f"Backup completed with problems!\n")
+            else:
+                self.emit(f"Backup completed successfully!\n")
+            self.emit(f"Files backed up: {processed_files}\n")
+            self.emit(f"Original size: {written_size / (1024**3):.2f} GB\n")
+            self.emit(f"ZIP size: {zip_size / (1024**3):.2f} GB\n")
+            self.emit(f"Compression: {compression_ratio:.1f}%\n")
+            self.emit(
+                f"Deflated: {deflated_size / (1024**3):.2f} GB -> {deflated_output / (1024**3):.2f} GB "
+                f"({processed_files - stored_files} files)\n"
+            )
+            self.emit(
+                f"Stored uncompressed: {stored_size / (1024**3):.2f} GB ({stored_files} files)\n"
+            )
+            if base_manifest:
+                counts = manifest.counts
+                self.emit(
+                    f"Added: {counts['added']}, Changed: {counts['changed']}, "
+                    f"Unchanged: {counts['unchanged']}, Deleted: {counts['deleted']}\n"
+                )
+            if verification:
+                self.emit(
+                    f"Verified: {verification['verified']} files, Mismatched: {len(verification['mismatched'])}, "
+                    f"Missing: {len(verification['missing'])}, Skipped: {len(verification['skipped'])}\n"
+                )
+                for problem in (verification["mismatched"] + verification["missing"] + verification["skipped"])[:20]:
+                    self.emit(f"  {problem['path']}: {problem.get('reason') or problem.get('error')}\n")
+            self.emit(f"Saved to: {backup_file}\n")
+            self.emit(f"Manifest: {manifest_file}\n")
+            self.emit(f"{'='*50}\n")
+            
+            self.report_progress("backup", processed_size, processed_size, processed_files, processed_files)
+            logging.info(f"Backed up {drive} to {backup_file} - {processed_files} files, {zip_size / (1024**3):.2f} GB")
+            logging.info(
+                f"Compression policy - Deflated: {deflated_size} bytes -> {deflated_output} bytes, "
+                f"Stored: {stored_size} bytes in {stored_files} files"
+            )
+            
+            return {
+                "drive": drive,
+                "archive": backup_file,
+                "manifest": manifest_file,
+                "files": processed_files,
+                "original_size": written_size,
+                "zip_size": zip_size,
+                "compression": compression_ratio,
+                "stored_size": stored_size,
+                "deflated_size": deflated_size,
+                "counts": manifest.counts,
+                "verification": verification,
+            }
+        except Exception as e:
+            self.emit(f"Error during backup: {e}\n")
+            logging.error(f"Error during backup: {e}")
+            raise
+        finally:
+            if scanner:
+                scanner.cancel()
+            if verifier:
+                verifier.close()
+            if journal:
+                journal.close()
+            if manifest and not manifest.file.closed:
+                manifest.file.close()
+    
+    def restore(self, manifest_file, target_dir, patterns=None):
+        """Restore the drive state recorded in a backup manifest (or a plain ZIP archive).
+        
+        patterns limits the restore to folders (subtrees), paths or glob patterns.
+        """
+        try:
+            self.emit(f"Restoring {os.path.basename(manifest_file)} to {target_dir}\n")
+            if patterns:
+                self.emit(f"Selection: {', '.join(patterns)}\n")
+            logging.info(f"Restore started - Source: {manifest_file}, Target: {target_dir}, Selection: {patterns}")
+            
+            restored_bytes = 0
+            
+            def on_file(restored, total, path, size):
+                nonlocal restored_bytes
+                restored_bytes += size
+                self.report_progress("restore", restored_bytes, 0, restored, total)
+                if restored % 50 == 0:
+                    self.emit(f"Progress: {restored}/{total} files\n")
+            
+            started = time.perf_counter()
+            restored, restored_size = restore_backup(
+                manifest_file, target_dir, patterns or (), on_file=on_file, workers=self.RESTORE_WORKERS or None
+            )
+            seconds = time.perf_counter() - started
+            mbps = restored_size / (1024 * 1024) / seconds if seconds > 0 else 0.0
+            
+            self.emit(f"\n{'='*50}\n")
+            if restored:
+                self.emit(f"Restore completed successfully!\n")
+            else:
+                self.emit(f"Nothing matched the selection.\n")
+            self.emit(f"Files restored: {restored}\n")
+            self.emit(f"Size: {restored_size / (1024**3):.2f} GB in {seconds:.1f}s ({mbps:.1f} MB/s)\n")
+            self.emit(f"{'='*50}\n")
+            logging.info(f"Restored {restored} files ({restored_size} bytes, {mbps:.1f} MB/s) from {manifest_file} to {target_dir}")
+            return {
+                "manifest": manifest_file,
+                "target": target_dir,
+                "restored": restored,
+                "bytes": restored_size,
+                "seconds": seconds,
+                "mbps": mbps,
+            }
+        except Exception as e:
+            self.emit(f"Error during restore: {e}\n")
+            logging.error(f"Error during restore: {e}")
+            raise
+
+
+class Job:
+    """One engine operation on one drive, as tracked by the JobScheduler."""
+    
+    def __init__(self, job_id, drive, operation, args, resource, volume):
+        self.id = job_id
+        self.drive = drive
+        self.volume = volume  # volume_key() of the drive
+        self.operation = operation
+        self.args = args
+        self.resource = resource
+        self.state = "queued"
+        self.engine = None
+        self.event = None
+        self.meter = ThroughputMeter()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+    
+    @property
+    def active(self):
+        return self.state in ("queued", "waiting", "running")
+    
+    def record(self, event):
+        """Keep the latest progress event; called from the job's worker thread."""
+        self.event = event
+        self.meter.update(event)
+    
+    @property
+    def progress(self):
+        if self.state == "done":
+            return 100
+        return self.event.fraction * 100 if self.event else 0
+    
+    @property
+    def phase(self):
+        return self.event.phase if self.event else ""
+    
+    @property
+    def elapsed(self):
+        if not self.started:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+    
+    @property
+    def throughput(self):
+        """Moving-average MB/s."""
+        return self.meter.mbps if self.state == "running" else 0.0
+    
+    @property
+    def eta(self):
+        """Estimated seconds until the job finishes, or None if unknown."""
+        return self.meter.eta if self.state == "running" else None
+
+
+class JobScheduler:
+    """Run engine operations on several drives at once.
+    
+    Jobs on the same volume run one after another, so a restore into E:\\Restored waits
+    for a backup of E:\\. CPU-heavy work (compression) and I/O-heavy work (benchmarks,
+    restores, chkdsk) each have a global limit on how many jobs run at the same time.
+    """
+    
+    RESOURCES = {
+        "analyze": "io",
+        "analyze_full": "io",
+        "repair": "io",
+        "restore": "io",
+        "backup": "cpu",
+    }
+    
+    def __init__(self, cpu_slots=2, io_slots=4, on_message=None, engine_factory=UCTEngine):
+        self.on_message = on_message or (lambda text: None)
+        self.engine_factory = engine_factory
+        self.jobs = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._device_locks = {}
+        self._slots = {"cpu": threading.Semaphore(cpu_slots), "io": threading.Semaphore(io_slots)}
+        self._threads = []
+    
+    def submit(self, drive, operation, *args, on_success=None, on_error=None):
+        """Queue engine.<operation>(*args) for a drive and return its Job.
+        
+        operation is an engine method name or a callable taking (engine, *args).
+        """
+        name = operation if isinstance(operation, str) else operation.__name__
+        volume = volume_key(drive)
+        with self._lock:
+            job = Job(next(self._ids), drive, name, args, self.RESOURCES.get(name, "io"), volume)
+            self.jobs.append(job)
+            device_lock = self._device_locks.setdefault(volume, threading.Lock())
+        
+        thread = threading.Thread(target=self._run, args=(job, operation, device_lock, on_success, on_error), daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return job
+    
+    def active_jobs(self):
+        """Return the jobs that have not finished yet."""
+        with self._lock:
+            return [job for job in self.jobs if job.active]
+    
+    def is_busy(self, drive):
+        """Check whether a job on the drive's volume is queued or running."""
+        volume = volume_key(drive)
+        return any(job.volume == volume for job in self.active_jobs())
+    
+    def wait(self):
+        """Block until every submitted job has finished."""
+        for thread in list(self._threads):
+            thread.join()
+    
+    def _emit(self, job, text):
+        """Forward engine output, tagged with the drive while several jobs are active."""
+        if len(self.active_jobs()) > 1:
+            text = "".join(
+                f"[{job.drive}] {line}" if line.strip() else line
+                for line in text.splitlines(keepends=True)
+            )
+        self.on_message(text)
+    
+    def _run(self, job, operation, device_lock, on_success, on_error):
+        with device_lock:
+            job.state = "waiting"
+            with self._slots[job.resource]:
+                job.state = "running"
+                job.started = time.time()
+                job.engine = self.engine_factory(on_message=lambda text: self._emit(job, text), on_progress=job.record)
+                logging.info(f"Job {job.id} started: {job.operation} on {job.drive}")
+                try:
+                    job.result = execute_operation(job.engine, job.drive, operation, *job.args)
+                    job.state = "done"
+                except Exception as e:
+                    job.error = e
+                    job.state = "failed"
+                finally:
+                    job.finished = time.time()
+                    logging.info(f"Job {job.id} {job.state}: {job.operation} on {job.drive} in {job.elapsed:.1f}s")
+        
+        if job.state == "done" and on_success:
+            on_success(job)
+        elif job.state == "failed" and on_error:
+            on_error(job)
+
+
+def execute_operation(engine, drive, operation, *args):
+    """Run engine.<operation>(*args), or operation(engine, *args), and log its operation record."""
+    name = operation if isinstance(operation, str) else operation.__name__
+    engine.event = None
+    started = time.time()
+    result = None
+    error = None
+    try:
+        with BackgroundPriority(engine.BACKGROUND_PRIORITY), engine.tracer.span(name, "operation", drive=drive):
+            if isinstance(operation, str):
+                result = getattr(engine, operation)(*args)
+            else:
+                result = operation(engine, *args)
+        return result
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        log_operation(
+            drive, name, time.time() - started, engine.event.bytes_done if engine.event else 0, result, error,
+            trace=engine.tracer.summary()
+        )
+
+
+def log_operation(drive, operation, duration, bytes_done, result, error=None, trace=None):
+    """Append one JSON-lines record for a finished operation to the operations log."""
+    if error is not None:
+        outcome = "failed"
+    else:
+        outcome = "done" if result is not None else "skipped"
+    record = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "drive": drive,
+        "op": operation,
+        "duration": round(duration, 3),
+        "bytes": bytes_done,
+        "throughput_mbps": round(bytes_done / (1024 * 1024) / duration, 2) if duration > 0 else 0.0,
+        "result": outcome,
+    }
+    if error is not None:
+        record["error"] = str(error)
+    if trace:
+        record["phases"] = trace["phases"]
+        record["counters"] = trace["counters"]
+    logging.getLogger("uct.operations").info(json.dumps(record))
+
+
+def check_admin_privileges():
+    """Check if the application is running with administrator privileges."""
+    if sys.platform == "win32":
+        try:
+            return ctypes.windll.shell32.IsUserAnAdmin()
+        except:
+            return False
+    return True  # Assume admin on non-Windows platforms
+
+
+_log_listener = None
+
+
+def setup_logging(log_file=LOG_FILE, operations_file=OPERATIONS_LOG):
+    """Send logging through a background thread to rotating text and JSON-lines operation logs."""
+    import logging.handlers
+    global _log_listener
+    if _log_listener:
+        return
+    
+    text_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_SIZE, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+    text_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    text_handler.addFilter(lambda record: record.name != "uct.operations")
+    
+    operations_handler = logging.handlers.RotatingFileHandler(
+        operations_file, maxBytes=LOG_MAX_SIZE, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+    operations_handler.setFormatter(logging.Formatter("%(message)s"))
+    operations_handler.addFilter(logging.Filter("uct.operations"))
+    
+    # Callers only enqueue records; file I/O and rotation happen on the listener thread
+    log_queue = Queue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _log_listener = logging.handlers.QueueListener(log_queue, text_handler, operations_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+
+def build_parser():
+    """Build the command line parser."""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="print the result as JSON (progress goes to stderr)")
+    common.add_argument("--background", action="store_true", help="run with lowered CPU and I/O priority (nice/ionice)")
+    common.add_argument("--trace", metavar="FILE", help="write the timed phases as Chrome trace-event JSON (chrome://tracing, Perfetto)")
+    common.add_argument("--profile", metavar="FILE", help="run under cProfile, worker threads included, and write the stats to FILE (python -m pstats FILE)")
+    
+    parser = argparse.ArgumentParser(
+        prog="uct",
+        description="USB Checker (UCT) - analyze, benchmark, back up and repair USB drives."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser("drives", parents=[common], help="list removable drives")
+    
+    analyze = commands.add_parser("analyze", parents=[common], help="show storage usage and run the speed benchmark")
+    analyze.add_argument("drives", nargs="+", metavar="drive", help="drive or mount point, e.g. E:\\ or /media/usb")
+    analyze.add_argument("--full", action="store_true", help="also run the random 4K and mixed profiles")
+    analyze.add_argument("--profiles", nargs="+", choices=list(IOBenchmark.PROFILES), help="benchmark profiles to run")
+    analyze.add_argument("--storage-only", action="store_true", help="skip the speed benchmark")
+    analyze.add_argument("--queue-depth", type=int, help="threads issuing random I/O at once")
+    analyze.add_argument("--size-mb", type=int, help="size of the benchmark test file in MB")
+    analyze.add_argument("--duration", type=float, help="seconds per random I/O profile")
+    analyze.add_argument("--parallel", type=int, default=4, help="drives analyzed at the same time (default: 4)")
+    analyze.add_argument("--limit", dest="io_limit", type=float, metavar="MBPS", help="cap benchmark I/O at this many MB/s")
+    
+    backup = commands.add_parser("backup", parents=[common], help="create a ZIP backup of a drive")
+    backup.add_argument("drive")
+    backup.add_argument("archive", help="path of the ZIP archive to create")
+    backup.add_argument("--incremental", metavar="MANIFEST", help="only back up changes since this manifest")
+    backup.add_argument("--workers", type=int, help="compression threads (default: one per CPU core)")
+    backup.add_argument("--hash", metavar="ALGORITHM", help="store content hashes in the manifest, e.g. sha256")
+    backup.add_argument("--include", action="append", metavar="GLOB", help="only back up matching files, e.g. *.docx (repeatable)")
+    backup.add_argument("--exclude", action="append", metavar="GLOB", help="skip matching files and directories, e.g. node_modules (repeatable)")
+    backup.add_argument("--resume", action="store_true", help="continue an interrupted backup of the same archive")
+    backup.add_argument("--no-verify", action="store_true", help="skip checking the archive against the source files")
+    backup.add_argument("--limit", dest="io_limit", type=float, metavar="MBPS", help="cap drive and archive I/O at this many MB/s")
+    
+    image = commands.add_parser("image", parents=[common], help="copy the whole device into a sector image")
+    image.add_argument("drive", help="drive, mount point, block device or image file")
+    image.add_argument("image", help="path of the image file to create")
+    image.add_argument("--compress", choices=list(SectorImager.COMPRESSORS), help="compress the stored blocks")
+    image.add_argument("--level", type=int, help="compression level (default: 6)")
+    
+    restore_image = commands.add_parser("restore-image", parents=[common], help="write a sector image back to a device")
+    restore_image.add_argument("image")
+    restore_image.add_argument("target", help="device to overwrite, or a new image file")
+    
+    restore = commands.add_parser("restore", parents=[common], help="restore files from a backup manifest or ZIP archive")
+    restore.add_argument("manifest", help="backup manifest, or any ZIP archive")
+    restore.add_argument("target", help="directory to restore into")
+    restore.add_argument("--select", action="append", metavar="PATTERN", help="only restore this folder, path or glob (repeatable)")
+    restore.add_argument("--workers", type=int, help="extraction threads")
+    
+    history = commands.add_parser("history", parents=[common], help="show benchmark trends and degraded drives")
+    history.add_argument("drive", nargs="?", help="show the trend of one drive instead of the drive list")
+    history.add_argument("--limit", type=int, default=10, help="latest runs shown per profile (default: 10)")
+    
+    content = commands.add_parser("content", parents=[common], help="report what fills a drive (cached per directory)")
+    content.add_argument("drive")
+    content.add_argument("--top", type=int, default=10, help="entries per list (default: 10)")
+    
+    duplicates = commands.add_parser("duplicates", parents=[common], help="find files with identical content")
+    duplicates.add_argument("drive")
+    duplicates.add_argument("--min-size", type=int, default=1, help="ignore files smaller than this many bytes")
+    duplicates.add_argument("--top", type=int, default=20, help="groups listed (default: 20)")
+    
+    scan = commands.add_parser("scan", parents=[common], help="read-only surface scan for slow and unreadable sectors")
+    scan.add_argument("drive", help="drive, mount point, block device or image file")
+    scan.add_argument("--readers", type=int, help="threads reading separate parts of the device")
+    scan.add_argument("--region-mb", type=int, help="size of each timed region in MB (default: 4)")
+    
+    repair = commands.add_parser("repair", parents=[common], help="run chkdsk on a drive (Windows only)")
+    repair.add_argument("drive")
+    repair.add_argument("--deep", action="store_true", help="also scan for bad sectors (chkdsk /r)")
+    repair.add_argument("--chkdsk-path", metavar="PROGRAM", help="run this program instead of chkdsk.exe (any platform)")
+    
+    return parser
+
+
+def run_command(engine, args):
+    """Run the parsed command on the engine and return its result."""
+    if args.background:
+        UCTEngine.BACKGROUND_PRIORITY = True
+    if getattr(args, "io_limit", None):
+        engine.set_io_limit(args.io_limit)
+    
+    if args.command == "drives":
+        return engine.list_drives()
+    
+    if args.command == "analyze":
+        def configure(engine):
+            if args.queue_depth:
+                engine.BENCHMARK_QUEUE_DEPTH = args.queue_depth
+            if args.size_mb:
+                engine.BENCHMARK_SIZE = args.size_mb * 1024 * 1024
+            if args.duration:
+                engine.BENCHMARK_DURATION = args.duration
+            return engine
+        
+        def analyze(engine, drive):
+            if args.storage_only:
+                return engine.analyze(drive)
+            if not engine.has_benchmark_space(drive):
+                engine.emit("Not enough free space for speed benchmark, running storage analysis only.\n")
+                return engine.analyze(drive)
+            profiles = args.profiles or (engine.FULL_PROFILES if args.full else engine.QUICK_PROFILES)
+            return engine.analyze_full(drive, profiles)
+        
+        if len(args.drives) == 1:
+            return execute_operation(configure(engine), args.drives[0], analyze, args.drives[0])
+        
+        # Several drives: run them in parallel, one job per drive
+        scheduler = JobScheduler(
+            io_slots=args.parallel,
+            on_message=engine.on_message,
+            engine_factory=lambda **callbacks: configure(UCTEngine(**callbacks))
+        )
+        jobs = [scheduler.submit(drive, analyze, drive) for drive in args.drives]
+        scheduler.wait()
+        for job in jobs:
+            if job.engine:
+                engine.tracer.merge(job.engine.tracer)
+        return {job.drive: job.result for job in jobs}
+    
+    if args.command == "backup":
+        if args.workers:
+            engine.BACKUP_WORKERS = args.workers
+        if args.hash:
+            engine.BACKUP_HASH = args.hash
+        if args.no_verify:
+            engine.BACKUP_VERIFY = False
+        if args.include:
+            engine.BACKUP_INCLUDE = tuple(args.include)
+        if args.exclude:
+            engine.BACKUP_EXCLUDE = tuple(args.exclude)
+        return execute_operation(engine, args.drive, "backup", args.drive, args.archive, args.incremental, args.resume)
+    
+    if args.command == "image":
+        if args.level is not None:
+            engine.IMAGE_COMPRESS_LEVEL = args.level
+        return execute_operation(engine, args.drive, "image", args.drive, args.image, args.compress)
+    
+    if args.command == "restore-image":
+        return execute_operation(engine, args.target, "restore_image", args.image, args.target)
+    
+    if args.command == "restore":
+        if args.workers:
+            engine.RESTORE_WORKERS = args.workers
+        return execute_operation(engine, args.target, "restore", args.manifest, args.target, args.select)
+    
+    if args.command == "content":
+        return execute_operation(engine, args.drive, "analyze_content", args.drive, args.top)
+    
+    if args.command == "duplicates":
+        return execute_operation(engine, args.drive, "find_duplicates", args.drive, args.min_size, args.top)
+    
+    if args.command == "scan":
+        region_size = args.region_mb * 1024 * 1024 if args.region_mb else None
+        return execute_operation(engine, args.drive, "surface_scan", args.drive, args.readers, region_size)
+    
+    if args.command == "history":
+        return engine.history_report(args.drive, args.limit)
+    
+    if args.command == "repair":
+        if args.chkdsk_path:
+            engine.CHKDSK_PATH = args.chkdsk_path
+        return execute_operation(engine, args.drive, "repair", args.drive, not args.deep)
+
+
+def main(argv=None):
+    """Command line entry point; returns the process exit code."""
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    logging.info(f"USB Checker CLI started: {args.command}")
+    
+    output = sys.stderr if args.json else sys.stdout
+    if args.trace:
+        UCTEngine.TRACE_EVENTS = True
+    engine = UCTEngine(on_message=output.write)
+    
+    profiler = ThreadProfiler() if args.profile else None
+    try:
+        if profiler:
+            with profiler:
+                result = run_command(engine, args)
+        else:
+            result = run_command(engine, args)
+    except Exception:
+        return 1  # Already reported and logged by the engine
+    finally:
+        if profiler:
+            profiler.dump(args.profile)
+            sys.stderr.write(f"Profile written to {args.profile}\n")
+        if args.trace:
+            engine.export_trace(args.trace)
+            sys.stderr.write(f"Trace written to {args.trace}\n")
+    
+    if args.json:
+        json.dump(result, sys.stdout, indent=2, default=str)
+        sys.stdout.write("\n")
+    elif args.command == "drives":
+        for drive in result:
+            print(f"{drive['mountpoint']} - {drive['label']} ({drive['fstype']})")
+        if not result:
+            print("No USB drives found.")
+    
+    return 0 if result is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())